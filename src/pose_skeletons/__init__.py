@@ -1,5 +1,6 @@
 from typing import Dict, List, Optional
 from .definition import SkeletonDefinition
+from . import profiling
 
 from .definitions.optitrack import Optitrack
 from .definitions.xsens import Xsens
@@ -12,6 +13,7 @@ from .definitions.smplh import Smplh
 from .definitions.smplx import Smplx
 
 from .generate_skeleton_def import generate_skeleton_def
+from .loader import load_skeleton_def
 
 
 SKELETON_REGISTRY: Dict[str, SkeletonDefinition] = {
@@ -37,28 +39,58 @@ def detect_skeleton(joint_names: List[str]) -> Optional[str]:
     Returns:
         The skeleton name if an exact match is found, None otherwise.
     """
-    joint_set = set(joint_names)
+    with profiling.stage("detect_skeleton", joints=len(joint_names)):
+        joint_set = set(joint_names)
 
-    for name, skeleton in SKELETON_REGISTRY.items():
-        if joint_set == set(skeleton.original_names):
-            return name
+        for name, skeleton in SKELETON_REGISTRY.items():
+            if joint_set == set(skeleton.original_names):
+                return name
 
-    return None
+        return None
 
 
 def get_skeleton_def(name: str) -> SkeletonDefinition:
     """
     Fetches a SkeletonDefinition from the registry by its common name.
     """
-    normalized_name = name.lower().strip()
-    if normalized_name not in SKELETON_REGISTRY:
-        raise ValueError(f"Unknown skeleton definition: '{name}'. "
-                         f"Available: {list(SKELETON_REGISTRY.keys())}")
-    return SKELETON_REGISTRY[normalized_name]
+    with profiling.stage("get_skeleton_def", skeleton=name):
+        normalized_name = name.lower().strip()
+        if normalized_name not in SKELETON_REGISTRY:
+            raise ValueError(f"Unknown skeleton definition: '{name}'. "
+                             f"Available: {list(SKELETON_REGISTRY.keys())}")
+        return SKELETON_REGISTRY[normalized_name]
+
+
+def register_skeleton(definition: SkeletonDefinition, name: Optional[str] = None,
+                      overwrite: bool = False) -> str:
+    """
+    Adds a SkeletonDefinition to the registry at runtime.
+
+    The definition is validated and its topology compiled before it becomes
+    visible to get_skeleton_def and detect_skeleton.
+
+    Args:
+        definition: The definition to register, e.g. from load_skeleton_def.
+        name: Registry name. Defaults to the definition's name.
+        overwrite: Replace an existing entry with the same name.
+
+    Returns:
+        The normalized registry name.
+    """
+    normalized_name = (name or definition.name).lower().strip()
+    if normalized_name in SKELETON_REGISTRY and not overwrite:
+        raise ValueError(f"Skeleton definition '{normalized_name}' is already registered.")
+
+    definition.validate()
+    definition.topology  # compile once, before the definition is shared
+    SKELETON_REGISTRY[normalized_name] = definition
+    return normalized_name
 
 __all__ = [
     "SkeletonDefinition",
     "detect_skeleton",
     "get_skeleton_def",
+    "load_skeleton_def",
+    "register_skeleton",
     "SKELETON_REGISTRY",
 ]
@@ -0,0 +1,280 @@
+"""
+Pose sequences in Apache Arrow tables and Parquet files (requires pyarrow).
+
+One row per frame and person. Per-joint data is stored as fixed-size-list
+columns (e.g. ``positions`` as joints * 3 float32 values per row) next to
+scalar ``sequence_id``, ``person_id``, ``frame`` and ``time`` columns, so
+query engines can scan single columns and skip row groups by time or person
+using the Parquet statistics. The skeleton definition and the per-joint
+column shapes are stored in the schema metadata.
+
+Example:
+    write_parquet("clip.parquet", definition, {"positions": positions}, fps=30.0)
+    definition, data = read_parquet("clip.parquet", filters=[("person_id", "=", 3)])
+"""
+import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+from .loader import definition_from_dict, definition_to_dict
+
+
+METADATA_KEY = b"pose_skeletons"
+SCALAR_COLUMNS = ("sequence_id", "person_id", "frame", "time")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Arrow and Parquet support requires pyarrow. "
+                          "Install it with 'pip install pose_skeletons[arrow]'.")
+    return pyarrow
+
+
+def pose_schema(definition: SkeletonDefinition, channels: Dict[str, int],
+                fps: Optional[float] = None, dtype: str = "float32"):
+    """
+    Arrow schema for pose sequences of a skeleton.
+
+    Args:
+        definition: The skeleton.
+        channels: Per-joint column name to values per joint, e.g.
+            {"positions": 3, "confidences": 1}.
+        fps: Frame rate, stored in the metadata.
+        dtype: Value type of the per-joint columns.
+    """
+    pa = _pyarrow()
+    num_joints = len(definition.original_names)
+    fields = [
+        pa.field("sequence_id", pa.string()),
+        pa.field("person_id", pa.int32()),
+        pa.field("frame", pa.int64()),
+        pa.field("time", pa.float64()),
+    ]
+    for name, count in channels.items():
+        if name in SCALAR_COLUMNS:
+            raise ValueError(f"'{name}' is reserved for a scalar column.")
+        fields.append(pa.field(name, pa.list_(pa.from_numpy_dtype(np.dtype(dtype)), num_joints * count)))
+    metadata = {
+        "definition": definition_to_dict(definition),
+        "channels": dict(channels),
+        "fps": fps,
+    }
+    return pa.schema(fields, metadata={METADATA_KEY: json.dumps(metadata).encode("utf-8")})
+
+
+def to_table(definition: SkeletonDefinition, data: Dict[str, np.ndarray],
+             frame: Optional[np.ndarray] = None, person_id: Optional[np.ndarray] = None,
+             sequence_id: Optional[str] = None, fps: Optional[float] = None,
+             dtype: str = "float32"):
+    """
+    Builds an Arrow table from per-joint arrays.
+
+    Args:
+        definition: The skeleton of the data.
+        data: Column name to array of shape (rows, joints, C) or (rows, joints),
+            e.g. {"positions": positions, "confidences": scores}.
+        frame: Frame number per row. Defaults to 0, 1, 2, ...
+        person_id: Person per row. Defaults to 0.
+        sequence_id: Clip identifier stored in every row.
+        fps: Frame rate; the ``time`` column is ``frame / fps`` when given.
+        dtype: Value type of the per-joint columns.
+
+    Returns:
+        A pyarrow.Table.
+    """
+    pa = _pyarrow()
+    num_joints = len(definition.original_names)
+    arrays = {}
+    channels = {}
+    rows = None
+    for name, values in data.items():
+        values = np.asarray(values, dtype=dtype)
+        if values.ndim == 2:
+            values = values[..., None]
+        if values.ndim != 3 or values.shape[1] != num_joints:
+            raise ValueError(f"Column '{name}' must have shape (rows, {num_joints}[, C]), got {values.shape}.")
+        if rows is not None and len(values) != rows:
+            raise ValueError(f"Column '{name}' has {len(values)} rows, expected {rows}.")
+        rows = len(values)
+        channels[name] = values.shape[2]
+        arrays[name] = values
+    if rows is None:
+        raise ValueError("No per-joint columns given.")
+
+    frame = np.arange(rows) if frame is None else np.broadcast_to(np.asarray(frame, dtype=np.int64), (rows,))
+    person_id = np.zeros(rows, dtype=np.int32) if person_id is None \
+        else np.broadcast_to(np.asarray(person_id, dtype=np.int32), (rows,))
+    time = frame / fps if fps else np.full(rows, np.nan)
+
+    schema = pose_schema(definition, channels, fps, dtype)
+    columns = [
+        pa.array([sequence_id] * rows, type=pa.string()) if sequence_id is not None else pa.nulls(rows, pa.string()),
+        pa.array(person_id, type=pa.int32()),
+        pa.array(frame, type=pa.int64()),
+        pa.array(time, type=pa.float64()),
+    ]
+    for name, values in arrays.items():
+        flat = pa.array(np.ascontiguousarray(values).reshape(-1))
+        columns.append(pa.FixedSizeListArray.from_arrays(flat, num_joints * values.shape[2]))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def table_metadata(schema) -> Dict[str, Any]:
+    """The pose_skeletons metadata of an Arrow schema."""
+    if schema.metadata is None or METADATA_KEY not in schema.metadata:
+        raise ValueError("The table has no pose_skeletons metadata.")
+    return json.loads(schema.metadata[METADATA_KEY])
+
+
+def from_table(table) -> Tuple[SkeletonDefinition, Dict[str, np.ndarray]]:
+    """
+    Converts an Arrow table (or record batch) back to arrays.
+
+    Returns:
+        A tuple (definition, data): per-joint columns as (rows, joints, C)
+        arrays (C omitted for single-channel columns) and the scalar columns
+        present in the table as 1D arrays.
+    """
+    metadata = table_metadata(table.schema)
+    definition = definition_from_dict(metadata["definition"])
+    num_joints = len(definition.original_names)
+
+    data = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name in SCALAR_COLUMNS:
+            data[name] = column.to_numpy(zero_copy_only=False)
+            continue
+        if hasattr(column, "combine_chunks"):
+            column = column.combine_chunks()
+        count = metadata["channels"][name]
+        values = column.flatten().to_numpy(zero_copy_only=False).reshape(-1, num_joints, count)
+        data[name] = values[..., 0] if count == 1 else values
+    return definition, data
+
+
+def _filter_expression(filters):
+    if filters is None or not isinstance(filters, (list, tuple)):
+        return filters
+    return _pyarrow().parquet.filters_to_expression(filters)
+
+
+def write_parquet(path: str, definition: SkeletonDefinition, data: Dict[str, np.ndarray],
+                  frame: Optional[np.ndarray] = None, person_id: Optional[np.ndarray] = None,
+                  sequence_id: Optional[str] = None, fps: Optional[float] = None,
+                  row_group_size: int = 65536, compression: str = "zstd", dtype: str = "float32"):
+    """
+    Writes pose sequences to a Parquet file. See :func:`to_table` for the arguments.
+
+    Args:
+        row_group_size: Rows per row group, the unit query engines can skip.
+        compression: Parquet compression codec.
+    """
+    pa = _pyarrow()
+    table = to_table(definition, data, frame, person_id, sequence_id, fps, dtype)
+    with profiling.stage("arrow_io.write_parquet", frames=table.num_rows, nbytes=table.nbytes):
+        pa.parquet.write_table(table, path, row_group_size=row_group_size, compression=compression)
+
+
+def read_parquet(path: str, columns: Optional[Sequence[str]] = None,
+                 filters=None) -> Tuple[SkeletonDefinition, Dict[str, np.ndarray]]:
+    """
+    Reads pose sequences from Parquet files.
+
+    Args:
+        path: A Parquet file or a directory of them.
+        columns: Columns to read. Defaults to all.
+        filters: Row filters pushed down to the row groups, as a pyarrow
+            expression or in DNF form, e.g. [("person_id", "=", 3), ("time", "<", 10.0)].
+
+    Returns:
+        A tuple (definition, data), see :func:`from_table`.
+    """
+    pa = _pyarrow()
+    with profiling.stage("arrow_io.read_parquet") as s:
+        table = pa.parquet.read_table(path, columns=columns, filters=_filter_expression(filters))
+        s.frames = table.num_rows
+        s.nbytes = table.nbytes
+        return from_table(table)
+
+
+def iter_parquet(path: str, batch_size: int = 65536, columns: Optional[Sequence[str]] = None,
+                 filters=None) -> Iterator[Tuple[SkeletonDefinition, Dict[str, np.ndarray]]]:
+    """
+    Streams pose sequences from Parquet files in batches of at most
+    ``batch_size`` rows, for data that does not fit in memory.
+    """
+    _pyarrow()
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format="parquet")
+    for batch in dataset.to_batches(columns=columns, filter=_filter_expression(filters), batch_size=batch_size):
+        if batch.num_rows:
+            yield from_table(batch.replace_schema_metadata(dataset.schema.metadata))
+
+
+class ParquetPoseWriter:
+    """
+    Incremental Parquet writer for pose sequences of one skeleton, e.g. to
+    convert a large JSON archive clip by clip into one file.
+
+    Example:
+        with ParquetPoseWriter("poses.parquet", definition, {"positions": 3}, fps=30.0) as writer:
+            for clip_id, positions in clips:
+                writer.write({"positions": positions}, sequence_id=clip_id)
+    """
+
+    def __init__(self, path: str, definition: SkeletonDefinition, channels: Dict[str, int],
+                 fps: Optional[float] = None, row_group_size: int = 65536,
+                 compression: str = "zstd", dtype: str = "float32"):
+        pa = _pyarrow()
+        self.definition = definition
+        self.fps = fps
+        self.dtype = dtype
+        self.row_group_size = row_group_size
+        self.schema = pose_schema(definition, channels, fps, dtype)
+        self._writer = pa.parquet.ParquetWriter(path, self.schema, compression=compression)
+        self._pending: List[Any] = []
+        self._pending_rows = 0
+
+    def write(self, data: Dict[str, np.ndarray], frame: Optional[np.ndarray] = None,
+              person_id: Optional[np.ndarray] = None, sequence_id: Optional[str] = None):
+        """Appends rows; see :func:`to_table`. Rows are flushed in full row groups."""
+        table = to_table(self.definition, data, frame, person_id, sequence_id, self.fps, self.dtype)
+        if not table.schema.equals(self.schema, check_metadata=False):
+            raise ValueError(f"Columns {table.column_names} do not match the writer's schema {self.schema.names}.")
+        self._pending.append(table.replace_schema_metadata(self.schema.metadata))
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self._flush(full_groups_only=True)
+
+    def _flush(self, full_groups_only: bool = False):
+        if not self._pending:
+            return
+        pa = _pyarrow()
+        table = pa.concat_tables(self._pending)
+        rows = table.num_rows
+        if full_groups_only:
+            # Keep the remainder so every row group but the last one is full.
+            rows -= rows % self.row_group_size
+        with profiling.stage("arrow_io.write_row_groups", frames=rows, nbytes=table.nbytes):
+            self._writer.write_table(table.slice(0, rows), row_group_size=self.row_group_size)
+        rest = table.slice(rows)
+        self._pending = [rest] if rest.num_rows else []
+        self._pending_rows = rest.num_rows
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self) -> "ParquetPoseWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,238 @@
+"""
+Animation-layer operations on clips of local joint rotations: crossfades
+between clips, per-joint masked layering and time warping.
+
+Rotations are blended as quaternions with vectorized slerp over whole
+(frames, joints) arrays; other representations are converted on the way in
+and out. Clips have frames on the first axis.
+
+Example:
+    upper = subtree_weights(definition, "spine_mid")
+    waving_walk = layer(walk, wave, upper)
+    transition, root = crossfade(walk, run, overlap=12, a_root=walk_root, b_root=run_root)
+"""
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from . import profiling
+from .canonical import up_axis_index
+from .definition import STANDARD_JOINTS, SkeletonDefinition
+from .rotations import Order, convert_rotations, quaternion_conjugate, quaternion_multiply, quaternion_slerp
+
+
+_IDENTITY = np.array([1.0, 0.0, 0.0, 0.0])
+
+
+def _to_quaternions(rotations: np.ndarray, representation: str, definition: Optional[SkeletonDefinition],
+                    order: Optional[Order], degrees: bool) -> np.ndarray:
+    if representation == "quaternion":
+        q = np.asarray(rotations, dtype=np.float64)
+        return q / np.linalg.norm(q, axis=-1, keepdims=True)
+    return convert_rotations(rotations, representation, "quaternion", definition, order, degrees)
+
+
+def _from_quaternions(q: np.ndarray, representation: str, definition: Optional[SkeletonDefinition],
+                      order: Optional[Order], degrees: bool) -> np.ndarray:
+    if representation == "quaternion":
+        return q
+    return convert_rotations(q, "quaternion", representation, definition, order, degrees)
+
+
+def subtree_weights(definition: SkeletonDefinition, joint: Union[int, str], weight: float = 1.0) -> np.ndarray:
+    """
+    Per-joint layer weights selecting a joint and everything below it.
+
+    Args:
+        definition: The skeleton.
+        joint: Joint index, standard slot or joint name, e.g. "spine_mid" for the upper body.
+        weight: Weight of the selected joints; all others get 0.
+
+    Returns:
+        Array of shape (joints,).
+    """
+    if isinstance(joint, str):
+        name = joint
+        joint = getattr(definition, name) if name in STANDARD_JOINTS else \
+            definition.original_names.index(name) if name in definition.original_names else None
+        if joint is None:
+            raise ValueError(f"'{definition.name}' has no joint or mapped slot '{name}'.")
+    weights = np.zeros(definition.topology.num_joints)
+    weights[definition.topology.subtree(joint)] = weight
+    return weights
+
+
+def blend(a: np.ndarray, b: np.ndarray, weights: np.ndarray, representation: str = "quaternion",
+          definition: Optional[SkeletonDefinition] = None, order: Optional[Order] = None,
+          degrees: bool = True) -> np.ndarray:
+    """
+    Per-joint slerp between two poses or clips of the same skeleton.
+
+    Args:
+        a: Rotations in ``representation``, e.g. (frames, joints, 4).
+        b: Rotations of the same shape.
+        weights: Weight of ``b``, broadcasting against (frames, joints),
+            e.g. per joint (joints,) or per frame (frames, 1).
+        representation: One of rotations.REPRESENTATIONS.
+        definition: The skeleton, providing the Euler orders of Euler angles.
+        order: Explicit Euler order(s), overriding the definition.
+        degrees: Whether Euler angles are in degrees.
+    """
+    qa = _to_quaternions(a, representation, definition, order, degrees)
+    qb = _to_quaternions(b, representation, definition, order, degrees)
+    with profiling.stage("blending.blend", frames=qa.shape[0] if qa.ndim > 2 else 1, nbytes=qa.nbytes):
+        q = quaternion_slerp(qa, qb, np.broadcast_to(weights, qa.shape[:-1]))
+    return _from_quaternions(q, representation, definition, order, degrees)
+
+
+def layer(base: np.ndarray, overlay: np.ndarray, weights: np.ndarray, reference: Optional[np.ndarray] = None,
+          representation: str = "quaternion", definition: Optional[SkeletonDefinition] = None,
+          order: Optional[Order] = None, degrees: bool = True) -> np.ndarray:
+    """
+    Layers ``overlay`` onto ``base`` with per-joint weights.
+
+    Without ``reference`` the layer overrides the base (blended by the
+    weights). With a reference pose the layer is additive: the rotation of
+    ``overlay`` relative to ``reference`` is applied on top of ``base``.
+
+    Args:
+        base: Base rotations, e.g. (frames, joints, 4).
+        overlay: Layer rotations of the same shape.
+        weights: Layer weights broadcasting against (frames, joints), see
+            :func:`subtree_weights`.
+        reference: Reference pose of the additive layer, broadcasting against ``overlay``.
+        order: Explicit Euler order(s), overriding the definition.
+    """
+    if reference is None:
+        return blend(base, overlay, weights, representation, definition, order, degrees)
+    qbase = _to_quaternions(base, representation, definition, order, degrees)
+    qover = _to_quaternions(overlay, representation, definition, order, degrees)
+    qref = _to_quaternions(reference, representation, definition, order, degrees)
+    with profiling.stage("blending.layer", frames=qbase.shape[0] if qbase.ndim > 2 else 1, nbytes=qbase.nbytes):
+        delta = quaternion_multiply(quaternion_conjugate(qref), qover)
+        delta = quaternion_slerp(_IDENTITY, delta, np.broadcast_to(weights, delta.shape[:-1]))
+        q = quaternion_multiply(qbase, delta)
+    return _from_quaternions(q, representation, definition, order, degrees)
+
+
+def fade_curve(num_frames: int, curve: str = "smoothstep") -> np.ndarray:
+    """Weights rising from 0 to 1 over ``num_frames`` frames, "linear" or "smoothstep"."""
+    t = (np.arange(num_frames) + 1.0) / (num_frames + 1.0)
+    if curve == "linear":
+        return t
+    if curve == "smoothstep":
+        return t * t * (3.0 - 2.0 * t)
+    raise ValueError(f"Unknown fade curve '{curve}'. Use 'linear' or 'smoothstep'.")
+
+
+def crossfade(a: np.ndarray, b: np.ndarray, overlap: int, representation: str = "quaternion",
+              definition: Optional[SkeletonDefinition] = None, a_root: Optional[np.ndarray] = None,
+              b_root: Optional[np.ndarray] = None, curve: str = "smoothstep", align_root: bool = True,
+              up_axis: Optional[str] = "y", order: Optional[Order] = None,
+              degrees: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Transition from clip ``a`` to clip ``b``, blending the last ``overlap``
+    frames of ``a`` with the first ``overlap`` frames of ``b``.
+
+    Args:
+        a: Rotations of the first clip, (frames_a, joints, ...).
+        b: Rotations of the second clip, (frames_b, joints, ...).
+        overlap: Number of blended frames, at most the length of either clip.
+        representation: One of rotations.REPRESENTATIONS.
+        definition: The skeleton, providing the Euler orders of Euler angles.
+        a_root: Root positions of the first clip, (frames_a, 3).
+        b_root: Root positions of the second clip, (frames_b, 3).
+        curve: Fade curve, see :func:`fade_curve`.
+        align_root: Translate ``b_root`` so the second clip starts where the
+            first one is when the overlap begins.
+        up_axis: Axis kept unchanged by the alignment, so ``b`` keeps its
+            height. None aligns all three axes.
+        order: Explicit Euler order(s), overriding the definition.
+        degrees: Whether Euler angles are in degrees.
+
+    Returns:
+        A tuple (rotations, root) with frames_a + frames_b - overlap frames;
+        root is None unless both root trajectories are given.
+    """
+    if not 0 <= overlap <= min(len(a), len(b)):
+        raise ValueError(f"overlap must be between 0 and {min(len(a), len(b))}, got {overlap}.")
+    qa = _to_quaternions(a, representation, definition, order, degrees)
+    qb = _to_quaternions(b, representation, definition, order, degrees)
+    if qa.shape[1:] != qb.shape[1:]:
+        raise ValueError(f"Clips have different pose shapes {qa.shape[1:]} and {qb.shape[1:]}.")
+    split = len(qa) - overlap
+    weights = fade_curve(overlap, curve).reshape((-1,) + (1,) * (qa.ndim - 2))
+
+    with profiling.stage("blending.crossfade", frames=split + len(qb), nbytes=qa.nbytes + qb.nbytes):
+        q = np.concatenate([qa[:split], quaternion_slerp(qa[split:], qb[:overlap], weights), qb[overlap:]])
+
+    root = None
+    if a_root is not None and b_root is not None:
+        a_root = np.asarray(a_root, dtype=np.float64)
+        b_root = np.asarray(b_root, dtype=np.float64)
+        if align_root and len(a_root):
+            shift = a_root[split] - b_root[0] if overlap else a_root[-1] - b_root[0]
+            if up_axis is not None:
+                shift[up_axis_index(up_axis)] = 0.0
+            b_root = b_root + shift
+        fade = weights.reshape(-1, 1)
+        root = np.concatenate([a_root[:split], (1 - fade) * a_root[split:] + fade * b_root[:overlap],
+                               b_root[overlap:]])
+    return _from_quaternions(q, representation, definition, order, degrees), root
+
+
+def warp_indices(num_frames: int, speed: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Fractional source frame indices for playing a clip at varying speed.
+
+    Args:
+        num_frames: Frames of the source clip.
+        speed: Playback speed, a constant or one value per output frame.
+            Resampling from 120 to 30 fps is ``speed=4``.
+
+    Returns:
+        Increasing indices within [0, num_frames - 1], starting at 0.
+    """
+    if np.ndim(speed) == 0:
+        if speed <= 0:
+            raise ValueError("speed must be positive.")
+        return np.arange(0.0, num_frames - 1 + 1e-9, float(speed))
+    steps = np.asarray(speed, dtype=np.float64)
+    if np.any(steps < 0):
+        raise ValueError("speed must not be negative.")
+    indices = np.concatenate([[0.0], np.cumsum(steps[:-1])])
+    return indices[indices <= num_frames - 1]
+
+
+def time_warp(rotations: np.ndarray, indices: np.ndarray, representation: str = "quaternion",
+              definition: Optional[SkeletonDefinition] = None, root: Optional[np.ndarray] = None,
+              order: Optional[Order] = None,
+              degrees: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Samples a clip at fractional frame indices.
+
+    Rotations are slerped and root positions linearly interpolated between the
+    neighbouring frames. Indices may go backwards or repeat, e.g. for freezes
+    or for aligning a clip to a reference with a DTW path.
+
+    Args:
+        rotations: Rotations of the clip, (frames, joints, ...).
+        indices: Source frame per output frame, clipped to the clip's range.
+        root: Root positions of the clip, (frames, 3).
+        order: Explicit Euler order(s), overriding the definition.
+
+    Returns:
+        A tuple (rotations, root) with one frame per index; root is None
+        unless given.
+    """
+    q = _to_quaternions(rotations, representation, definition, order, degrees)
+    indices = np.clip(np.asarray(indices, dtype=np.float64), 0, len(q) - 1)
+    lower = np.floor(indices).astype(np.intp)
+    upper = np.minimum(lower + 1, len(q) - 1)
+    t = indices - lower
+    with profiling.stage("blending.time_warp", frames=len(indices), nbytes=q.nbytes):
+        warped = quaternion_slerp(q[lower], q[upper], t.reshape((-1,) + (1,) * (q.ndim - 2)))
+    if root is not None:
+        root = np.asarray(root, dtype=np.float64)
+        root = (1 - t[:, None]) * root[lower] + t[:, None] * root[upper]
+    return _from_quaternions(warped, representation, definition, order, degrees), root
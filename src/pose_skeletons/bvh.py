@@ -0,0 +1,171 @@
+"""
+Lightweight BVH parser.
+
+parse_bvh_hierarchy only reads the HIERARCHY section; parsing stops at the
+MOTION keyword so the motion block of large captures is never touched.
+parse_bvh also reads the motion block into a (frames, channels) array.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, TextIO, Tuple, Union
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+from .standard_mapping import guess_standard_mapping
+
+
+@dataclass
+class BvhHierarchy:
+    """Joint hierarchy of a BVH file in depth-first order."""
+    names: List[str] = field(default_factory=list)
+    parents: List[int] = field(default_factory=list)  # -1 for root
+    offsets: List[Tuple[float, float, float]] = field(default_factory=list)
+    channels: List[List[str]] = field(default_factory=list)  # empty for End Sites
+    is_end_site: List[bool] = field(default_factory=list)
+
+    @property
+    def rotation_orders(self) -> List[str]:
+        """Euler order of each joint's rotation channels, e.g. "ZXY"; "" for End Sites."""
+        return ["".join(c[0] for c in channels if c.lower().endswith("rotation")).upper()
+                for channels in self.channels]
+
+    def to_definition(self, name: str) -> SkeletonDefinition:
+        """Builds a SkeletonDefinition with a guessed standard joint mapping."""
+        mapping = guess_standard_mapping(self.names, self.parents)
+        return SkeletonDefinition(name, list(self.names), list(self.parents),
+                                  rotation_orders=self.rotation_orders, **mapping)
+
+
+@dataclass
+class BvhClip:
+    """A parsed BVH file: hierarchy, definition and motion channels."""
+    hierarchy: BvhHierarchy
+    definition: SkeletonDefinition
+    motion: np.ndarray  # (frames, channels) in the order of the hierarchy's CHANNELS
+    frame_time: float
+
+    @property
+    def fps(self) -> float:
+        return 1.0 / self.frame_time if self.frame_time > 0 else 0.0
+
+    @property
+    def num_frames(self) -> int:
+        return len(self.motion)
+
+
+def _tokens(lines: Iterable[str]):
+    for line in lines:
+        for token in line.replace("{", " { ").replace("}", " } ").split():
+            yield token
+
+
+def parse_bvh_hierarchy(source: Union[str, TextIO], end_sites: bool = False) -> BvhHierarchy:
+    """
+    Parses the joint hierarchy of a BVH file in a single pass.
+
+    The joint order matches bvhtoolbox's ``BvhTree.get_joints``: depth-first,
+    with a joint's End Site (named ``<joint>_End``) directly after the joint.
+
+    Args:
+        source: Path to a BVH file or an open text stream.
+        end_sites: Whether to include End Sites as joints.
+
+    Returns:
+        The parsed BvhHierarchy.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            return parse_bvh_hierarchy(f, end_sites)
+
+    with profiling.stage("bvh.parse_hierarchy") as s:
+        hierarchy = _parse_hierarchy(source, end_sites)
+        s.metadata["joints"] = len(hierarchy.names)
+    return hierarchy
+
+
+def _parse_hierarchy(source: TextIO, end_sites: bool) -> BvhHierarchy:
+    hierarchy = BvhHierarchy()
+    stack: List[int] = []  # indices of open joints, -2 for a skipped End Site
+    pending = None  # (name, is_end_site) waiting for its opening brace
+    tokens = _tokens(source)
+
+    for token in tokens:
+        if token == "MOTION":
+            break
+        if token in ("ROOT", "JOINT"):
+            pending = (next(tokens), False)
+        elif token == "End":
+            next(tokens)  # "Site"
+            parent = hierarchy.names[stack[-1]]
+            pending = (f"{parent}_End", True)
+        elif token == "{":
+            if pending is None:
+                continue  # scope without a joint, e.g. malformed whitespace
+            name, is_end = pending
+            pending = None
+            if is_end and not end_sites:
+                stack.append(-2)
+                continue
+            hierarchy.names.append(name)
+            hierarchy.parents.append(stack[-1] if stack else -1)
+            hierarchy.offsets.append((0.0, 0.0, 0.0))
+            hierarchy.channels.append([])
+            hierarchy.is_end_site.append(is_end)
+            stack.append(len(hierarchy.names) - 1)
+        elif token == "}":
+            stack.pop()
+        elif token == "OFFSET":
+            offset = tuple(float(next(tokens)) for _ in range(3))
+            if stack and stack[-1] >= 0:
+                hierarchy.offsets[stack[-1]] = offset
+        elif token == "CHANNELS":
+            count = int(next(tokens))
+            hierarchy.channels[stack[-1]] = [next(tokens) for _ in range(count)]
+
+    if not hierarchy.names:
+        raise ValueError("No ROOT joint found in BVH hierarchy.")
+    return hierarchy
+
+
+def parse_bvh(source: Union[str, TextIO], name: Optional[str] = None, end_sites: bool = False) -> BvhClip:
+    """
+    Parses a BVH file including its motion block.
+
+    Args:
+        source: Path to a BVH file or an open text stream.
+        name: Name of the resulting definition. Defaults to the file name
+            without extension ("bvh" for streams).
+        end_sites: Whether to include End Sites as joints.
+
+    Returns:
+        The parsed BvhClip.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            name = name or os.path.splitext(os.path.basename(source))[0]
+            return parse_bvh(f, name, end_sites)
+
+    with profiling.stage("bvh.parse") as s:
+        hierarchy = _parse_hierarchy(source, end_sites)
+        header = {}
+        while len(header) < 2:
+            line = source.readline()
+            if not line:
+                raise ValueError("Unexpected end of file in the BVH MOTION header.")
+            key, _, value = line.partition(":")
+            if value:
+                header[key.strip().lower()] = value.strip()
+        num_frames = int(header["frames"])
+        frame_time = float(header["frame time"])
+
+        num_channels = sum(len(c) for c in hierarchy.channels)
+        values = np.array(source.read().split(), dtype=np.float64)
+        if len(values) < num_frames * num_channels:
+            raise ValueError(f"Expected {num_frames} frames of {num_channels} channels, "
+                             f"got {len(values)} values.")
+        motion = values[:num_frames * num_channels].reshape(num_frames, num_channels)
+        s.frames = num_frames
+        s.nbytes = motion.nbytes
+    return BvhClip(hierarchy, hierarchy.to_definition(name or "bvh"), motion, frame_time)
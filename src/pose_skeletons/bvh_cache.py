@@ -0,0 +1,228 @@
+"""
+Persistent cache of parsed BVH clips.
+
+Each parsed clip is stored once as a binary sidecar: a JSON header with the
+hierarchy and definition followed by the raw float64 motion array. A sidecar
+is named by the SHA-256 of the BVH file contents. A small reference file,
+keyed by path, size and modification time, points at it, so unchanged files
+are found without reading them. Files that were touched or copied but not
+edited are found by their content hash without reparsing.
+
+The cache is bounded by total size; the least recently used sidecars are
+evicted first.
+
+Example:
+    cache = BvhCache(max_bytes=4 << 30)
+    clip = cache.load("take_012.bvh")     # parsed on the first call only
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+from typing import Optional
+
+import numpy as np
+
+from . import profiling
+from .bvh import BvhClip, BvhHierarchy, parse_bvh
+from .loader import atomic_file, default_cache_dir, definition_from_dict, definition_to_dict
+
+
+MAGIC = b"PSKB"
+VERSION = 1
+_HEADER = struct.Struct("<4sHQ")  # magic, version, JSON header length
+_ALIGNMENT = 64
+
+
+def _stat_key(path: str) -> str:
+    stat = os.stat(path)
+    payload = repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_sidecar(path: str, clip: BvhClip):
+    """Writes a clip in the cache's binary format, atomically."""
+    header = json.dumps({
+        "hierarchy": {
+            "names": clip.hierarchy.names,
+            "parents": clip.hierarchy.parents,
+            "offsets": clip.hierarchy.offsets,
+            "channels": clip.hierarchy.channels,
+            "is_end_site": clip.hierarchy.is_end_site,
+        },
+        "definition": definition_to_dict(clip.definition),
+        "frame_time": clip.frame_time,
+        "shape": list(clip.motion.shape),
+    }).encode("utf-8")
+    start = _HEADER.size + len(header)
+    padding = -start % _ALIGNMENT
+
+    with atomic_file(path) as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(header) + padding))
+        f.write(header + b" " * padding)
+        f.write(np.ascontiguousarray(clip.motion, dtype="<f8").tobytes())
+
+
+def read_sidecar(path: str, mmap: bool = False) -> BvhClip:
+    """
+    Reads a clip written by write_sidecar.
+
+    Args:
+        mmap: Memory-map the motion array instead of reading it.
+    """
+    with open(path, "rb") as f:
+        magic, version, header_length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a BVH cache entry of version {VERSION}.")
+        header = json.loads(f.read(header_length))
+        shape = tuple(header["shape"])
+        offset = _HEADER.size + header_length
+        if mmap:
+            motion = np.memmap(path, dtype="<f8", mode="r", offset=offset, shape=shape)
+        else:
+            motion = np.fromfile(f, dtype="<f8", count=int(np.prod(shape))).reshape(shape)
+    if motion.size != int(np.prod(shape)):
+        raise ValueError(f"'{path}' is truncated.")
+
+    h = header["hierarchy"]
+    hierarchy = BvhHierarchy(h["names"], h["parents"], [tuple(o) for o in h["offsets"]],
+                             h["channels"], h["is_end_site"])
+    return BvhClip(hierarchy, definition_from_dict(header["definition"]), motion, header["frame_time"])
+
+
+class BvhCache:
+    """
+    Size-bounded on-disk cache of parsed BVH clips.
+
+    Safe to share between processes: entries are written atomically and a
+    missing or corrupt entry is simply reparsed.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 2 << 30,
+                 end_sites: bool = False, mmap: bool = False):
+        """
+        Args:
+            cache_dir: Cache directory. Defaults to ``bvh`` in default_cache_dir().
+            max_bytes: Total size of the sidecars kept.
+            end_sites: Whether parsed hierarchies include End Sites.
+            mmap: Memory-map cached motion arrays instead of reading them.
+        """
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "bvh")
+        self.max_bytes = max_bytes
+        self.end_sites = end_sites
+        self.mmap = mmap
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, content_hash: str) -> str:
+        suffix = "_end" if self.end_sites else ""
+        return os.path.join(self.cache_dir, f"{content_hash}{suffix}.pskb")
+
+    def _ref_path(self, stat_key: str) -> str:
+        return os.path.join(self.cache_dir, f"{stat_key}.ref")
+
+    def _read_entry(self, entry: str, name: str) -> Optional[BvhClip]:
+        try:
+            clip = read_sidecar(entry, self.mmap)
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(entry)  # mark as recently used for eviction
+        if clip.definition.name != name:
+            clip.definition = definition_from_dict({**definition_to_dict(clip.definition), "name": name})
+        return clip
+
+    def load(self, path: str, name: Optional[str] = None) -> BvhClip:
+        """
+        Returns the parsed clip of a BVH file, parsing it only on a cache miss.
+
+        Args:
+            path: The BVH file.
+            name: Name of the definition. Defaults to the file name without extension.
+        """
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        ref_path = self._ref_path(_stat_key(path))
+
+        # Fast path: the file is unchanged since it was cached.
+        try:
+            with open(ref_path) as f:
+                entry = self._entry_path(f.read().strip())
+            clip = self._read_entry(entry, name)
+            if clip is not None:
+                self.hits += 1
+                return clip
+        except OSError:
+            pass
+
+        with open(path, "rb") as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        entry = self._entry_path(content_hash)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        clip = self._read_entry(entry, name)
+        if clip is None:
+            self.misses += 1
+            with profiling.stage("bvh_cache.parse", nbytes=len(data)):
+                clip = parse_bvh(io.StringIO(data.decode("utf-8", errors="replace")), name, self.end_sites)
+            write_sidecar(entry, clip)
+            self.evict()
+        else:
+            self.hits += 1
+
+        with atomic_file(ref_path) as f:
+            f.write(content_hash.encode("ascii"))
+        return clip
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used sidecars until the cache fits in
+        ``max_bytes``, along with references to missing sidecars.
+
+        Returns:
+            The number of bytes freed.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return 0
+        entries = []
+        for file_name in names:
+            if file_name.endswith(".pskb"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, file_name))
+
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, file_name in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+                freed += size
+            except OSError:
+                pass
+
+        if freed:
+            alive = set(os.listdir(self.cache_dir))
+            for file_name in names:
+                if not file_name.endswith(".ref"):
+                    continue
+                ref_path = os.path.join(self.cache_dir, file_name)
+                try:
+                    with open(ref_path) as f:
+                        content_hash = f.read().strip()
+                    if f"{content_hash}.pskb" not in alive and f"{content_hash}_end.pskb" not in alive:
+                        os.remove(ref_path)
+                except OSError:
+                    pass
+        return freed
+
+    def clear(self):
+        """Removes all cache files."""
+        for file_name in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+            if file_name.endswith((".pskb", ".ref")):
+                os.remove(os.path.join(self.cache_dir, file_name))
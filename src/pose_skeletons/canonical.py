@@ -0,0 +1,150 @@
+"""
+Root-motion canonicalization: removing global translation and facing (yaw)
+from whole batches of poses or clips.
+
+The facing direction is taken from the right-to-left hip axis, or from the
+shoulders for layouts or frames where the hips are missing (e.g. Coco17
+detections with occluded hips). Canonical poses have that axis along the
+first horizontal axis (x for "y" or "z" up, y for "x" up).
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+
+
+_UP_AXES = {"x": 0, "y": 1, "z": 2}
+
+
+def up_axis_index(up_axis: str) -> int:
+    """
+    Index of an up axis name in (x, y, z) coordinates.
+
+    Raises:
+        ValueError: If ``up_axis`` is not "x", "y" or "z".
+    """
+    if up_axis not in _UP_AXES:
+        raise ValueError(f"Unknown up axis '{up_axis}'. Expected one of {list(_UP_AXES)}.")
+    return _UP_AXES[up_axis]
+
+
+def yaw_matrices(yaw: np.ndarray, up_axis: str = "y") -> np.ndarray:
+    """Right-handed rotation matrices about the up axis, shape (..., 3, 3)."""
+    up = up_axis_index(up_axis)
+    a, b = (up + 1) % 3, (up + 2) % 3
+    yaw = np.asarray(yaw, dtype=np.float64)
+    c, s = np.cos(yaw), np.sin(yaw)
+    m = np.zeros(yaw.shape + (3, 3))
+    m[..., up, up] = 1.0
+    m[..., a, a] = c
+    m[..., a, b] = -s
+    m[..., b, a] = s
+    m[..., b, b] = c
+    return m
+
+
+def _root_and_across(positions: np.ndarray, definition: SkeletonDefinition) -> Tuple[np.ndarray, np.ndarray]:
+    """Root position and right-to-left body axis per pose, from the hips or shoulders."""
+    hips = definition.l_hip is not None and definition.r_hip is not None
+    shoulders = definition.l_shoulder is not None and definition.r_shoulder is not None
+    if not hips and not shoulders:
+        raise ValueError(f"'{definition.name}' needs l_hip/r_hip or l_shoulder/r_shoulder to normalize facing.")
+
+    if shoulders:
+        left, right = positions[..., definition.l_shoulder, :], positions[..., definition.r_shoulder, :]
+        root, across = 0.5 * (left + right), left - right
+    if hips:
+        left, right = positions[..., definition.l_hip, :], positions[..., definition.r_hip, :]
+        hip_root = positions[..., definition.hips, :] if definition.hips is not None else 0.5 * (left + right)
+        hip_across = left - right
+        if shoulders:
+            # Per pose, fall back to the shoulders where a hip joint is missing (NaN).
+            missing = ~np.all(np.isfinite(hip_root) & np.isfinite(hip_across), axis=-1, keepdims=True)
+            root = np.where(missing, root, hip_root)
+            across = np.where(missing, across, hip_across)
+        else:
+            root, across = hip_root, hip_across
+    return root, across
+
+
+@dataclass(frozen=True)
+class RootTransform:
+    """
+    The translation and yaw removed by :func:`canonicalize`.
+
+    ``translation`` has shape (..., 3) and ``yaw`` shape (...), with one entry
+    per pose ("frame" mode) or a singleton frame axis per clip ("clip" mode),
+    so both broadcast against the joint positions they were computed from.
+    """
+    translation: np.ndarray
+    yaw: np.ndarray
+    up_axis: str = "y"
+
+    def matrices(self) -> np.ndarray:
+        """Rotation from canonical to world space, shape (..., 3, 3)."""
+        return yaw_matrices(self.yaw, self.up_axis)
+
+    def apply(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Maps canonical positions of shape (..., joints, 3) back to world space.
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        world = np.einsum("...ij,...kj->...ki", self.matrices(), positions)
+        return world + self.translation[..., None, :]
+
+    def invert(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Maps world positions of shape (..., joints, 3) to canonical space, e.g.
+        to express a second clip in the frame of the first.
+        """
+        positions = np.asarray(positions, dtype=np.float64) - self.translation[..., None, :]
+        return np.einsum("...ji,...kj->...ki", self.matrices(), positions)
+
+
+def canonicalize(positions: np.ndarray, definition: SkeletonDefinition,
+                 up_axis: str = "y", mode: str = "frame",
+                 keep_height: bool = False) -> Tuple[np.ndarray, RootTransform]:
+    """
+    Removes global translation and facing from joint positions.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3). In "clip" mode
+            the shape is (..., frames, joints, 3).
+        definition: The skeleton of the positions.
+        up_axis: The vertical axis, "x", "y" or "z".
+        mode: "frame" canonicalizes every pose independently. "clip" applies
+            the transform of the first frame to the whole clip, preserving
+            the motion of the root within the clip.
+        keep_height: Only remove the horizontal translation, so the root keeps
+            its height above the ground.
+
+    Returns:
+        A tuple (canonical, transform) with canonical positions of the input
+        shape and the RootTransform that maps them back:
+        ``transform.apply(canonical)`` reproduces ``positions``.
+    """
+    if mode not in ("frame", "clip"):
+        raise ValueError(f"Unknown canonicalization mode '{mode}'. Expected 'frame' or 'clip'.")
+    positions = np.asarray(positions, dtype=np.float64)
+    if mode == "clip" and positions.ndim < 3:
+        raise ValueError(f"'clip' mode needs positions of shape (..., frames, joints, 3), got {positions.shape}.")
+    up = up_axis_index(up_axis)
+
+    with profiling.stage("canonicalize", frames=int(np.prod(positions.shape[:-2])), nbytes=positions.nbytes):
+        root, across = _root_and_across(positions, definition)
+        if mode == "clip":
+            root, across = root[..., :1, :], across[..., :1, :]
+
+        # Yaw of the right-to-left axis, measured from the first horizontal axis.
+        a, b = (up + 1) % 3, (up + 2) % 3
+        reference = 0.0 if a < b else 0.5 * np.pi
+        yaw = np.arctan2(across[..., b], across[..., a]) - reference
+
+        translation = root.copy()
+        if keep_height:
+            translation[..., up] = 0.0
+        transform = RootTransform(translation, yaw, up_axis)
+        return transform.invert(positions), transform
@@ -0,0 +1,332 @@
+"""
+Compact binary codec for skeletal motion.
+
+Rotations are stored as smallest-three quantized quaternions with a per-joint
+bit depth, delta coded along time and compressed in independent chunks so
+that any frame range can be decoded without touching the rest of the file.
+
+Layout (little endian):
+
+    header   magic, version, skeleton name, joint/frame/chunk counts,
+             position step, per-joint bit depths
+    index    (offset, length) of every chunk, relative to the data section
+    data     zlib compressed chunks
+"""
+import io
+import struct
+import zlib
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+
+
+MAGIC = b"PSKC"
+VERSION = 1
+
+# Bit depths per smallest-three component.
+ROOT_BITS = 16
+STANDARD_BITS = 14
+DEFAULT_BITS = 12
+COARSE_BITS = 9
+
+# Joints whose names contain one of these keywords are facial landmarks
+# (e.g. the Smplx contour, lip and brow points) and get the coarse precision.
+COARSE_KEYWORDS = ("contour", "brow", "lip", "mouth", "nose", "eye")
+
+_SQRT2 = np.sqrt(2.0)
+_HEADER = struct.Struct("<4sHH")
+_COUNTS = struct.Struct("<IQIBd")
+_CHUNK_ENTRY = struct.Struct("<QQ")
+_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def default_joint_bits(definition: SkeletonDefinition,
+                       overrides: Optional[Dict[str, int]] = None) -> np.ndarray:
+    """
+    Chooses a quantization bit depth for every joint of a skeleton.
+
+    The root (``hips``) gets the finest precision since its error propagates
+    to the whole body, the other standard joints come next, facial landmarks
+    get the coarsest precision and everything else uses the default.
+
+    Args:
+        definition: The skeleton the motion belongs to.
+        overrides: Optional mapping of joint name to bit depth.
+
+    Returns:
+        A uint8 array with one bit depth (2-16) per joint.
+    """
+    bits = np.full(len(definition.original_names), DEFAULT_BITS, dtype=np.uint8)
+
+    for i, name in enumerate(definition.original_names):
+        lowered = name.lower()
+        if any(keyword in lowered for keyword in COARSE_KEYWORDS):
+            bits[i] = COARSE_BITS
+
+    bits[definition.get_ordered_indices()] = STANDARD_BITS
+    if definition.hips is not None:
+        bits[definition.hips] = ROOT_BITS
+
+    for name, value in (overrides or {}).items():
+        bits[definition.original_names.index(name)] = value
+
+    if bits.min() < 2 or bits.max() > 16:
+        raise ValueError("Joint bit depths must be between 2 and 16.")
+    return bits
+
+
+def quantize_quaternions(quaternions: np.ndarray, bits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Smallest-three quantization of unit quaternions.
+
+    Args:
+        quaternions: Array of shape (frames, joints, 4), scalar first (w, x, y, z).
+        bits: Bit depth per joint, shape (joints,).
+
+    Returns:
+        A tuple (largest, values) where ``largest`` (frames, joints) holds the
+        index of the dropped component and ``values`` (frames, joints, 3) the
+        quantized remaining components.
+    """
+    q = quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    largest = np.argmax(np.abs(q), axis=-1)
+    sign = np.where(np.take_along_axis(q, largest[..., None], axis=-1) < 0, -1.0, 1.0)
+    q = q * sign
+
+    keep = _remaining_components(largest)
+    small = np.take_along_axis(q, keep, axis=-1)
+
+    scale = ((1 << bits.astype(np.int64)) - 1)[None, :, None]
+    values = np.rint((np.clip(small * _SQRT2, -1.0, 1.0) + 1.0) * 0.5 * scale)
+    return largest.astype(np.uint8), values.astype(np.int64)
+
+
+def dequantize_quaternions(largest: np.ndarray, values: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """Inverse of :func:`quantize_quaternions`."""
+    scale = ((1 << bits.astype(np.int64)) - 1)[None, :, None]
+    small = (values / scale * 2.0 - 1.0) / _SQRT2
+    dropped = np.sqrt(np.clip(1.0 - np.sum(small * small, axis=-1), 0.0, 1.0))
+
+    q = np.empty(largest.shape + (4,), dtype=np.float64)
+    keep = _remaining_components(largest.astype(np.int64))
+    np.put_along_axis(q, keep, small, axis=-1)
+    np.put_along_axis(q, largest[..., None].astype(np.int64), dropped[..., None], axis=-1)
+    return q
+
+
+def _remaining_components(largest: np.ndarray) -> np.ndarray:
+    """Indices of the three components kept next to the dropped one."""
+    base = np.arange(3)
+    return base + (base >= largest[..., None])
+
+
+def _pack_ints(values: np.ndarray) -> bytes:
+    """Stores an int array with the narrowest dtype that holds it."""
+    peak = int(np.abs(values).max()) if values.size else 0
+    for code, dtype in enumerate(_INT_TYPES):
+        if peak <= np.iinfo(dtype).max:
+            return bytes([code]) + values.astype(dtype).tobytes()
+    raise ValueError("Value range too large to encode.")
+
+
+def _unpack_ints(buffer: memoryview, count: int) -> Tuple[np.ndarray, int]:
+    """Reads an array written by :func:`_pack_ints`; returns it and the bytes consumed."""
+    dtype = np.dtype(_INT_TYPES[buffer[0]])
+    size = count * dtype.itemsize
+    values = np.frombuffer(buffer[1:1 + size], dtype=dtype).astype(np.int64)
+    return values, 1 + size
+
+
+def _encode_chunk(largest: np.ndarray, values: np.ndarray,
+                  positions: Optional[np.ndarray], level: int) -> bytes:
+    """Delta codes one block of frames along time and compresses it."""
+    parts = [largest.tobytes(), _pack_ints(np.diff(values, axis=0, prepend=0))]
+    if positions is not None:
+        parts.append(_pack_ints(np.diff(positions, axis=0, prepend=0)))
+    return zlib.compress(b"".join(parts), level)
+
+
+def _decode_chunk(payload: bytes, frames: int, joints: int,
+                  has_positions: bool) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Inverse of :func:`_encode_chunk`."""
+    buffer = memoryview(zlib.decompress(payload))
+    count = frames * joints
+    largest = np.frombuffer(buffer[:count], dtype=np.uint8).reshape(frames, joints)
+    cursor = count
+
+    deltas, used = _unpack_ints(buffer[cursor:], count * 3)
+    cursor += used
+    values = np.cumsum(deltas.reshape(frames, joints, 3), axis=0)
+
+    positions = None
+    if has_positions:
+        deltas, used = _unpack_ints(buffer[cursor:], frames * 3)
+        positions = np.cumsum(deltas.reshape(frames, 3), axis=0)
+    return largest, values, positions
+
+
+def encode_motion(definition: SkeletonDefinition,
+                  rotations: np.ndarray,
+                  root_positions: Optional[np.ndarray] = None,
+                  bits: Optional[np.ndarray] = None,
+                  chunk_size: int = 256,
+                  position_step: float = 1e-4,
+                  level: int = 6) -> bytes:
+    """
+    Compresses a motion clip.
+
+    Args:
+        definition: The skeleton the motion belongs to.
+        rotations: Local joint rotations as unit quaternions (w, x, y, z),
+            shape (frames, joints, 4).
+        root_positions: Optional root translation per frame, shape (frames, 3).
+        bits: Per-joint bit depths. Defaults to :func:`default_joint_bits`.
+        chunk_size: Number of frames per independently decodable block.
+        position_step: Quantization step for root positions, in scene units.
+        level: zlib compression level.
+
+    Returns:
+        The encoded motion as bytes.
+    """
+    rotations = np.asarray(rotations, dtype=np.float64)
+    num_joints = len(definition.original_names)
+    if rotations.ndim != 3 or rotations.shape[1:] != (num_joints, 4):
+        raise ValueError(f"Expected rotations of shape (frames, {num_joints}, 4), "
+                         f"got {rotations.shape}.")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive.")
+
+    bits = default_joint_bits(definition) if bits is None else np.asarray(bits, dtype=np.uint8)
+    num_frames = rotations.shape[0]
+    largest, values = quantize_quaternions(rotations, bits)
+
+    quantized_positions = None
+    if root_positions is not None:
+        root_positions = np.asarray(root_positions, dtype=np.float64)
+        if root_positions.shape != (num_frames, 3):
+            raise ValueError(f"Expected root_positions of shape ({num_frames}, 3), "
+                             f"got {root_positions.shape}.")
+        quantized_positions = np.rint(root_positions / position_step).astype(np.int64)
+
+    chunks: List[bytes] = []
+    with profiling.stage("codec.encode_chunks", frames=num_frames, nbytes=rotations.nbytes) as s:
+        for start in range(0, num_frames, chunk_size):
+            stop = min(start + chunk_size, num_frames)
+            positions = None if quantized_positions is None else quantized_positions[start:stop]
+            chunks.append(_encode_chunk(largest[start:stop], values[start:stop], positions, level))
+        s.metadata["encoded_bytes"] = sum(len(chunk) for chunk in chunks)
+
+    name = definition.name.encode("utf-8")
+    out = io.BytesIO()
+    out.write(_HEADER.pack(MAGIC, VERSION, len(name)))
+    out.write(name)
+    out.write(_COUNTS.pack(num_joints, num_frames, chunk_size,
+                           int(root_positions is not None), position_step))
+    out.write(bits.tobytes())
+
+    offset = 0
+    for chunk in chunks:
+        out.write(_CHUNK_ENTRY.pack(offset, len(chunk)))
+        offset += len(chunk)
+    for chunk in chunks:
+        out.write(chunk)
+    return out.getvalue()
+
+
+class MotionArchive:
+    """
+    Random-access reader for motion encoded with :func:`encode_motion`.
+
+    Only the header and chunk index are read up front; frame ranges are
+    decoded on demand from the chunks that overlap them.
+    """
+
+    def __init__(self, source: Union[bytes, BinaryIO]):
+        self._file = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+        magic, version, name_length = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not an encoded motion stream.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported motion codec version: {version}")
+
+        self.skeleton_name = self._file.read(name_length).decode("utf-8")
+        (self.num_joints, self.num_frames, self.chunk_size,
+         has_positions, self.position_step) = _COUNTS.unpack(self._file.read(_COUNTS.size))
+        self.has_positions = bool(has_positions)
+        self.bits = np.frombuffer(self._file.read(self.num_joints), dtype=np.uint8)
+
+        num_chunks = -(-self.num_frames // self.chunk_size)
+        index = self._file.read(num_chunks * _CHUNK_ENTRY.size)
+        self._chunks = [_CHUNK_ENTRY.unpack_from(index, i * _CHUNK_ENTRY.size)
+                        for i in range(num_chunks)]
+        self._data_start = self._file.tell()
+
+    @classmethod
+    def open(cls, path: str) -> "MotionArchive":
+        """Opens an encoded motion file for random access."""
+        return cls(open(path, "rb"))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "MotionArchive":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.num_frames
+
+    def read(self, start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Decodes a range of frames.
+
+        Args:
+            start: First frame to decode.
+            stop: One past the last frame to decode. Defaults to the end of the clip.
+
+        Returns:
+            A tuple (rotations, root_positions) with rotations of shape
+            (frames, joints, 4) and root positions of shape (frames, 3), or
+            None if the clip was encoded without them.
+        """
+        stop = self.num_frames if stop is None else min(stop, self.num_frames)
+        start = max(start, 0)
+        if start >= stop:
+            empty = np.empty((0, self.num_joints, 4))
+            return empty, (np.empty((0, 3)) if self.has_positions else None)
+
+        first, last = start // self.chunk_size, (stop - 1) // self.chunk_size
+        rotations, positions = [], []
+        with profiling.stage("codec.decode_chunks", frames=stop - start, chunks=last - first + 1):
+            for chunk in range(first, last + 1):
+                offset, length = self._chunks[chunk]
+                self._file.seek(self._data_start + offset)
+                frames = min(self.chunk_size, self.num_frames - chunk * self.chunk_size)
+                largest, values, root = _decode_chunk(self._file.read(length), frames,
+                                                      self.num_joints, self.has_positions)
+                rotations.append(dequantize_quaternions(largest, values, self.bits))
+                if root is not None:
+                    positions.append(root * self.position_step)
+
+        offset = first * self.chunk_size
+        rotations = np.concatenate(rotations)[start - offset:stop - offset]
+        if not self.has_positions:
+            return rotations, None
+        return rotations, np.concatenate(positions)[start - offset:stop - offset]
+
+
+def decode_motion(data: bytes, start: int = 0,
+                  stop: Optional[int] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Decodes motion produced by :func:`encode_motion`.
+
+    Returns:
+        A tuple (rotations, root_positions), see :meth:`MotionArchive.read`.
+    """
+    return MotionArchive(data).read(start, stop)
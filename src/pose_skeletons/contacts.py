@@ -0,0 +1,164 @@
+"""
+Foot-contact labeling and ground-plane estimation for whole clips.
+
+Contacts are detected on the standard ``l_ankle``/``l_foot``/``r_ankle``/
+``r_foot`` joints plus heel and toe landmarks where a layout has them
+(e.g. ``LeftHeel``/``LeftBigToe`` on Smplx, ``LeftHeel`` on MediaPipe33).
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .canonical import up_axis_index
+from .definition import SkeletonDefinition
+
+
+# Extra foot landmarks, matched on lowercase names with separators removed.
+_EXTRA_FOOT_NAMES = ("heel", "bigtoe", "smalltoe")
+
+
+def foot_joints(definition: SkeletonDefinition) -> Dict[str, List[int]]:
+    """
+    Joints used for contact detection on each foot.
+
+    Returns:
+        {"left": [...], "right": [...]} with joint indices, standard slots first.
+    """
+    feet = {}
+    for side, prefix in (("left", "l"), ("right", "r")):
+        joints = [getattr(definition, f"{prefix}_{slot}") for slot in ("ankle", "foot")]
+        joints = [j for j in joints if j is not None]
+        for i, name in enumerate(definition.original_names):
+            key = name.lower().replace("_", "")
+            if key in (f"{side}{extra}" for extra in _EXTRA_FOOT_NAMES) and i not in joints:
+                joints.append(i)
+        feet[side] = joints
+    if not feet["left"] or not feet["right"]:
+        raise ValueError(f"'{definition.name}' maps no ankle or foot joints on at least one side.")
+    return feet
+
+
+def fit_ground_plane(points: np.ndarray, up_axis: str = "y", threshold: float = 0.02,
+                     hypotheses: int = 256, max_points: int = 20000,
+                     seed: int = 0) -> Tuple[np.ndarray, float]:
+    """
+    Robustly fits a plane to candidate ground points (e.g. foot joints of a clip).
+
+    All RANSAC hypotheses are scored at once; the best one is refined with a
+    least-squares fit to its inliers.
+
+    Args:
+        points: Candidate points of shape (..., 3); all leading dimensions are pooled.
+        up_axis: The vertical axis; the returned normal points along it.
+        threshold: Inlier distance, in the units of the points.
+        hypotheses: Number of RANSAC hypotheses.
+        max_points: Points are subsampled to this count for scoring.
+        seed: Seed for sampling.
+
+    Returns:
+        A tuple (normal, offset) with unit ``normal`` so that the signed
+        height of a point x above the ground is ``normal @ x + offset``.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    points = points[np.all(np.isfinite(points), axis=1)]
+    if len(points) < 3:
+        raise ValueError("At least three finite points are needed to fit a ground plane.")
+    up = np.zeros(3)
+    up[up_axis_index(up_axis)] = 1.0
+
+    rng = np.random.default_rng(seed)
+    if len(points) > max_points:
+        points = points[rng.choice(len(points), max_points, replace=False)]
+
+    samples = points[rng.integers(0, len(points), size=(hypotheses, 3))]
+    normals = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths > 1e-9
+    normals = normals[valid] / lengths[valid, None]
+    if len(normals) == 0:
+        normals, offsets = up[None], np.array([-np.median(points @ up)])
+    else:
+        offsets = -np.sum(normals * samples[valid, 0], axis=1)
+
+    inliers = np.abs(normals @ points.T + offsets[:, None]) < threshold
+    best = inliers[np.argmax(inliers.sum(axis=1))]
+    if best.sum() < 3:
+        best = np.ones(len(points), dtype=bool)
+
+    # Least-squares refinement: the normal is the direction of least variance.
+    selected = points[best]
+    centroid = selected.mean(axis=0)
+    _, spread, vt = np.linalg.svd(selected - centroid, full_matrices=False)
+    if spread[1] / np.sqrt(len(selected)) < threshold:
+        # Inliers are (nearly) collinear, e.g. a subject standing still; the tilt
+        # is undetermined so assume a horizontal ground through them.
+        return up, float(-np.median(selected @ up))
+    normal = vt[-1]
+    if normal @ up < 0:
+        normal = -normal
+    return normal, float(-normal @ centroid)
+
+
+def foot_contacts(positions: np.ndarray, definition: SkeletonDefinition, fps: float,
+                  velocity_threshold: float = 0.15, height_threshold: float = 0.05,
+                  up_axis: str = "y", ground: Optional[Tuple[np.ndarray, float]] = None,
+                  per_joint: bool = False) -> np.ndarray:
+    """
+    Labels foot contacts from joint speed and height above the ground.
+
+    A foot joint is in contact when it moves slower than ``velocity_threshold``
+    and is lower than ``height_threshold`` above the ground plane.
+
+    Args:
+        positions: Joint positions of shape (..., frames, joints, 3). Leading
+            dimensions are independent clips.
+        definition: The skeleton of the positions.
+        fps: Frame rate, to express the velocity threshold in units per second.
+        velocity_threshold: Maximum speed of a joint in contact (units/second).
+        height_threshold: Maximum height of a joint in contact (units).
+        up_axis: The vertical axis.
+        ground: Optional (normal, offset) plane shared by all clips. By default
+            a plane is fitted per clip with fit_ground_plane.
+        per_joint: Return one label per foot joint instead of per foot.
+
+    Returns:
+        Boolean array of shape (..., frames, 2) for the left and right foot,
+        or (..., frames, K) for the joints of foot_joints (left then right)
+        if ``per_joint`` is set.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    feet = foot_joints(definition)
+    joints = np.array(feet["left"] + feet["right"], dtype=np.intp)
+    feet_positions = positions[..., joints, :]
+
+    velocity = np.gradient(feet_positions, axis=-3) * fps if positions.shape[-3] > 1 \
+        else np.zeros_like(feet_positions)
+    slow = np.linalg.norm(velocity, axis=-1) < velocity_threshold
+
+    if ground is not None:
+        normal, offset = ground
+        height = feet_positions @ np.asarray(normal) + offset
+    else:
+        # Per frame and foot, the lowest still joint is the best ground sample.
+        n_left = len(feet["left"])
+        up = feet_positions[..., up_axis_index(up_axis)]
+        lowest = np.stack([np.argmin(up[..., :n_left], axis=-1),
+                           n_left + np.argmin(up[..., n_left:], axis=-1)], axis=-1)
+        samples = np.take_along_axis(feet_positions, lowest[..., None], axis=-2)
+        samples_slow = np.take_along_axis(slow, lowest, axis=-1)
+
+        clips = feet_positions.reshape((-1,) + feet_positions.shape[-3:])
+        samples = samples.reshape((len(clips), -1, 3))
+        samples_slow = samples_slow.reshape((len(clips), -1))
+        height = np.empty(clips.shape[:-1])
+        for i in range(len(clips)):
+            candidates = samples[i][samples_slow[i]] if samples_slow[i].sum() >= 3 else samples[i]
+            normal, offset = fit_ground_plane(candidates, up_axis, threshold=height_threshold * 0.5)
+            height[i] = clips[i] @ normal + offset
+        height = height.reshape(slow.shape)
+
+    contacts = slow & (height < height_threshold)
+    if per_joint:
+        return contacts
+    n_left = len(feet["left"])
+    return np.stack([contacts[..., :n_left].any(axis=-1), contacts[..., n_left:].any(axis=-1)], axis=-1)
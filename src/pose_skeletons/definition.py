@@ -1,13 +1,52 @@
-from dataclasses import dataclass
-from typing import List, Optional, Set, Tuple
-from anytree import Node, RenderTree
+from dataclasses import FrozenInstanceError, dataclass, field
+from typing import TYPE_CHECKING, List, Optional, Sequence, Set, Tuple
 
+from .topology import CompiledTopology, compile_topology, validate_parents
 
-@dataclass
-class SkeletonDefinition:
+if TYPE_CHECKING:
+    from anytree import Node
+
+
+# Names of the standard joint slots, in the order used by get_ordered_indices.
+STANDARD_JOINTS = (
+    'hips', 'spine_low', 'spine_mid', 'spine_high', 'neck', 'head',
+    'l_clavicle', 'l_shoulder', 'l_elbow', 'l_wrist',
+    'r_clavicle', 'r_shoulder', 'r_elbow', 'r_wrist',
+    'l_hip', 'l_knee', 'l_ankle', 'l_foot',
+    'r_hip', 'r_knee', 'r_ankle', 'r_foot',
+)
+
+
+class _FrozenAfterInit(type):
+    """
+    Metaclass that gives every subclass an empty ``__slots__`` and freezes
+    instances once the outermost ``__init__`` has returned, so subclasses can
+    still assign the standard joints in their constructor.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        if any(isinstance(base, mcs) for base in bases):
+            namespace.setdefault("__slots__", ())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+    def __call__(cls, *args, **kwargs):
+        instance = super().__call__(*args, **kwargs)
+        instance._freeze()
+        return instance
+
+
+@dataclass(slots=True, eq=False)
+class SkeletonDefinition(metaclass=_FrozenAfterInit):
+    """
+    A skeleton layout: joint names, hierarchy and the standard joint mapping.
+
+    Instances are immutable once constructed (lists become tuples), hashable
+    and compare by content, so they can be shared between threads and used
+    as cache keys.
+    """
     name: str
-    original_names: List[str]
-    parents: List[int]  # -1 for root
+    original_names: Sequence[str]
+    parents: Sequence[int]  # -1 for root
 
     # --- Standard Interface (Defined Once for Autocomplete) ---
     # We initialize them to None so they are optional    
@@ -38,6 +77,67 @@ class SkeletonDefinition:
     r_ankle: Optional[int] = None
     r_foot: Optional[int] = None
 
+    # Intrinsic Euler order per joint as listed by BVH channels (e.g. "ZXY"),
+    # "" for joints without rotation channels. None if unknown.
+    rotation_orders: Optional[Sequence[str]] = None
+
+    _topology: Optional[CompiledTopology] = field(default=None, init=False, repr=False)
+    _hash: Optional[int] = field(default=None, init=False, repr=False)
+    _frozen: bool = field(default=False, init=False, repr=False)
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise FrozenInstanceError(f"cannot assign to field '{name}' of a frozen SkeletonDefinition")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}' of a SkeletonDefinition")
+
+    def _freeze(self):
+        """Converts mutable fields to tuples and plain ints, then locks the instance."""
+        if self._frozen:
+            return
+        self.original_names = tuple(self.original_names)
+        self.parents = tuple(int(p) for p in self.parents)
+        if self.rotation_orders is not None:
+            self.rotation_orders = tuple(self.rotation_orders)
+        for slot in STANDARD_JOINTS:
+            idx = getattr(self, slot)
+            if idx is not None:
+                setattr(self, slot, int(idx))
+        self._hash = hash(self._key())
+        self._frozen = True
+
+    def __getstate__(self) -> dict:
+        # The cached hash is process specific (string hashing is salted), so only public state is pickled.
+        return {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if not name.startswith("_") and hasattr(self, name)
+        }
+
+    def __setstate__(self, state: dict):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_topology", None)
+        object.__setattr__(self, "_frozen", False)
+        self._freeze()
+
+    def _key(self) -> tuple:
+        return (self.name, self.original_names, self.parents, self.rotation_orders,
+                tuple(getattr(self, slot) for slot in STANDARD_JOINTS))
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, SkeletonDefinition):
+            return NotImplemented
+        return self._hash == other._hash and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return self._hash
+
     def get_ordered_indices(self) -> List[int]:
         # We explicitly list the order we want
         candidates = [
@@ -68,8 +168,47 @@ class SkeletonDefinition:
             if parent_idx != -1
         }
 
-    def to_anytree(self) -> List[Node]:
+    @property
+    def topology(self) -> CompiledTopology:
+        """The parent hierarchy compiled to index arrays, built on first access."""
+        if self._topology is None:
+            # Compiling is deterministic, so a race only costs a duplicate compile.
+            object.__setattr__(self, "_topology", compile_topology(self.parents))
+        return self._topology
+
+    def _attach_topology(self, topology: CompiledTopology):
+        """Installs a precompiled topology, e.g. one loaded from the disk cache."""
+        if topology.num_joints != len(self.parents):
+            raise ValueError(f"Topology has {topology.num_joints} joints, '{self.name}' has {len(self.parents)}.")
+        if list(topology.parents) != list(self.parents):
+            raise ValueError(f"Topology was compiled for other parents than those of '{self.name}'.")
+        object.__setattr__(self, "_topology", topology)
+
+    def validate(self):
+        """
+        Checks that the definition is consistent.
+
+        Raises:
+            ValueError: If names and parents differ in length, names are not
+                unique, the hierarchy is not a single acyclic tree, or a
+                standard joint index is out of range.
+        """
+        num_joints = len(self.original_names)
+        if len(self.parents) != num_joints:
+            raise ValueError(f"'{self.name}' has {num_joints} names but {len(self.parents)} parents.")
+        if len(set(self.original_names)) != num_joints:
+            raise ValueError(f"'{self.name}' has duplicate joint names.")
+        validate_parents(self.parents)
+
+        for slot in STANDARD_JOINTS:
+            idx = getattr(self, slot)
+            if idx is not None and not 0 <= idx < num_joints:
+                raise ValueError(f"'{self.name}': standard joint '{slot}' index {idx} is out of range.")
+
+    def to_anytree(self) -> List["Node"]:
         """Builds an anytree representation of the skeleton."""
+        from anytree import Node
+
         nodes = [Node(self.get_name(i)) for i in range(len(self.original_names))]
         for i, parent_idx in enumerate(self.parents):
             if parent_idx != -1:
@@ -77,13 +216,29 @@ class SkeletonDefinition:
         return [node for node in nodes if node.is_root]
 
     def _get_hierarchy_string(self) -> str:
-        """Renders the skeleton hierarchy to a string using anytree."""
-        output = ""
-        roots = self.to_anytree()
+        """Renders the skeleton hierarchy to a string, in the style of anytree's RenderTree."""
+        children: List[List[int]] = [[] for _ in self.parents]
+        roots = []
+        for i, parent_idx in enumerate(self.parents):
+            if parent_idx == -1:
+                roots.append(i)
+            else:
+                children[parent_idx].append(i)
+
+        lines = []
         for root in roots:
-            for pre, _, node in RenderTree(root):
-                output += f"{pre}{node.name}\n"
-        return output
+            lines.append(self.get_name(root))
+            # (joint, indent of its subtree, is last sibling)
+            stack = [(child, "", i == len(children[root]) - 1)
+                     for i, child in reversed(list(enumerate(children[root])))]
+            while stack:
+                joint, indent, is_last = stack.pop()
+                lines.append(f"{indent}{'└── ' if is_last else '├── '}{self.get_name(joint)}")
+                child_indent = indent + ("    " if is_last else "│   ")
+                siblings = children[joint]
+                stack.extend((child, child_indent, i == len(siblings) - 1)
+                             for i, child in reversed(list(enumerate(siblings))))
+        return "".join(f"{line}\n" for line in lines)
 
     def __repr__(self) -> str:
         """Prints a visual representation of the skeleton hierarchy."""
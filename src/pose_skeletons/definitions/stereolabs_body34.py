@@ -40,6 +40,9 @@ class StereolabsBody34Joints(IntEnum):
 
 
 class StereolabsBody34(SkeletonDefinition):
+    # Hand joints beyond the standard interface
+    __slots__ = ("l_hand", "r_hand")
+
     def __init__(self):
         # The joint names from the definition list.
         names = [j.name for j in StereolabsBody34Joints]
@@ -0,0 +1,340 @@
+"""
+Dynamic time warping between motion clips, also across skeleton layouts.
+
+Clips are compared on the standard joints both layouts map, after removing
+global translation and facing per frame and normalizing body size, so a
+performer captured with one system can be aligned to a reference captured
+with another.
+
+dtw restricts the search to a Sakoe-Chiba band around the diagonal and only
+evaluates frame distances inside it, row by row with a prefix-minimum
+recurrence, so time and memory grow with frames * band width. soft_dtw
+evaluates the differentiable soft-min variant along anti-diagonals with
+O(frames) memory.
+
+Example:
+    result = align_motions(take, optitrack, reference, body34, window=60)
+    indices = path_to_indices(result.path, len(reference))
+    aligned, _ = time_warp(take_rotations, indices)    # see blending
+"""
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .canonical import canonicalize
+from .definition import SkeletonDefinition
+from .ops import common_standard_joints, standard_slots
+
+
+# Frame pairs compared at once when filling the band, to bound memory.
+_CHUNK_ELEMENTS = 1 << 22
+
+
+def _as_frames(values: np.ndarray) -> np.ndarray:
+    """(frames, joints, C) view of a clip; (frames, D) features become one joint."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 2:
+        return values[:, None, :]
+    if values.ndim != 3:
+        raise ValueError(f"Expected a clip of shape (frames, joints, C) or (frames, D), got {values.shape}.")
+    return values
+
+
+def _check_frames(clip: np.ndarray, name: str):
+    """Rejects frames without any valid joint, which no frame can be matched to."""
+    empty = np.flatnonzero(~np.all(np.isfinite(clip), axis=-1).any(axis=-1))
+    if len(empty):
+        raise ValueError(f"Frames {empty[:10].tolist()}{' ...' if len(empty) > 10 else ''} of {name} have no "
+                         f"valid joint, so every alignment would be infinite; drop or interpolate them first, "
+                         f"e.g. with repair.interpolate_gaps.")
+
+
+def _costs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Mean joint distance between broadcast pairs of poses (..., joints, C), ignoring NaN joints."""
+    distances = np.linalg.norm(a - b, axis=-1)
+    valid = np.isfinite(distances)
+    count = valid.sum(axis=-1)
+    total = np.where(valid, distances, 0.0).sum(axis=-1)
+    return np.where(count > 0, total / np.maximum(count, 1), np.inf)
+
+
+def frame_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Full (N, M) matrix of mean joint distances between the frames of two clips.
+
+    Args:
+        a: Clip of shape (N, joints, C) or (N, D).
+        b: Clip of shape (M, joints, C) or (M, D).
+    """
+    return _costs(_as_frames(a)[:, None], _as_frames(b)[None, :])
+
+
+def _band(num_a: int, num_b: int, window: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """First and last column of every row inside a Sakoe-Chiba band around the diagonal."""
+    if window is None:
+        return np.zeros(num_a, dtype=np.intp), np.full(num_a, num_b - 1, dtype=np.intp)
+    slope = (num_b - 1) / max(num_a - 1, 1)
+    # The band must be at least as wide as a row's step along the diagonal to stay connected.
+    radius = max(window, math.ceil(slope))
+    center = np.arange(num_a) * slope
+    lo = np.clip(np.ceil(center - radius), 0, num_b - 1).astype(np.intp)
+    hi = np.clip(np.floor(center + radius), 0, num_b - 1).astype(np.intp)
+    return lo, hi
+
+
+@dataclass
+class DtwResult:
+    """Result of :func:`dtw`."""
+    distance: float       # total cost of the optimal warping path
+    path: np.ndarray      # (L, 2) matched (frame of a, frame of b) pairs, both increasing
+
+    @property
+    def normalized_distance(self) -> float:
+        """Mean cost per matched frame pair."""
+        if not len(self.path):
+            raise ValueError("The normalized distance needs the warping path; call dtw with return_path=True.")
+        return self.distance / len(self.path)
+
+
+def _band_costs(a: np.ndarray, b: np.ndarray, lo: np.ndarray, width: int) -> np.ndarray:
+    columns = np.minimum(lo[:, None] + np.arange(width), len(b) - 1)
+    costs = np.empty((len(a), width))
+    chunk = max(1, _CHUNK_ELEMENTS // max(width * a.shape[1] * a.shape[2], 1))
+    for start in range(0, len(a), chunk):
+        stop = start + chunk
+        costs[start:stop] = _costs(a[start:stop, None], b[columns[start:stop]])
+    return costs
+
+
+def _row_recurrence(row: np.ndarray, step: np.ndarray):
+    """
+    Solves acc[j] = min(step[j], acc[j - 1] + row[j]) in place over finite
+    costs ``row`` as a prefix minimum over cumulative costs.
+    """
+    cumulative = np.cumsum(row)
+    with np.errstate(invalid="ignore"):
+        best = np.minimum.accumulate(np.where(np.isfinite(step), step - cumulative, np.inf))
+    row[:] = cumulative + best
+
+
+def dtw(a: np.ndarray, b: np.ndarray, window: Optional[int] = None, return_path: bool = True) -> DtwResult:
+    """
+    Dynamic time warping between two clips of the same layout.
+
+    Args:
+        a: Clip of shape (N, joints, C), or features (N, D).
+        b: Clip of shape (M, joints, C), or features (M, D).
+        window: Sakoe-Chiba band radius in frames of ``b`` around the
+            diagonal. None searches the full N x M grid.
+        return_path: Whether to backtrack the warping path.
+
+    Joints that are NaN in either frame are left out of that pair's cost.
+    A pair with no joint valid in both frames cannot be matched.
+
+    Returns:
+        A DtwResult; its path is empty when ``return_path`` is False.
+
+    Raises:
+        ValueError: If a frame has no valid joint at all, since every path
+            passes through it.
+    """
+    a, b = _as_frames(a), _as_frames(b)
+    if a.shape[1:] != b.shape[1:]:
+        raise ValueError(f"Clips have different pose shapes {a.shape[1:]} and {b.shape[1:]}.")
+    if not len(a) or not len(b):
+        raise ValueError("Both clips need at least one frame.")
+    _check_frames(a, "a")
+    _check_frames(b, "b")
+    lo, hi = _band(len(a), len(b), window)
+    width = int(np.max(hi - lo)) + 1
+
+    with profiling.stage("dtw", frames=len(a) + len(b), window=width):
+        # Accumulated costs in band layout: acc[i, k] is cell (i, lo[i] + k).
+        acc = _band_costs(a, b, lo, width)
+        acc[np.arange(width) > (hi - lo)[:, None]] = np.inf
+        previous = np.full(width + 1, np.inf)  # row i - 1 over columns lo[i] - 1 ... lo[i] + width - 1
+        previous[0] = 0.0  # the start, before cell (0, 0)
+        prev_lo, prev_row = -1, None
+        for i in range(len(a)):
+            row = acc[i]
+            if prev_row is not None:
+                # Columns lo[i] - 1 ... of the previous row, infinite outside its band.
+                shift = lo[i] - 1 - prev_lo
+                previous.fill(np.inf)
+                src_start, dst_start = max(shift, 0), max(-shift, 0)
+                count = min(width - src_start, width + 1 - dst_start)
+                if count > 0:
+                    previous[dst_start:dst_start + count] = prev_row[src_start:src_start + count]
+            # Best predecessor from the previous row (above or diagonal), then
+            # the in-row recurrence acc[j] = min(step[j], acc[j - 1] + cost[j]).
+            step = row + np.minimum(previous[1:], previous[:-1])
+            finite = np.isfinite(row)
+            valid = int(np.count_nonzero(finite))
+            if finite[:valid].all():
+                # Usual case: finite costs followed by the padding of the band.
+                _row_recurrence(row[:valid], step[:valid])
+            else:
+                # An infinite cell (a pair without joints valid in both frames)
+                # breaks the in-row chain, so each finite stretch is solved apart.
+                breaks = np.flatnonzero(np.diff(finite.view(np.int8))) + 1
+                for start, stop in zip(np.r_[0, breaks], np.r_[breaks, width]):
+                    if finite[start]:
+                        _row_recurrence(row[start:stop], step[start:stop])
+            prev_lo, prev_row = lo[i], acc[i]
+
+    distance = float(acc[-1, hi[-1] - lo[-1]])
+    path = _backtrack(acc, lo, hi) if return_path and np.isfinite(distance) else np.empty((0, 2), dtype=np.intp)
+    return DtwResult(distance, path)
+
+
+def _backtrack(acc: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    def value(i: int, j: int) -> float:
+        if i < 0 or j < 0 or j < lo[i] or j > hi[i]:
+            return np.inf
+        return acc[i, j - lo[i]]
+
+    i, j = len(acc) - 1, int(hi[-1])
+    path: List[Tuple[int, int]] = [(i, j)]
+    while i > 0 or j > 0:
+        candidates = ((value(i - 1, j - 1), i - 1, j - 1), (value(i - 1, j), i - 1, j), (value(i, j - 1), i, j - 1))
+        _, i, j = min(candidates, key=lambda c: c[0])
+        path.append((i, j))
+    return np.array(path[::-1], dtype=np.intp)
+
+
+def _softmin(values: np.ndarray, gamma: float) -> np.ndarray:
+    """-gamma * log(sum(exp(-values / gamma))) over the first axis, stable and inf-safe."""
+    smallest = np.min(values, axis=0)
+    finite = np.isfinite(smallest)
+    shifted = np.where(finite, smallest, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        total = np.sum(np.exp(-(values - shifted) / gamma), axis=0)
+        return np.where(finite, shifted - gamma * np.log(total), np.inf)
+
+
+def soft_dtw(a: np.ndarray, b: np.ndarray, gamma: float = 1.0, window: Optional[int] = None) -> float:
+    """
+    Soft-DTW discrepancy (Cuturi and Blondel, 2017) between two clips.
+
+    Computed along anti-diagonals, each evaluated at once, keeping only the
+    last two diagonals, so memory is O(N + M) and frame distances are never
+    stored.
+
+    Args:
+        a: Clip of shape (N, joints, C) or features (N, D).
+        b: Clip of shape (M, joints, C) or features (M, D).
+        gamma: Smoothing; soft-DTW approaches DTW as gamma goes to 0.
+        window: Sakoe-Chiba band radius, as in :func:`dtw`.
+
+    Raises:
+        ValueError: If a frame has no valid joint at all, as in :func:`dtw`.
+    """
+    if gamma <= 0:
+        raise ValueError("gamma must be positive.")
+    a, b = _as_frames(a), _as_frames(b)
+    if a.shape[1:] != b.shape[1:]:
+        raise ValueError(f"Clips have different pose shapes {a.shape[1:]} and {b.shape[1:]}.")
+    _check_frames(a, "a")
+    _check_frames(b, "b")
+    num_a, num_b = len(a), len(b)
+    lo, hi = _band(num_a, num_b, window)
+
+    # Diagonal buffers indexed by row + 1; index 0 is the virtual row -1.
+    buffers = [np.full(num_a + 1, np.inf) for _ in range(3)]
+    written = [(0, 0), (0, 1), (0, 0)]
+    buffers[1][0] = 0.0  # diagonal -2 holds the start, before cell (0, 0)
+    with profiling.stage("soft_dtw", frames=num_a + num_b):
+        for k in range(num_a + num_b - 1):
+            previous2, previous1, current = buffers[(k + 1) % 3], buffers[(k + 2) % 3], buffers[k % 3]
+            start, stop = written[k % 3]
+            current[start:stop] = np.inf  # clear what this buffer held three diagonals ago
+            rows = np.arange(max(0, k - num_b + 1), min(num_a - 1, k) + 1)
+            columns = k - rows
+            rows = rows[(columns >= lo[rows]) & (columns <= hi[rows])]
+            if not len(rows):
+                written[k % 3] = (0, 0)
+                continue
+            columns = k - rows
+            costs = _costs(a[rows], b[columns])
+            neighbours = np.stack([previous1[rows], previous1[rows + 1], previous2[rows]])
+            current[rows + 1] = costs + _softmin(neighbours, gamma)
+            written[k % 3] = (int(rows[0]) + 1, int(rows[-1]) + 2)
+    return float(buffers[(num_a + num_b - 2) % 3][num_a])
+
+
+def motion_features(positions: np.ndarray, definition: SkeletonDefinition,
+                    slots: Optional[List[str]] = None, up_axis: str = "y",
+                    normalize_scale: bool = True) -> np.ndarray:
+    """
+    Layout-independent features of a clip: standard joints with translation
+    and facing removed per frame.
+
+    Args:
+        positions: Joint positions of shape (frames, joints, 3).
+        definition: The layout of ``positions``.
+        slots: Standard joints to use. Defaults to all the layout maps.
+        up_axis: The vertical axis, "x", "y" or "z".
+        normalize_scale: Divide by the clip's median body size, so performers
+            of different height compare equally.
+
+    Returns:
+        Array of shape (frames, len(slots), 3).
+    """
+    if slots is None:
+        slots = standard_slots(definition)
+    indices = [getattr(definition, s) for s in slots]
+    if any(i is None for i in indices):
+        raise ValueError(f"'{definition.name}' does not map all of {slots}.")
+    # Canonicalize on the gathered joints alone, so the root and facing come
+    # from the same joints in every layout.
+    common = SkeletonDefinition(f"{definition.name}_common", list(slots), [-1] + [0] * (len(slots) - 1),
+                                **{slot: i for i, slot in enumerate(slots)})
+    positions = np.asarray(positions, dtype=np.float64)[:, indices]
+    features, _ = canonicalize(positions, common, up_axis)
+    if normalize_scale:
+        centered = features - np.nanmean(features, axis=-2, keepdims=True)
+        size = np.nanmedian(np.nanmean(np.linalg.norm(centered, axis=-1), axis=-1))
+        if np.isfinite(size) and size > 0:
+            features = features / size
+    return features
+
+
+def align_motions(a: np.ndarray, a_definition: SkeletonDefinition, b: np.ndarray,
+                  b_definition: SkeletonDefinition, window: Optional[int] = None,
+                  up_axis: str = "y", normalize_scale: bool = True) -> DtwResult:
+    """
+    DTW alignment of two clips of joint positions, possibly of different layouts.
+
+    Args:
+        a: Positions of shape (N, joints_a, 3).
+        a_definition: The layout of ``a``.
+        b: Positions of shape (M, joints_b, 3).
+        b_definition: The layout of ``b``.
+        window: Sakoe-Chiba band radius in frames of ``b``. None searches the full grid.
+        up_axis: The vertical axis of both clips.
+        normalize_scale: See :func:`motion_features`.
+    """
+    _, _, slots = common_standard_joints(a_definition, b_definition)
+    if len(slots) < 3:
+        raise ValueError(f"'{a_definition.name}' and '{b_definition.name}' share fewer than 3 standard joints.")
+    features_a = motion_features(a, a_definition, slots, up_axis, normalize_scale)
+    features_b = motion_features(b, b_definition, slots, up_axis, normalize_scale)
+    return dtw(features_a, features_b, window)
+
+
+def path_to_indices(path: np.ndarray, num_frames_b: int) -> np.ndarray:
+    """
+    Frame of ``a`` for every frame of ``b`` along a warping path, averaging
+    where several frames of ``a`` match one frame of ``b``. The result can be
+    passed to blending.time_warp to retime ``a`` onto ``b``.
+
+    Returns:
+        Fractional indices of shape (num_frames_b,).
+    """
+    path = np.asarray(path)
+    totals = np.bincount(path[:, 1], weights=path[:, 0], minlength=num_frames_b)
+    counts = np.bincount(path[:, 1], minlength=num_frames_b)
+    return totals / np.maximum(counts, 1)
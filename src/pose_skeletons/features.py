@@ -0,0 +1,200 @@
+"""
+Motion features for (frames, joints, ...) arrays: finite-difference velocity,
+acceleration and jerk of positions, angular velocity of rotations, and
+statistics over sliding windows.
+
+Every function takes an ``axis`` for the frame dimension, so batches of
+streams, e.g. (people, frames, joints, 3) with ``axis=1``, are processed in
+one call. Sliding windows are strided views of the input and are never copied.
+"""
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import profiling
+from .definition import SkeletonDefinition
+from .rotations import (Order, convert_rotations, quaternion_conjugate, quaternion_multiply,
+                        quaternion_to_axis_angle)
+
+
+WINDOW_STATISTICS = ("mean", "std", "min", "max", "range")
+
+
+def finite_difference(values: np.ndarray, fps: float, order: int = 1, axis: int = 0,
+                      causal: bool = False) -> np.ndarray:
+    """
+    n-th time derivative of a signal along the frame axis.
+
+    Args:
+        values: Array with frames along ``axis``, e.g. (frames, joints, 3).
+        fps: Frame rate; derivatives are per second.
+        order: Derivative order, 1 for velocity, 2 for acceleration, 3 for jerk.
+        axis: The frame axis.
+        causal: Use backward differences, which only depend on past frames,
+            for streams. The first ``order`` frames are then zero. By default
+            central differences (np.gradient) are used.
+
+    Returns:
+        Array of the input shape.
+    """
+    if order < 1:
+        raise ValueError("order must be at least 1.")
+    out = np.asarray(values, dtype=np.float64)
+    if causal:
+        # Difference the signal itself `order` times and only then pad, so
+        # the padding of one pass is never differenced by the next.
+        axis = axis % out.ndim
+        result = np.zeros_like(out)
+        if out.shape[axis] > order:
+            head = (slice(None),) * axis + (slice(order, None),)
+            result[head] = np.diff(out, n=order, axis=axis) * fps ** order
+        return result
+    for _ in range(order):
+        if out.shape[axis] > 1:
+            out = np.gradient(out, axis=axis) * fps
+        else:
+            out = np.zeros_like(out)
+    return out
+
+
+def velocity(positions: np.ndarray, fps: float, axis: int = 0, causal: bool = False) -> np.ndarray:
+    """Joint velocity in units per second, see :func:`finite_difference`."""
+    return finite_difference(positions, fps, 1, axis, causal)
+
+
+def acceleration(positions: np.ndarray, fps: float, axis: int = 0, causal: bool = False) -> np.ndarray:
+    """Joint acceleration in units per second squared, see :func:`finite_difference`."""
+    return finite_difference(positions, fps, 2, axis, causal)
+
+
+def jerk(positions: np.ndarray, fps: float, axis: int = 0, causal: bool = False) -> np.ndarray:
+    """Joint jerk in units per second cubed, see :func:`finite_difference`."""
+    return finite_difference(positions, fps, 3, axis, causal)
+
+
+def angular_velocity(rotations: np.ndarray, fps: float, representation: str = "quaternion",
+                     definition: Optional[SkeletonDefinition] = None, order: Optional[Order] = None,
+                     degrees: bool = True, axis: int = 0, causal: bool = False,
+                     body_frame: bool = False) -> np.ndarray:
+    """
+    Angular velocity of joint rotations, as rotation vectors per second.
+
+    The rotation between neighbouring frames is taken on the rotation group,
+    so it is unaffected by quaternion sign flips and Euler wrap-around.
+
+    Args:
+        rotations: Rotations with frames along ``axis``, joints on the axis
+            before the rotation components, e.g. (frames, joints, 4).
+        fps: Frame rate.
+        representation: One of rotations.REPRESENTATIONS.
+        definition: Skeleton providing Euler orders, for "euler" input.
+        order: Explicit Euler order(s).
+        degrees: Whether Euler input is in degrees.
+        axis: The frame axis, counted on the leading (non-component) dimensions.
+        causal: Use the rotation from the previous frame only, see
+            :func:`finite_difference`. By default central differences are used.
+        body_frame: Express the velocity in the rotating joint frame instead
+            of the parent frame.
+
+    Returns:
+        Array of shape (..., 3) in radians per second, frames along ``axis``.
+    """
+    q = convert_rotations(rotations, representation, "quaternion", definition, order, degrees)
+    frames_axis = axis % (q.ndim - 1)
+    num_frames = q.shape[frames_axis]
+    if num_frames < 2:
+        return np.zeros(q.shape[:-1] + (3,))
+
+    frames = np.arange(num_frames)
+    if causal:
+        prev, nxt = np.maximum(frames - 1, 0), frames
+    else:
+        prev, nxt = np.maximum(frames - 1, 0), np.minimum(frames + 1, num_frames - 1)
+    q_prev = np.take(q, prev, axis=frames_axis)
+    q_next = np.take(q, nxt, axis=frames_axis)
+
+    if body_frame:
+        delta = quaternion_multiply(quaternion_conjugate(q_prev), q_next)
+    else:
+        delta = quaternion_multiply(q_next, quaternion_conjugate(q_prev))
+    steps = np.maximum(nxt - prev, 1).astype(np.float64)
+    shape = [1] * q.ndim
+    shape[frames_axis] = num_frames
+    return quaternion_to_axis_angle(delta) * (fps / steps.reshape(shape))
+
+
+def sliding_windows(values: np.ndarray, window: int, step: int = 1, axis: int = 0) -> np.ndarray:
+    """
+    Read-only strided view of overlapping windows along the frame axis.
+
+    Returns:
+        View of shape (..., windows, ..., window) with the window axis last and
+        ``(frames - window) // step + 1`` windows in place of the frames.
+    """
+    values = np.asarray(values)
+    if not 1 <= window <= values.shape[axis]:
+        raise ValueError(f"window must be between 1 and the number of frames ({values.shape[axis]}).")
+    if step < 1:
+        raise ValueError("step must be positive.")
+    view = sliding_window_view(values, window, axis=axis)
+    if step > 1:
+        index = [slice(None)] * view.ndim
+        index[axis] = slice(None, None, step)
+        view = view[tuple(index)]
+    return view
+
+
+def _window_means(values: np.ndarray, window: int, step: int, axis: int) -> np.ndarray:
+    zero = np.zeros_like(np.take(values, [0], axis=axis))
+    sums = np.cumsum(np.concatenate([zero, values], axis=axis), axis=axis)
+    count = values.shape[axis] - window + 1
+    upper = np.take(sums, np.arange(window, window + count, step), axis=axis)
+    lower = np.take(sums, np.arange(0, count, step), axis=axis)
+    return (upper - lower) / window
+
+
+def window_statistics(values: np.ndarray, window: int, step: int = 1, axis: int = 0,
+                      statistics: Sequence[str] = WINDOW_STATISTICS) -> Dict[str, np.ndarray]:
+    """
+    Per-window statistics of a signal. Means and standard deviations use
+    running sums; minima and maxima reduce a strided view of the windows.
+
+    Args:
+        values: Array with frames along ``axis``, e.g. speeds (frames, joints).
+        window: Window length in frames.
+        step: Hop between window starts.
+        axis: The frame axis.
+        statistics: Names from WINDOW_STATISTICS.
+
+    Returns:
+        {statistic: array} with the frame axis replaced by the window axis.
+    """
+    unknown = [s for s in statistics if s not in WINDOW_STATISTICS]
+    if unknown:
+        raise ValueError(f"Unknown window statistics {unknown}. Available: {list(WINDOW_STATISTICS)}")
+    values = np.asarray(values, dtype=np.float64)
+    view = sliding_windows(values, window, step, axis)
+
+    with profiling.stage("window_statistics", frames=values.shape[axis], nbytes=values.nbytes):
+        out = {}
+        if "mean" in statistics or "std" in statistics:
+            # Window sums from cumulative sums: O(frames), without materializing the
+            # windows. Centering first keeps the variance well conditioned.
+            center = values.mean(axis=axis, keepdims=True)
+            mean = _window_means(values - center, window, step, axis)
+            if "std" in statistics:
+                square = _window_means((values - center) ** 2, window, step, axis)
+                out["std"] = np.sqrt(np.maximum(square - mean * mean, 0.0))
+            out["mean"] = mean + center
+        if "min" in statistics or "range" in statistics:
+            minimum = view.min(axis=-1)
+        if "max" in statistics or "range" in statistics:
+            maximum = view.max(axis=-1)
+        if "min" in statistics:
+            out["min"] = minimum
+        if "max" in statistics:
+            out["max"] = maximum
+        if "range" in statistics:
+            out["range"] = maximum - minimum
+        return {name: out[name] for name in statistics}
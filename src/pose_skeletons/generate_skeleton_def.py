@@ -3,6 +3,11 @@ import sys
 import os
 import re
 from textwrap import dedent
+from typing import Dict, List, Optional, Tuple
+
+from .bvh import parse_bvh_hierarchy
+from .definition import STANDARD_JOINTS
+from .standard_mapping import guess_standard_mapping
 
 
 def sanitize_name(name: str) -> str:
@@ -15,44 +20,25 @@ def sanitize_name(name: str) -> str:
     return sanitized
 
 
-def generate_definition_file(bvh_path: str, class_name: str, end_sites: bool = False):
-    """
-    Parses a BVH file to generate a Python SkeletonDefinition file.
-    """
-    try:
-        from bvhtoolbox import BvhTree
-    except ImportError:
-        print("Error: 'bvhtoolbox' is not installed.")
-        sys.exit(1)
+def collect_bvh_files(paths: List[str]) -> List[str]:
+    """Expands directories in ``paths`` to the BVH files they contain (recursively)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(".bvh"))
+        else:
+            files.append(path)
+    return files
 
-    try:
-        with open(bvh_path) as f:
-            mocap = BvhTree(f.read())
-    except FileNotFoundError:
-        print(f"Error: BVH file not found at '{bvh_path}'")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error reading BVH file: {e}")
-        sys.exit(1)
 
-    # Extract joint names and parent hierarchy from the BVH tree
-    joints = mocap.get_joints(end_sites=end_sites)
-    joint_names = [j.name for j in joints]
-    name_to_index = {name: i for i, name in enumerate(joint_names)}
-    
-    parents = [-1] * len(joint_names)
-    for i, joint_node in enumerate(joints):
-        if joint_node and joint_node.parent:
-            # The parent of the root node may be the HIERARCHY node, which is not
-            # a joint and has no name, causing an IndexError.
-            # We must check that the parent is a valid joint before getting its name.
-            if len(joint_node.parent.value) > 1 and joint_node.parent.value[0] in ('ROOT', 'JOINT'):
-                parent_idx = name_to_index.get(joint_node.parent.name)
-                if parent_idx is not None:
-                    parents[i] = parent_idx
-
-    # --- Code Generation ---
+def render_definition(class_name: str, joint_names: List[str], parents: List[int]) -> str:
+    """
+    Renders the Python source of a SkeletonDefinition subclass.
 
+    The standard joint mapping is pre-filled by guess_standard_mapping;
+    slots without a confident match are set to None.
+    """
     # 1. Create the IntEnum for joints
     output_class_name = sanitize_name(class_name).capitalize()
     enum_name = f"{output_class_name}Joints"
@@ -64,27 +50,24 @@ def generate_definition_file(bvh_path: str, class_name: str, end_sites: bool = F
         if name in unique_sanitized_names:
             print(f"Warning: Duplicate sanitized joint name '{name}' found. The generated Enum may be invalid.")
         unique_sanitized_names.add(name)
-        enum_lines.append(f"    {name} = {i}")
+        enum_lines.append(f"        {name} = {i}")
     enum_def = f"class {enum_name}(IntEnum):\n" + "\n".join(enum_lines)
 
-    # 2. Create the mapping to StandardJoint as a template
-    standard_joint_names = [
-        'hips', 'spine_low', 'spine_mid', 'spine_high', 'neck', 'head',
-        'l_clavicle', 'l_shoulder', 'l_elbow', 'l_wrist',
-        'r_clavicle', 'r_shoulder', 'r_elbow', 'r_wrist',
-        'l_hip', 'l_knee', 'l_ankle', 'l_foot',
-        'r_hip', 'r_knee', 'r_ankle', 'r_foot'
-    ]
+    # 2. Create the mapping to StandardJoint, guessed from names and topology
+    mapping = guess_standard_mapping(joint_names, parents)
     map_lines = [
         "            # --- Standard Joint Mapping ---",
-        "            # Edit these to map your skeleton's joints to the standard set.",
+        "            # Guessed from joint names and topology. Review before registering.",
         f"            # Your joint enum is available as `{enum_name}`.",
-        f"            # Example: self.hips = {enum_name}.Hips.value"
     ]
-    for name in standard_joint_names:
+    for name in STANDARD_JOINTS:
         if name in ('l_clavicle', 'r_clavicle', 'l_hip', 'r_hip'):
             map_lines.append("")
-        map_lines.append(f"            self.{name} = 0")
+        idx = mapping[name]
+        if idx is None:
+            map_lines.append(f"            self.{name} = None  # No match found")
+        else:
+            map_lines.append(f"            self.{name} = {enum_name}.{sanitized_joint_names[idx]}")
     map_str = "\n".join(map_lines)
 
     # 3. Assemble the full file content
@@ -93,7 +76,7 @@ def generate_definition_file(bvh_path: str, class_name: str, end_sites: bool = F
     #
     # Next Steps:
     # 1. Move this file to: src/pose_skeletons/definitions/
-    # 2. Edit the standard joint mapping below to map your skeleton's joints.
+    # 2. Review the standard joint mapping below.
     # 3. Register your new skeleton in src/pose_skeletons/__init__.py
 
     from enum import IntEnum
@@ -115,42 +98,138 @@ def generate_definition_file(bvh_path: str, class_name: str, end_sites: bool = F
             
 {map_str}
     """
-    file_content = dedent(file_content).strip()
+    return dedent(file_content).strip() + "\n"
+
+
+def _module_name(class_name: str) -> str:
+    """Name of the generated file (without extension) for a class name."""
+    return sanitize_name(class_name).capitalize().lower()
+
+
+def _write_definition(class_name: str, joint_names: List[str], parents: List[int],
+                      output_dir: Optional[str] = None) -> str:
+    """Writes a generated definition file and returns its path."""
+    output_path = os.path.join(output_dir or os.getcwd(), f"{_module_name(class_name)}.py")
 
-    # 4. Write to file in the current working directory
-    sanitized_filename = f"{output_class_name.lower()}.py"
-    output_path = os.path.join(os.getcwd(), sanitized_filename)
-    
     with open(output_path, "w") as f:
-        f.write(file_content)
-        
-    print(f"\\nSuccessfully generated skeleton definition at: {output_path}")
-    print("\\nNext steps:")
-    print(f"1. Move '{sanitized_filename}' to 'src/pose_skeletons/definitions/'.")
-    print("2. Edit the file to set the correct indices in the '_map'.")
-    print("3. Register the new definition in 'src/pose_skeletons/__init__.py'.")
+        f.write(render_definition(class_name, joint_names, parents))
+    return output_path
+
+
+def _read_hierarchy(bvh_path: str, end_sites: bool):
+    try:
+        return parse_bvh_hierarchy(bvh_path, end_sites=end_sites)
+    except FileNotFoundError:
+        print(f"Error: BVH file not found at '{bvh_path}'")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error reading BVH file: {e}")
+        sys.exit(1)
+
+
+def _print_next_steps():
+    print("\nNext steps:")
+    print("1. Move the generated files to 'src/pose_skeletons/definitions/'.")
+    print("2. Review the guessed standard joint mapping in each file.")
+    print("3. Register the new definitions in 'src/pose_skeletons/__init__.py'.")
+
+
+def generate_definition_file(bvh_path: str, class_name: str, end_sites: bool = False,
+                             output_dir: Optional[str] = None):
+    """
+    Parses a BVH file to generate a Python SkeletonDefinition file.
+    """
+    # Joint names and parent hierarchy, read up to the MOTION keyword only
+    hierarchy = _read_hierarchy(bvh_path, end_sites)
+    output_path = _write_definition(class_name, hierarchy.names, hierarchy.parents, output_dir)
+
+    print(f"\nSuccessfully generated skeleton definition at: {output_path}")
+    _print_next_steps()
+
+
+def generate_definition_files(bvh_paths: List[str], class_name: Optional[str] = None,
+                              end_sites: bool = False, output_dir: Optional[str] = None) -> List[str]:
+    """
+    Generates one SkeletonDefinition file per distinct hierarchy found in many BVH files.
+
+    Files sharing the same joint names and parents produce a single definition.
+
+    Args:
+        bvh_paths: BVH files and/or directories to search for BVH files.
+        class_name: Base name for the generated classes. With several distinct
+            hierarchies a running number is appended. Defaults to the name of
+            the first file with each hierarchy; a name already used for
+            another hierarchy gets a running number as well.
+        end_sites: Include BVH End Sites in the generated definitions.
+        output_dir: Where to write the files. Defaults to the current directory.
+
+    Returns:
+        The paths of the generated files.
+    """
+    files = collect_bvh_files(bvh_paths)
+    if not files:
+        print("Error: No BVH files found.")
+        sys.exit(1)
+
+    # Deduplicate on the hierarchy itself, keeping first-seen order
+    groups: Dict[Tuple[Tuple[str, ...], Tuple[int, ...]], List[str]] = {}
+    for path in files:
+        hierarchy = _read_hierarchy(path, end_sites)
+        key = (tuple(hierarchy.names), tuple(hierarchy.parents))
+        groups.setdefault(key, []).append(path)
+
+    output_paths = []
+    used = set()
+    for i, ((names, parents), sources) in enumerate(groups.items()):
+        if class_name is None:
+            base = os.path.splitext(os.path.basename(sources[0]))[0]
+        else:
+            base = class_name if len(groups) == 1 else f"{class_name}{i + 1}"
+        # Distinct hierarchies whose files share a name, e.g. d1/rig.bvh and
+        # d2/rig.bvh, get a running number instead of overwriting each other.
+        name, number = base, 2
+        while _module_name(name) in used:
+            name, number = f"{base}{number}", number + 1
+        used.add(_module_name(name))
+        output_path = _write_definition(name, list(names), list(parents), output_dir)
+        output_paths.append(output_path)
+        print(f"Generated {output_path} from {len(sources)} file(s):")
+        for source in sources:
+            print(f"    {source}")
+
+    _print_next_steps()
+    return output_paths
 
 
 def generate_skeleton_def():
     parser = argparse.ArgumentParser(
-        description="Generate a SkeletonDefinition class from a BVH file.",
+        description="Generate SkeletonDefinition classes from BVH files.\n"
+                    "Identical hierarchies are written only once.",
         formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument("bvh_file", type=str, help="Path to the input BVH file.")
+    parser.add_argument("bvh_files", type=str, nargs="+",
+                        help="Input BVH files or directories containing BVH files.")
     parser.add_argument(
         "--name", 
         type=str, 
-        required=True, 
-        help="The base name for the generated class and file (e.g., 'MyCustomRig')."
+        default=None,
+        help="The base name for the generated classes and files (e.g., 'MyCustomRig').\n"
+             "Defaults to the name of the BVH file."
     )
     parser.add_argument(
         "--end-sites",
         action="store_true",
         help="Include BVH End Sites in the generated skeleton definition."
     )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=None,
+        help="Directory to write the generated files to. Defaults to the current directory."
+    )
     args = parser.parse_args()
     
-    generate_definition_file(args.bvh_file, args.name, args.end_sites)
+    generate_definition_files(args.bvh_files, args.name, args.end_sites, args.output_dir)
 
 if __name__ == "__main__":
     generate_skeleton_def()
@@ -0,0 +1,212 @@
+"""
+Forward kinematics over a SkeletonDefinition's compiled topology.
+
+forward_kinematics evaluates whole clips level by level (all joints of one
+depth at once). KinematicState keeps the global transforms of a single pose
+and, after a few local rotations change, recomputes only the subtrees below
+the edited joints, using the pre-order subtree ranges of the topology.
+
+Example:
+    state = KinematicState(get_skeleton_def("smplx"), offsets)
+    state.set_rotations([40, 41, 42], finger_rotations, "axis_angle")
+    positions = state.global_positions    # only the three finger joints are updated
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+from .rotations import (Order, axis_angle_to_matrix, euler_orders, euler_to_matrix, quaternion_to_matrix,
+                        rot6d_to_matrix)
+
+
+def _to_matrices(rotations: np.ndarray, representation: str, definition: SkeletonDefinition,
+                 joints: np.ndarray, order: Optional[Order] = None, degrees: bool = True) -> np.ndarray:
+    if representation == "matrix":
+        return np.asarray(rotations, dtype=np.float64)
+    if representation == "quaternion":
+        return quaternion_to_matrix(rotations)
+    if representation == "axis_angle":
+        return axis_angle_to_matrix(rotations)
+    if representation == "rot6d":
+        return rot6d_to_matrix(rotations)
+    if representation == "euler":
+        orders = euler_orders(definition, order)
+        return euler_to_matrix(rotations, [orders[j] for j in joints], degrees)
+    raise ValueError(f"Unknown rotation representation '{representation}'.")
+
+
+def _update_levels(joints: np.ndarray, parents: np.ndarray, depth: np.ndarray,
+                   local: np.ndarray, offsets: np.ndarray, root_position: np.ndarray,
+                   global_rotations: np.ndarray, global_positions: np.ndarray):
+    """Recomputes the global transforms of ``joints`` in place, shallowest joints first."""
+    joints = joints[np.argsort(depth[joints], kind="stable")]
+    levels = np.flatnonzero(np.diff(depth[joints])) + 1
+    for level in np.split(joints, levels):
+        parent = parents[level]
+        if parent[0] < 0:  # the root is alone at depth 0
+            global_rotations[..., level, :, :] = local[..., level, :, :]
+            global_positions[..., level, :] = root_position[..., None, :]
+            continue
+        parent_rotations = global_rotations[..., parent, :, :]
+        global_rotations[..., level, :, :] = parent_rotations @ local[..., level, :, :]
+        global_positions[..., level, :] = global_positions[..., parent, :] + np.einsum(
+            "...ij,...j->...i", parent_rotations, offsets[..., level, :])
+
+
+def forward_kinematics(rotations: np.ndarray, offsets: np.ndarray, definition: SkeletonDefinition,
+                       root_positions: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Global joint transforms from local rotations.
+
+    Args:
+        rotations: Local rotation matrices of shape (..., joints, 3, 3).
+        offsets: Joint offsets from the parent, shape (joints, 3) or (..., joints, 3).
+        definition: The skeleton.
+        root_positions: Root positions of shape (..., 3). Defaults to the root offset.
+
+    Returns:
+        A tuple (global_rotations, global_positions) of shapes
+        (..., joints, 3, 3) and (..., joints, 3).
+    """
+    topology = definition.topology
+    rotations = np.asarray(rotations, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.float64)
+    root = topology.order[0]
+    if root_positions is None:
+        root_positions = np.broadcast_to(offsets[..., root, :], rotations.shape[:-3] + (3,))
+
+    global_rotations = np.empty_like(rotations)
+    global_positions = np.empty(rotations.shape[:-1])
+    with profiling.stage("forward_kinematics", frames=int(np.prod(rotations.shape[:-3])), nbytes=rotations.nbytes):
+        _update_levels(topology.order, topology.parents, topology.depth, rotations, offsets,
+                       np.asarray(root_positions, dtype=np.float64), global_rotations, global_positions)
+    return global_rotations, global_positions
+
+
+# Below this many joints, per-joint updates beat batching by depth level.
+_LOOP_THRESHOLD = 24
+
+
+class KinematicState:
+    """
+    Cached global transforms of one pose with incremental updates.
+
+    Edits only mark joints dirty; the global transforms of the union of the
+    dirty subtrees are recomputed on the next read.
+    """
+
+    def __init__(self, definition: SkeletonDefinition, offsets: np.ndarray,
+                 rotations: Optional[np.ndarray] = None, root_position: Optional[np.ndarray] = None):
+        """
+        Args:
+            definition: The skeleton.
+            offsets: Joint offsets from the parent, shape (joints, 3).
+            rotations: Initial local rotation matrices (joints, 3, 3). Defaults to identity.
+            root_position: Initial root position. Defaults to the root offset.
+        """
+        self.definition = definition
+        self.topology = definition.topology
+        num_joints = self.topology.num_joints
+        self.offsets = np.array(offsets, dtype=np.float64)
+        if self.offsets.shape != (num_joints, 3):
+            raise ValueError(f"Expected offsets of shape ({num_joints}, 3), got {self.offsets.shape}.")
+        self.local_rotations = np.tile(np.eye(3), (num_joints, 1, 1)) if rotations is None \
+            else np.array(rotations, dtype=np.float64)
+        root = self.topology.order[0]
+        self.root_position = self.offsets[root].copy() if root_position is None \
+            else np.array(root_position, dtype=np.float64)
+
+        self._global_rotations = np.empty((num_joints, 3, 3))
+        self._global_positions = np.empty((num_joints, 3))
+        self._dirty = np.ones(num_joints, dtype=bool)
+        self.last_update_count = 0  # joints recomputed by the last update, for diagnostics
+
+    def set_rotations(self, joints: Sequence[int], rotations: np.ndarray,
+                      representation: str = "matrix", order: Optional[Order] = None, degrees: bool = True):
+        """
+        Sets the local rotations of some joints.
+
+        Args:
+            joints: Joint indices.
+            rotations: One rotation per joint in ``representation``.
+            representation: "matrix", "quaternion", "axis_angle", "rot6d" or "euler".
+            order: Explicit Euler order(s), overriding the definition's.
+            degrees: Whether Euler angles are in degrees.
+        """
+        joints = np.atleast_1d(np.asarray(joints, dtype=np.intp))
+        matrices = _to_matrices(rotations, representation, self.definition, joints, order, degrees)
+        self.local_rotations[joints] = matrices.reshape(len(joints), 3, 3)
+        self._dirty[joints] = True
+
+    def set_rotation(self, joint: int, rotation: np.ndarray, representation: str = "matrix",
+                     order: Optional[Order] = None, degrees: bool = True):
+        """Sets the local rotation of one joint, see :meth:`set_rotations`."""
+        self.set_rotations([joint], np.asarray(rotation)[None], representation, order, degrees)
+
+    def set_root_position(self, position: np.ndarray):
+        self.root_position = np.array(position, dtype=np.float64)
+        self._dirty[self.topology.order[0]] = True
+
+    def set_offsets(self, joints: Sequence[int], offsets: np.ndarray):
+        """Changes bone offsets, e.g. to retarget the pose to another body shape."""
+        joints = np.atleast_1d(np.asarray(joints, dtype=np.intp))
+        self.offsets[joints] = offsets
+        self._dirty[joints] = True
+
+    def update(self) -> int:
+        """
+        Recomputes the transforms below the dirty joints.
+
+        Returns:
+            The number of joints recomputed.
+        """
+        dirty = np.flatnonzero(self._dirty)
+        if len(dirty) == 0:
+            self.last_update_count = 0
+            return 0
+        topology = self.topology
+        # Union of the dirty subtrees: mark each [start, end) range in pre-order positions.
+        size = topology.num_joints + 1
+        marks = np.bincount(topology.position[dirty], minlength=size) \
+            - np.bincount(topology.subtree_end[dirty], minlength=size)
+        affected = topology.order[np.cumsum(marks[:-1]) > 0]
+
+        with profiling.stage("kinematics.update", joints=len(affected)):
+            if len(affected) <= _LOOP_THRESHOLD:
+                self._update_joints(affected)
+            else:
+                _update_levels(affected, topology.parents, topology.depth, self.local_rotations, self.offsets,
+                               self.root_position, self._global_rotations, self._global_positions)
+        self._dirty[:] = False
+        self.last_update_count = len(affected)
+        return len(affected)
+
+    def _update_joints(self, joints: np.ndarray):
+        # Joints are in pre-order, so every parent is final before its children.
+        rotations, positions = self._global_rotations, self._global_positions
+        for joint in joints.tolist():
+            parent = self.topology.parents[joint]
+            if parent < 0:
+                rotations[joint] = self.local_rotations[joint]
+                positions[joint] = self.root_position
+            else:
+                rotations[joint] = rotations[parent] @ self.local_rotations[joint]
+                positions[joint] = positions[parent] + rotations[parent] @ self.offsets[joint]
+
+    @property
+    def global_rotations(self) -> np.ndarray:
+        """Global rotation matrices, shape (joints, 3, 3). Read-only view."""
+        self.update()
+        view = self._global_rotations.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def global_positions(self) -> np.ndarray:
+        """Global joint positions, shape (joints, 3). Read-only view."""
+        self.update()
+        view = self._global_positions.view()
+        view.flags.writeable = False
+        return view
@@ -0,0 +1,167 @@
+"""
+Loading SkeletonDefinitions from JSON or TOML files.
+
+A definition file holds the skeleton name, the joint names, the parent list,
+an optional standard joint mapping (by joint name or index) and optional
+per-joint Euler ``rotation_orders``::
+
+    name = "StudioRig"
+    names = ["Hips", "Spine", "Head"]
+    parents = [-1, 0, 1]
+
+    [standard]
+    hips = "Hips"
+    head = 2
+
+The compiled topology of every loaded definition is cached on disk, keyed by
+a hash of the names and parents, so repeated loads of the same rig skip
+compilation.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import tomllib
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+import numpy as np
+
+from .definition import STANDARD_JOINTS, SkeletonDefinition
+from .topology import CompiledTopology, compile_topology
+
+
+def default_cache_dir() -> str:
+    """The compiled topology cache directory, overridable with POSE_SKELETONS_CACHE."""
+    return os.environ.get(
+        "POSE_SKELETONS_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "pose_skeletons"),
+    )
+
+
+@contextmanager
+def atomic_file(path: str) -> Iterator[BinaryIO]:
+    """
+    Opens a binary file for writing that only appears at ``path`` once it is
+    complete, so concurrent readers, in other processes or threads, never see
+    partial files. It is written to a unique temporary file in the same
+    directory and moved into place on success.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def definition_from_dict(data: Dict[str, Any]) -> SkeletonDefinition:
+    """
+    Builds a SkeletonDefinition from a parsed definition file.
+
+    Raises:
+        ValueError: If required keys are missing or the standard mapping refers
+            to an unknown slot or joint.
+    """
+    missing = [key for key in ("name", "names", "parents") if key not in data]
+    if missing:
+        raise ValueError(f"Skeleton definition is missing keys: {missing}")
+
+    names = [str(n) for n in data["names"]]
+    parents = [int(p) for p in data["parents"]]
+    name_to_index = {n: i for i, n in enumerate(names)}
+
+    standard = {}
+    for slot, joint in data.get("standard", {}).items():
+        if slot not in STANDARD_JOINTS:
+            raise ValueError(f"Unknown standard joint '{slot}'. Available: {list(STANDARD_JOINTS)}")
+        if isinstance(joint, str):
+            if joint not in name_to_index:
+                raise ValueError(f"Standard joint '{slot}' refers to unknown joint '{joint}'.")
+            joint = name_to_index[joint]
+        standard[slot] = joint
+
+    rotation_orders = data.get("rotation_orders")
+    if rotation_orders is not None:
+        rotation_orders = [str(o) for o in rotation_orders]
+    return SkeletonDefinition(str(data["name"]), names, parents, **standard, rotation_orders=rotation_orders)
+
+
+def definition_to_dict(definition: SkeletonDefinition) -> Dict[str, Any]:
+    """The inverse of definition_from_dict, with the standard mapping by joint index."""
+    data: Dict[str, Any] = {
+        "name": definition.name,
+        "names": list(definition.original_names),
+        "parents": list(definition.parents),
+        "standard": {slot: getattr(definition, slot) for slot in STANDARD_JOINTS
+                     if getattr(definition, slot) is not None},
+    }
+    if definition.rotation_orders is not None:
+        data["rotation_orders"] = list(definition.rotation_orders)
+    return data
+
+
+def topology_hash(definition: SkeletonDefinition) -> str:
+    """Content hash of the parts of a definition that determine its compiled topology."""
+    payload = json.dumps([list(definition.original_names), list(definition.parents)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_compiled_topology(definition: SkeletonDefinition,
+                           cache_dir: Optional[str] = None) -> CompiledTopology:
+    """
+    Returns the compiled topology of a definition, from the disk cache if possible.
+
+    On a cache miss, or an entry for other parents, the definition's parents
+    are validated and compiled and the result is written to the cache.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, f"{topology_hash(definition)}.npz")
+
+    try:
+        with np.load(path) as arrays:
+            topology = CompiledTopology.from_arrays(arrays)
+        if np.array_equal(topology.parents, definition.parents):
+            return topology
+    except (OSError, KeyError, ValueError):
+        pass  # missing or unreadable entry, compile below
+
+    topology = compile_topology(definition.parents)
+    os.makedirs(cache_dir, exist_ok=True)
+    with atomic_file(path) as f:
+        np.savez(f, **topology.to_arrays())
+    return topology
+
+
+def load_skeleton_def(path: str, cache_dir: Optional[str] = None,
+                      use_cache: bool = True) -> SkeletonDefinition:
+    """
+    Loads a SkeletonDefinition from a ``.json`` or ``.toml`` file.
+
+    Args:
+        path: The definition file.
+        cache_dir: Directory of the compiled topology cache.
+            Defaults to default_cache_dir().
+        use_cache: Set to False to skip the disk cache; the topology is then
+            compiled on first use.
+
+    Returns:
+        The loaded, validated definition.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path) as f:
+            data = json.load(f)
+    elif extension == ".toml":
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        raise ValueError(f"Unsupported skeleton definition format: '{extension}'. Use .json or .toml.")
+
+    definition = definition_from_dict(data)
+    definition.validate()
+    if use_cache:
+        definition._attach_topology(load_compiled_topology(definition, cache_dir))
+    return definition
@@ -0,0 +1,159 @@
+"""
+Vectorized pose evaluation metrics for (N, joints, 3) arrays.
+
+When prediction and target use different layouts (e.g. StereolabsBody34
+predictions against Xsens ground truth), pass both definitions and the
+metrics are computed on the standard joints the layouts share.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .definition import SkeletonDefinition
+from .ops import STANDARD_BONES, bone_vectors, common_standard_joints
+
+
+def align_layouts(pred: np.ndarray, target: np.ndarray,
+                  pred_definition: Optional[SkeletonDefinition] = None,
+                  target_definition: Optional[SkeletonDefinition] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brings two joint arrays into a common layout.
+
+    If both definitions are given and differ, both arrays are reduced to the
+    standard joints the layouts share, in STANDARD_JOINTS order. Otherwise
+    the arrays are returned unchanged.
+    """
+    pred = np.asarray(pred, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if pred_definition is not None and target_definition is not None and pred_definition != target_definition:
+        idx_pred, idx_target, slots = common_standard_joints(pred_definition, target_definition)
+        if not slots:
+            raise ValueError(f"'{pred_definition.name}' and '{target_definition.name}' share no standard joints.")
+        pred = pred[..., idx_pred, :]
+        target = target[..., idx_target, :]
+    if pred.shape != target.shape:
+        raise ValueError(f"Shape mismatch: {pred.shape} vs {target.shape}")
+    return pred, target
+
+
+def mpjpe(pred: np.ndarray, target: np.ndarray,
+          pred_definition: Optional[SkeletonDefinition] = None,
+          target_definition: Optional[SkeletonDefinition] = None) -> np.ndarray:
+    """
+    Mean per-joint position error.
+
+    Returns:
+        Array of shape (N,) with the mean joint distance of each pose.
+    """
+    pred, target = align_layouts(pred, target, pred_definition, target_definition)
+    return np.linalg.norm(pred - target, axis=-1).mean(axis=-1)
+
+
+def procrustes_align(pred: np.ndarray, target: np.ndarray, scale: bool = True) -> np.ndarray:
+    """
+    Aligns each predicted pose to its target with the similarity transform
+    (rotation, translation and optionally uniform scale) minimizing the
+    squared error. All poses are solved at once with a batched SVD.
+
+    Args:
+        pred: Array of shape (N, joints, 3).
+        target: Array of shape (N, joints, 3).
+        scale: Whether to also solve for scale.
+
+    Returns:
+        The aligned predictions, shape (N, joints, 3).
+    """
+    mu_pred = pred.mean(axis=-2, keepdims=True)
+    mu_target = target.mean(axis=-2, keepdims=True)
+    x = pred - mu_pred
+    y = target - mu_target
+
+    # Optimal rotation from the SVD of the cross-covariance matrices.
+    h = np.einsum("...ji,...jk->...ik", x, y)
+    u, s, vt = np.linalg.svd(h)
+    # Flip the last singular vector where needed to avoid reflections.
+    d = np.sign(np.linalg.det(np.einsum("...ij,...jk->...ik", u, vt)))
+    s[..., -1] *= d
+    vt[..., -1, :] *= d[..., None]
+    r = np.einsum("...ij,...jk->...ik", u, vt)
+
+    if scale:
+        variance = np.sum(x * x, axis=(-2, -1))
+        factor = (np.sum(s, axis=-1) / np.maximum(variance, 1e-12))[..., None, None]
+    else:
+        factor = 1.0
+    return factor * (x @ r) + mu_target
+
+
+def pa_mpjpe(pred: np.ndarray, target: np.ndarray,
+             pred_definition: Optional[SkeletonDefinition] = None,
+             target_definition: Optional[SkeletonDefinition] = None,
+             scale: bool = True) -> np.ndarray:
+    """
+    Procrustes-aligned MPJPE.
+
+    Returns:
+        Array of shape (N,) with the mean joint distance of each pose after
+        similarity alignment to its target.
+    """
+    pred, target = align_layouts(pred, target, pred_definition, target_definition)
+    aligned = procrustes_align(pred, target, scale)
+    return np.linalg.norm(aligned - target, axis=-1).mean(axis=-1)
+
+
+def pck(pred: np.ndarray, target: np.ndarray, thresholds: Sequence[float],
+        pred_definition: Optional[SkeletonDefinition] = None,
+        target_definition: Optional[SkeletonDefinition] = None) -> np.ndarray:
+    """
+    Percentage of correct keypoints.
+
+    Args:
+        thresholds: Distances (in the units of the positions) below which a
+            joint counts as correct.
+
+    Returns:
+        Array of shape (N, len(thresholds)) with the fraction of correct
+        joints per pose and threshold.
+    """
+    pred, target = align_layouts(pred, target, pred_definition, target_definition)
+    distances = np.linalg.norm(pred - target, axis=-1)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    return (distances[..., None, :] <= thresholds[:, None]).mean(axis=-1)
+
+
+def bone_angle_error(pred: np.ndarray, target: np.ndarray,
+                     pred_definition: SkeletonDefinition,
+                     target_definition: Optional[SkeletonDefinition] = None,
+                     degrees: bool = True) -> np.ndarray:
+    """
+    Angle between corresponding predicted and target bone directions.
+
+    With a single layout all bones of the hierarchy are compared. With two
+    different layouts the STANDARD_BONES both layouts map are compared.
+
+    Returns:
+        Array of shape (N, bones).
+    """
+    pred = np.asarray(pred, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+
+    if target_definition is None or target_definition == pred_definition:
+        pairs_pred = pairs_target = pred_definition.topology.bones
+    else:
+        bones = [(a, b) for a, b in STANDARD_BONES
+                 if None not in (getattr(pred_definition, a), getattr(pred_definition, b),
+                                 getattr(target_definition, a), getattr(target_definition, b))]
+        pairs_pred = np.array([(getattr(pred_definition, a), getattr(pred_definition, b))
+                               for a, b in bones], dtype=np.intp).reshape(-1, 2)
+        pairs_target = np.array([(getattr(target_definition, a), getattr(target_definition, b))
+                                 for a, b in bones], dtype=np.intp).reshape(-1, 2)
+        # Skip bones collapsed to a single joint in either layout
+        keep = (pairs_pred[:, 0] != pairs_pred[:, 1]) & (pairs_target[:, 0] != pairs_target[:, 1])
+        pairs_pred, pairs_target = pairs_pred[keep], pairs_target[keep]
+
+    u = bone_vectors(pred, pairs_pred)
+    v = bone_vectors(target, pairs_target)
+    cross = np.linalg.norm(np.cross(u, v), axis=-1)
+    dot = np.sum(u * v, axis=-1)
+    angles = np.arctan2(cross, dot)
+    return np.rad2deg(angles) if degrees else angles
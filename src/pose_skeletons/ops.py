@@ -0,0 +1,198 @@
+"""
+Batch operations on joint arrays that only need a SkeletonDefinition:
+gathering standard joints across layouts, computing bone vectors and
+mirroring poses.
+
+gather_standard, bone_vectors, bone_lengths and mirror also accept arrays of
+other libraries and return the same type. Arrays implementing the array API
+(``__array_namespace__``, or any library array_api_compat supports, such as
+PyTorch, CuPy or JAX, with the ``arrays`` extra installed) are processed with
+their own namespace on their own device. Other arrays implementing DLPack are
+viewed as NumPy arrays without copying and the result is handed back through
+DLPack.
+"""
+import math
+import sys
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import profiling
+from .definition import STANDARD_JOINTS, SkeletonDefinition
+from .standard_mapping import split_side
+
+
+# Bones between standard joints, defined for any layout that has both slots.
+STANDARD_BONES = (
+    ('hips', 'spine_low'), ('spine_low', 'spine_mid'), ('spine_mid', 'spine_high'),
+    ('spine_high', 'neck'), ('neck', 'head'),
+    ('l_clavicle', 'l_shoulder'), ('l_shoulder', 'l_elbow'), ('l_elbow', 'l_wrist'),
+    ('r_clavicle', 'r_shoulder'), ('r_shoulder', 'r_elbow'), ('r_elbow', 'r_wrist'),
+    ('l_hip', 'l_knee'), ('l_knee', 'l_ankle'), ('l_ankle', 'l_foot'),
+    ('r_hip', 'r_knee'), ('r_knee', 'r_ankle'), ('r_ankle', 'r_foot'),
+    ('l_shoulder', 'r_shoulder'), ('l_hip', 'r_hip'),
+)
+
+# Libraries without __array_namespace__ that array_api_compat wraps.
+_COMPAT_LIBRARIES = ("torch", "cupy", "jax", "jaxlib", "dask", "sparse", "paddle")
+
+
+def _namespace(values) -> Tuple[Any, Any, Callable]:
+    """
+    Returns (xp, array, wrap): the namespace to compute with, the input as an
+    array of that namespace, and a function converting results to the input type.
+    """
+    if isinstance(values, np.ndarray):
+        return np, values, lambda result: result
+    try:
+        import array_api_compat
+    except ImportError:
+        array_api_compat = None
+    if array_api_compat is not None and array_api_compat.is_array_api_obj(values):
+        return array_api_compat.array_namespace(values), values, lambda result: result
+    if hasattr(values, "__array_namespace__"):
+        return values.__array_namespace__(), values, lambda result: result
+    library = type(values).__module__.split(".")[0]
+    if library in _COMPAT_LIBRARIES:
+        # Going through DLPack would fail on GPU tensors and lose autograd.
+        raise ImportError(f"{library} arrays require array_api_compat. "
+                          f"Install it with 'pip install pose_skeletons[arrays]'.")
+    if hasattr(values, "__dlpack__"):
+        module = sys.modules[library]
+        return np, np.from_dlpack(values), lambda result: module.from_dlpack(np.ascontiguousarray(result))
+    return np, np.asarray(values), lambda result: result
+
+
+def _indices(xp, indices, like):
+    """An integer index array in namespace ``xp`` on the device of ``like``."""
+    if xp is np:
+        return np.asarray(indices, dtype=np.intp)
+    device = getattr(like, "device", None)
+    return xp.asarray(np.asarray(indices, dtype=np.int64), device=device) if device is not None \
+        else xp.asarray(np.asarray(indices, dtype=np.int64))
+
+
+def standard_slots(definition: SkeletonDefinition) -> List[str]:
+    """Names of the standard joint slots the definition maps, in STANDARD_JOINTS order."""
+    return [slot for slot in STANDARD_JOINTS if getattr(definition, slot) is not None]
+
+
+def common_standard_joints(a: SkeletonDefinition,
+                           b: SkeletonDefinition) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Finds the standard joints two layouts have in common.
+
+    Returns:
+        A tuple (indices_a, indices_b, slots): joint indices into each layout
+        for every shared slot, and the slot names.
+    """
+    slots = [s for s in STANDARD_JOINTS if getattr(a, s) is not None and getattr(b, s) is not None]
+    indices_a = np.array([getattr(a, s) for s in slots], dtype=np.intp)
+    indices_b = np.array([getattr(b, s) for s in slots], dtype=np.intp)
+    return indices_a, indices_b, slots
+
+
+def gather_standard(values: np.ndarray, definition: SkeletonDefinition,
+                    slots: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Gathers standard joints from a (..., joints, C) array.
+
+    Args:
+        values: Per-joint values in the definition's layout.
+        definition: The layout of ``values``.
+        slots: Standard joint names to gather. Defaults to all mapped slots.
+
+    Returns:
+        Array of shape (..., len(slots), C).
+    """
+    slots = standard_slots(definition) if slots is None else slots
+    indices = [getattr(definition, s) for s in slots]
+    if any(i is None for i in indices):
+        missing = [s for s, i in zip(slots, indices) if i is None]
+        raise ValueError(f"'{definition.name}' does not map standard joints {missing}.")
+    xp, values, wrap = _namespace(values)
+    frames = math.prod(values.shape[:-2])
+    with profiling.stage("gather_standard", frames=frames, nbytes=getattr(values, "nbytes", None),
+                         skeleton=definition.name):
+        return wrap(xp.take(values, _indices(xp, indices, values), axis=-2))
+
+
+def bone_pairs(definition: SkeletonDefinition, standard: bool = False) -> np.ndarray:
+    """
+    (parent, child) joint index pairs of a layout.
+
+    Args:
+        definition: The layout.
+        standard: Use the STANDARD_BONES available in the layout instead of the
+            full hierarchy.
+
+    Returns:
+        Integer array of shape (bones, 2).
+    """
+    if not standard:
+        return definition.topology.bones
+    pairs = [(getattr(definition, a), getattr(definition, b)) for a, b in STANDARD_BONES]
+    # Some layouts map two slots to one joint (e.g. Optitrack's spine_high and neck)
+    return np.array([p for p in pairs if None not in p and p[0] != p[1]], dtype=np.intp).reshape(-1, 2)
+
+
+def bone_vectors(positions: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Child minus parent position for each (parent, child) pair, shape (..., bones, 3)."""
+    xp, positions, wrap = _namespace(positions)
+    pairs = np.asarray(pairs)
+    children = xp.take(positions, _indices(xp, pairs[:, 1], positions), axis=-2)
+    return wrap(children - xp.take(positions, _indices(xp, pairs[:, 0], positions), axis=-2))
+
+
+def bone_lengths(positions: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Length of each bone, shape (..., bones)."""
+    xp, positions, wrap = _namespace(positions)
+    if xp is np:
+        return wrap(np.linalg.norm(bone_vectors(positions, pairs), axis=-1))
+    vectors = bone_vectors(positions, pairs)
+    return wrap(xp.sqrt(xp.sum(vectors * vectors, axis=-1)))
+
+
+def mirror_indices(definition: SkeletonDefinition) -> np.ndarray:
+    """
+    Permutation swapping every left joint with its right counterpart, matched
+    by name (e.g. "LeftHand" and "RightHand", "l_hip" and "r_hip"). Joints
+    without a counterpart map to themselves.
+    """
+    lookup = {}
+    for i, name in enumerate(definition.original_names):
+        side, tokens = split_side(name)
+        if side is not None:
+            # Keep digits, unlike the standard mapping, so finger segments pair up.
+            lookup[(side, tuple(tokens))] = i
+    permutation = np.arange(len(definition.original_names))
+    for (side, core), i in lookup.items():
+        other = lookup.get(("r" if side == "l" else "l", core))
+        if other is not None:
+            permutation[i] = other
+    return permutation
+
+
+def mirror(values: np.ndarray, definition: SkeletonDefinition, axis: Optional[int] = 0) -> np.ndarray:
+    """
+    Mirrors (..., joints, C) per-joint values: left and right joints are
+    swapped and, for positions, the coordinate ``axis`` is negated.
+
+    Args:
+        values: Per-joint values, e.g. positions (..., joints, 3).
+        definition: The layout of ``values``.
+        axis: The coordinate across the body's left-right direction, or None
+            to only swap joints (e.g. for confidences).
+    """
+    xp, values, wrap = _namespace(values)
+    swapped = xp.take(values, _indices(xp, mirror_indices(definition), values), axis=-2)
+    if axis is None:
+        return wrap(swapped)
+    sign = np.ones(values.shape[-1])
+    sign[axis] = -1.0
+    if xp is np:
+        return wrap(swapped * sign.astype(values.dtype))
+    device = getattr(values, "device", None)
+    sign = xp.asarray(sign, dtype=values.dtype, device=device) if device is not None \
+        else xp.asarray(sign, dtype=values.dtype)
+    return wrap(swapped * sign)
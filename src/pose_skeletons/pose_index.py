@@ -0,0 +1,215 @@
+"""
+Nearest-pose retrieval over large pose collections.
+
+Poses are normalized (root-relative and rotated about the up axis so the hips
+face a fixed direction), flattened into feature vectors and indexed with one
+of several backends:
+
+    "brute"   exact search, chunked matrix products
+    "kdtree"  exact search with scipy's cKDTree (requires scipy)
+    "pq"      approximate search with product quantization, ~1 byte per
+              subspace per pose, for collections that do not fit in memory
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .canonical import canonicalize
+from .definition import SkeletonDefinition
+
+
+# Number of database poses scored at once per query batch.
+_DATABASE_BLOCK = 16384
+
+
+def normalize_poses(positions: np.ndarray, definition: SkeletonDefinition, up_axis: str = "y") -> np.ndarray:
+    """
+    Makes poses root-relative and rotates them about the up axis so that the
+    right-to-left hip axis points along the first horizontal axis.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+        definition: The skeleton of the poses.
+        up_axis: The vertical axis, "x", "y" or "z".
+
+    Returns:
+        Normalized positions with the same shape.
+    """
+    return canonicalize(positions, definition, up_axis)[0]
+
+
+def _squared_distances(queries: np.ndarray, data: np.ndarray, data_norms: np.ndarray) -> np.ndarray:
+    d = data_norms[None, :] - 2.0 * queries @ data.T + np.sum(queries * queries, axis=1)[:, None]
+    return np.maximum(d, 0.0)
+
+
+def _top_k(distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, distances.shape[1])
+    idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(distances, idx, axis=1)
+    order = np.argsort(part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = data[rng.choice(len(data), size=k, replace=len(data) < k)].copy()
+    for _ in range(iterations):
+        assign = np.argmin(_squared_distances(data, centroids, np.sum(centroids ** 2, axis=1)), axis=1)
+        sums = np.stack([np.bincount(assign, weights=data[:, d], minlength=k)
+                         for d in range(data.shape[1])], axis=1)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class PoseDatabase:
+    """
+    k-nearest-pose index for one skeleton layout.
+
+    Example:
+        db = PoseDatabase(get_skeleton_def("smpl"), method="pq")
+        db.fit(positions)                       # (N, joints, 3)
+        distances, indices = db.query(queries, k=5)
+    """
+
+    def __init__(self, definition: SkeletonDefinition,
+                 joints: Optional[Sequence[int]] = None,
+                 up_axis: str = "y",
+                 method: str = "brute",
+                 pq_subspaces: int = 8,
+                 pq_centroids: int = 256,
+                 pq_training_size: int = 16384,
+                 chunk_size: int = 1024,
+                 seed: int = 0):
+        """
+        Args:
+            definition: The skeleton of all poses in the database.
+            joints: Joints used for the feature vectors. Defaults to the
+                definition's standard joints.
+            up_axis: The vertical axis of the positions.
+            method: "brute" or "kdtree" for exact results, or "pq" for
+                approximate results with a compact index.
+            pq_subspaces: Number of product quantization subspaces.
+            pq_centroids: Centroids per subspace (at most 256).
+            pq_training_size: Number of poses sampled to train the codebooks.
+            chunk_size: Number of queries processed per batch.
+            seed: Seed for codebook training.
+        """
+        if method not in ("brute", "kdtree", "pq"):
+            raise ValueError(f"Unknown index method '{method}'. Expected 'brute', 'kdtree' or 'pq'.")
+        if not 1 <= pq_centroids <= 256:
+            raise ValueError("pq_centroids must be between 1 and 256.")
+
+        self.definition = definition
+        self.joints = np.asarray(definition.get_ordered_indices() if joints is None else joints, dtype=np.intp)
+        self.up_axis = up_axis
+        self.method = method
+        self.pq_subspaces = pq_subspaces
+        self.pq_centroids = pq_centroids
+        self.pq_training_size = pq_training_size
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.size = 0
+
+    def features(self, positions: np.ndarray) -> np.ndarray:
+        """Normalized, flattened feature vectors of shape (N, len(joints) * 3)."""
+        normalized = normalize_poses(positions, self.definition, self.up_axis)
+        return normalized[..., self.joints, :].reshape(-1, len(self.joints) * 3).astype(np.float32)
+
+    def fit(self, positions: np.ndarray) -> "PoseDatabase":
+        """
+        Builds the index.
+
+        Args:
+            positions: Joint positions of shape (N, joints, 3).
+        """
+        features = self.features(positions)
+        self.size = len(features)
+
+        if self.method == "brute":
+            self._data = features
+            self._norms = np.sum(features.astype(np.float64) ** 2, axis=1)
+        elif self.method == "kdtree":
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                raise ImportError("The 'kdtree' method requires scipy. Install it with "
+                                  "'pip install pose_skeletons[scipy]' or use method='brute'.")
+            self._tree = cKDTree(features)
+        else:
+            self._fit_pq(features)
+        return self
+
+    def _fit_pq(self, features: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        self._bounds = np.linspace(0, features.shape[1], self.pq_subspaces + 1).astype(int)
+        sample = features[rng.choice(len(features), size=min(len(features), self.pq_training_size),
+                                     replace=False)].astype(np.float64)
+
+        self._codebooks = []
+        self._codes = np.empty((len(features), self.pq_subspaces), dtype=np.uint8)
+        for m in range(self.pq_subspaces):
+            lo, hi = self._bounds[m], self._bounds[m + 1]
+            centroids = _kmeans(sample[:, lo:hi], self.pq_centroids, 20, rng)
+            norms = np.sum(centroids ** 2, axis=1)
+            for start in range(0, len(features), self.chunk_size):
+                block = features[start:start + self.chunk_size, lo:hi].astype(np.float64)
+                self._codes[start:start + len(block), m] = np.argmin(
+                    _squared_distances(block, centroids, norms), axis=1)
+            self._codebooks.append(centroids)
+
+    def query(self, positions: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest database poses for a batch of query poses.
+
+        Args:
+            positions: Query joint positions of shape (Q, joints, 3).
+            k: Number of neighbours.
+
+        Returns:
+            A tuple (distances, indices), both of shape (Q, min(k, size)).
+            Distances are Euclidean in feature space (approximate for "pq").
+        """
+        if self.size == 0:
+            raise ValueError("The pose database is empty; call fit() first.")
+        if k < 1:
+            raise ValueError("k must be at least 1.")
+        k = min(k, self.size)
+        queries = self.features(positions)
+
+        if self.method == "kdtree":
+            distances, indices = self._tree.query(queries, k=k)
+            return distances.reshape(len(queries), -1), indices.reshape(len(queries), -1)
+
+        results = [self._query_block(queries[start:start + self.chunk_size].astype(np.float64), k)
+                   for start in range(0, len(queries), self.chunk_size)]
+        distances = np.concatenate([r[0] for r in results])
+        indices = np.concatenate([r[1] for r in results])
+        return np.sqrt(distances), indices
+
+    def _query_block(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.method == "pq":
+            # Asymmetric distance: per-subspace lookup tables indexed by the codes.
+            tables = []
+            for m, centroids in enumerate(self._codebooks):
+                lo, hi = self._bounds[m], self._bounds[m + 1]
+                tables.append(_squared_distances(queries[:, lo:hi], centroids, np.sum(centroids ** 2, axis=1)))
+
+        # Scan the database in blocks, merging each block's top k into the running result.
+        best_d = np.empty((len(queries), 0))
+        best_i = np.empty((len(queries), 0), dtype=np.intp)
+        for start in range(0, self.size, _DATABASE_BLOCK):
+            stop = min(start + _DATABASE_BLOCK, self.size)
+            if self.method == "brute":
+                distances = _squared_distances(queries, self._data[start:stop], self._norms[start:stop])
+            else:
+                distances = np.zeros((len(queries), stop - start))
+                for m, table in enumerate(tables):
+                    distances += table[:, self._codes[start:stop, m]]
+            block_d, block_i = _top_k(distances, k)
+            merged_d = np.concatenate([best_d, block_d], axis=1)
+            merged_i = np.concatenate([best_i, block_i + start], axis=1)
+            best_d, order = _top_k(merged_d, k)
+            best_i = np.take_along_axis(merged_i, order, axis=1)
+        return best_d, best_i
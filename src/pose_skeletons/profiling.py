@@ -0,0 +1,220 @@
+"""
+Optional timing instrumentation for the operations this package performs.
+
+Instrumented operations (definition lookup, skeleton detection, BVH parsing,
+standard-joint remapping, ...) report a StageRecord to every active Profiler
+and registered callback. With neither present the overhead is a single check.
+
+Example:
+    with Profiler(track_allocations=True) as profiler:
+        run_pipeline()
+    print(profiler.counters())
+    profiler.to_chrome_trace("trace.json")  # open in chrome://tracing or Perfetto
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class StageRecord:
+    name: str
+    start_ns: int
+    duration_ns: int = 0
+    thread_id: int = 0
+    frames: Optional[int] = None
+    nbytes: Optional[int] = None
+    allocated_bytes: Optional[int] = None  # net traced allocation, if tracked
+    peak_bytes: Optional[int] = None       # peak traced memory during the stage, if tracked
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class _NullStage:
+    """Stand-in stage when instrumentation is off; attribute writes are dropped."""
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {}
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+_lock = threading.Lock()
+_profilers: List["Profiler"] = []
+_callbacks: List[Callable[[StageRecord], None]] = []
+# Profilers tracking allocations, and whether tracemalloc was started by them.
+_tracking_profilers = 0
+_started_tracemalloc = False
+# Peak traced memory of every active tracked stage. tracemalloc has a single
+# peak, so it is folded into all of them before each reset.
+_stage_peaks: List[List[int]] = []
+
+
+def add_callback(callback: Callable[[StageRecord], None]):
+    """Registers a function called with every completed StageRecord."""
+    with _lock:
+        _callbacks.append(callback)
+
+
+def remove_callback(callback: Callable[[StageRecord], None]):
+    with _lock:
+        _callbacks.remove(callback)
+
+
+def is_enabled() -> bool:
+    return bool(_profilers or _callbacks)
+
+
+def stage(name: str, frames: Optional[int] = None, nbytes: Optional[int] = None, **metadata):
+    """
+    Times a block of work as a named stage.
+
+    The record bound by ``with`` can be updated inside the block, e.g.
+    ``s.frames = n`` once the frame count is known. When instrumentation is off
+    a shared no-op context is returned, so hot paths pay no generator setup.
+    """
+    if not (_profilers or _callbacks):
+        return _NULL_STAGE
+    return _timed_stage(name, frames, nbytes, metadata)
+
+
+@contextmanager
+def _timed_stage(name: str, frames: Optional[int], nbytes: Optional[int], metadata: Dict[str, Any]):
+    track = tracemalloc.is_tracing() and any(p.track_allocations for p in _profilers)
+    if track:
+        peak = [0]
+        with _lock:
+            before, outer_peak = tracemalloc.get_traced_memory()
+            for other in _stage_peaks:
+                other[0] = max(other[0], outer_peak)
+            tracemalloc.reset_peak()
+            _stage_peaks.append(peak)
+
+    record = StageRecord(name, time.perf_counter_ns(), thread_id=threading.get_ident(),
+                         frames=frames, nbytes=nbytes, metadata=metadata)
+    try:
+        yield record
+    finally:
+        record.duration_ns = time.perf_counter_ns() - record.start_ns
+        if track:
+            with _lock:
+                current, traced_peak = tracemalloc.get_traced_memory()
+                for active in _stage_peaks:
+                    active[0] = max(active[0], traced_peak)
+                del _stage_peaks[next(i for i, p in enumerate(_stage_peaks) if p is peak)]
+            if tracemalloc.is_tracing():
+                record.allocated_bytes = current - before
+                record.peak_bytes = peak[0] - before
+        _emit(record)
+
+
+def _emit(record: StageRecord):
+    with _lock:
+        profilers = list(_profilers)
+        callbacks = list(_callbacks)
+    for profiler in profilers:
+        profiler._add(record)
+    for callback in callbacks:
+        callback(record)
+
+
+class Profiler:
+    """
+    Collects StageRecords from all threads while active.
+
+    Args:
+        track_allocations: Also record allocations per stage with tracemalloc.
+            Nested and overlapping profilers share one tracemalloc session.
+            Figures include allocations of other threads, and tracking adds
+            noticeable overhead.
+    """
+
+    def __init__(self, track_allocations: bool = False):
+        self.track_allocations = track_allocations
+        self.records: List[StageRecord] = []
+        self._records_lock = threading.Lock()
+
+    def __enter__(self) -> "Profiler":
+        global _tracking_profilers, _started_tracemalloc
+        with _lock:
+            if self.track_allocations:
+                if _tracking_profilers == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _started_tracemalloc = True
+                _tracking_profilers += 1
+            _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        global _tracking_profilers, _started_tracemalloc
+        with _lock:
+            _profilers.remove(self)
+            if self.track_allocations:
+                _tracking_profilers -= 1
+                # Only stop tracing started here, once the last tracking profiler exits.
+                if _tracking_profilers == 0 and _started_tracemalloc:
+                    tracemalloc.stop()
+                    _started_tracemalloc = False
+
+    def _add(self, record: StageRecord):
+        with self._records_lock:
+            self.records.append(record)
+
+    def counters(self) -> Dict[str, Dict[str, float]]:
+        """
+        Aggregates the records per stage name.
+
+        Returns:
+            {name: {"count", "total_ms", "mean_ms", "max_ms", "frames", "bytes"}}
+            plus "allocated_bytes" when allocations are tracked.
+        """
+        out: Dict[str, Dict[str, float]] = {}
+        with self._records_lock:
+            records = list(self.records)
+        for r in records:
+            c = out.setdefault(r.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "frames": 0, "bytes": 0})
+            ms = r.duration_ns / 1e6
+            c["count"] += 1
+            c["total_ms"] += ms
+            c["max_ms"] = max(c["max_ms"], ms)
+            c["frames"] += r.frames or 0
+            c["bytes"] += r.nbytes or 0
+            if r.allocated_bytes is not None:
+                c["allocated_bytes"] = c.get("allocated_bytes", 0) + r.allocated_bytes
+        for c in out.values():
+            c["mean_ms"] = c["total_ms"] / c["count"]
+        return out
+
+    def to_chrome_trace(self, path: str):
+        """Writes the records in Chrome trace event format (complete events)."""
+        with self._records_lock:
+            records = list(self.records)
+        pid = os.getpid()
+        events = []
+        for r in records:
+            args = dict(r.metadata)
+            for key in ("frames", "nbytes", "allocated_bytes", "peak_bytes"):
+                value = getattr(r, key)
+                if value is not None:
+                    args[key] = value
+            events.append({
+                "name": r.name, "cat": "pose_skeletons", "ph": "X",
+                "ts": r.start_ns / 1000.0, "dur": r.duration_ns / 1000.0,
+                "pid": pid, "tid": r.thread_id, "args": args,
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
@@ -0,0 +1,297 @@
+"""
+Headless rendering of skeleton batches into NumPy image buffers.
+
+Bones come from the compiled topology and are drawn as anti-aliased lines
+for all frames of a batch at once: every bone is expanded into pixel samples
+with a coverage value, and the samples are composited in a single scatter.
+No plotting library is needed, and frames can be written with write_png.
+
+Example:
+    points = project_points(positions, projection)              # (frames, joints, 2)
+    images = render_skeletons(points, definition, 256, 256)      # (frames, 256, 256, 3)
+    write_png("preview.png", image_grid(images[::30], columns=8))
+"""
+import struct
+import zlib
+from typing import Optional, Sequence
+
+import numpy as np
+
+from . import profiling
+from .canonical import up_axis_index
+from .definition import SkeletonDefinition
+from .standard_mapping import split_side
+
+
+LEFT_COLOR = (66, 135, 245)
+RIGHT_COLOR = (245, 90, 66)
+CENTER_COLOR = (230, 230, 230)
+
+
+def project_points(points3d: np.ndarray, projection: np.ndarray) -> np.ndarray:
+    """
+    Projects (..., 3) points with a 3x4 camera matrix, shape (..., 2).
+
+    Points on or behind the camera plane (depth <= 0) have no image and
+    become NaN, so render_skeletons skips them.
+    """
+    points3d = np.asarray(points3d, dtype=np.float64)
+    projection = np.asarray(projection, dtype=np.float64)
+    image = points3d @ projection[:, :3].T + projection[:, 3]
+    depth = np.where(image[..., 2:] > 0, image[..., 2:], np.nan)
+    return image[..., :2] / depth
+
+
+def orthographic(points3d: np.ndarray, up_axis: str = "y", view_axis: Optional[str] = None) -> np.ndarray:
+    """
+    Drops the viewing axis of (..., 3) points for a front view, with the up
+    axis pointing up in the image (negative image y).
+
+    Args:
+        up_axis: The vertical axis.
+        view_axis: The axis to look along. Defaults to the last non-up axis.
+    """
+    up = up_axis_index(up_axis)
+    horizontal = [a for a in range(3) if a != up]
+    view = horizontal[-1] if view_axis is None else up_axis_index(view_axis)
+    across = [a for a in horizontal if a != view][0]
+    points3d = np.asarray(points3d, dtype=np.float64)
+    return np.stack([points3d[..., across], -points3d[..., up]], axis=-1)
+
+
+def fit_to_image(points2d: np.ndarray, width: int, height: int, margin: float = 0.05,
+                 per_frame: bool = False) -> np.ndarray:
+    """
+    Scales and centers (..., joints, 2) points into a width x height image,
+    keeping the aspect ratio.
+
+    Args:
+        per_frame: Fit every frame separately instead of the whole batch, so
+            the subject fills each thumbnail.
+    """
+    points2d = np.asarray(points2d, dtype=np.float64)
+    axes = (-2,) if per_frame else tuple(range(points2d.ndim - 1))
+    low = np.nanmin(points2d, axis=axes, keepdims=True)
+    high = np.nanmax(points2d, axis=axes, keepdims=True)
+    extent = np.maximum(high - low, 1e-9)
+    size = np.array([width, height]) * (1.0 - 2.0 * margin)
+    scale = np.min(size / extent, axis=-1, keepdims=True)
+    center = 0.5 * (low + high)
+    return (points2d - center) * scale + 0.5 * np.array([width, height])
+
+
+def bone_colors(definition: SkeletonDefinition) -> np.ndarray:
+    """RGB color per bone of ``definition.topology.bones``, by the side of the child joint."""
+    sides = {"l": LEFT_COLOR, "r": RIGHT_COLOR, None: CENTER_COLOR}
+    colors = [sides[split_side(definition.original_names[child])[0]] for child in definition.topology.bones[:, 1]]
+    return np.array(colors, dtype=np.uint8).reshape(-1, 3)
+
+
+def _clip_segments(start: np.ndarray, end: np.ndarray, low: np.ndarray, high: np.ndarray):
+    """
+    Liang-Barsky clipping of line segments (S, 2) to the box [low, high].
+
+    Returns:
+        (start, end, inside): the clipped endpoints of the segments that
+        touch the box and the mask selecting them.
+    """
+    delta = end - start
+    t0 = np.zeros(len(start))
+    t1 = np.ones(len(start))
+    inside = np.ones(len(start), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-delta, start - low), (delta, high - start)):
+            for axis in range(2):
+                pa, qa = p[:, axis], q[:, axis]
+                inside &= (pa != 0) | (qa >= 0)  # parallel to the edge and outside it
+                r = qa / pa
+                t0 = np.where(pa < 0, np.maximum(t0, r), t0)
+                t1 = np.where(pa > 0, np.minimum(t1, r), t1)
+    inside &= t0 <= t1
+    start, end, delta, t0, t1 = start[inside], end[inside], delta[inside], t0[inside], t1[inside]
+    return start + t0[:, None] * delta, start + t1[:, None] * delta, inside
+
+
+def _segment_samples(start: np.ndarray, end: np.ndarray, half_width: float):
+    """
+    Pixel samples covering line segments of shape (S, 2).
+
+    Returns:
+        (segment, x, y, coverage) arrays over all samples.
+    """
+    delta = end - start
+    steep = np.abs(delta[:, 1]) > np.abs(delta[:, 0])
+    # Work in (major, minor) coordinates with the major axis the longer one.
+    a0 = np.where(steep, start[:, 1], start[:, 0])
+    a1 = np.where(steep, end[:, 1], end[:, 0])
+    b0 = np.where(steep, start[:, 0], start[:, 1])
+    b1 = np.where(steep, end[:, 0], end[:, 1])
+    flip = a1 < a0
+    a0, a1, b0, b1 = np.where(flip, a1, a0), np.where(flip, a0, a1), np.where(flip, b1, b0), np.where(flip, b0, b1)
+    slope = (b1 - b0) / np.maximum(a1 - a0, 1e-12)
+    cos = 1.0 / np.sqrt(1.0 + slope * slope)
+
+    first = np.floor(a0 + 0.5).astype(np.int64)
+    steps = np.maximum(np.floor(a1 + 0.5).astype(np.int64) - first + 1, 0)
+    segment = np.repeat(np.arange(len(start)), steps)
+    offsets = np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)
+    major = first[segment] + offsets
+    minor = b0[segment] + (major - a0[segment]) * slope[segment]
+
+    # Pixels across the line within the half width (measured perpendicular to it).
+    reach = int(np.ceil(half_width + 1.0))
+    across = np.arange(-reach, reach + 1)
+    pixel = np.floor(minor + 0.5).astype(np.int64)[:, None] + across
+    distance = np.abs(pixel - minor[:, None]) * cos[segment][:, None]
+    coverage = np.clip(half_width + 0.5 - distance, 0.0, 1.0)
+
+    # Fade the samples at both ends by their overlap with the segment.
+    overhang = np.maximum(a0[segment] - major, 0) + np.maximum(major - a1[segment], 0)
+    coverage *= np.clip(1.0 - overhang, 0.0, 1.0)[:, None]
+
+    segment = np.repeat(segment, len(across))
+    major = np.repeat(major, len(across))
+    pixel = pixel.ravel()
+    steep = steep[segment]
+    x = np.where(steep, pixel, major)
+    y = np.where(steep, major, pixel)
+    return segment, x, y, coverage.ravel()
+
+
+def _disc_samples(centers: np.ndarray, radius: float):
+    reach = int(np.ceil(radius + 1.0))
+    grid = np.arange(-reach, reach + 1)
+    gx, gy = np.meshgrid(grid, grid)
+    base = np.floor(centers + 0.5).astype(np.int64)
+    x = base[:, 0, None] + gx.ravel()
+    y = base[:, 1, None] + gy.ravel()
+    distance = np.hypot(x - centers[:, 0, None], y - centers[:, 1, None])
+    coverage = np.clip(radius + 0.5 - distance, 0.0, 1.0)
+    index = np.repeat(np.arange(len(centers)), gx.size)
+    return index, x.ravel(), y.ravel(), coverage.ravel()
+
+
+def _composite(images: np.ndarray, frame: np.ndarray, x: np.ndarray, y: np.ndarray,
+               coverage: np.ndarray, colors: np.ndarray):
+    """Blends samples into (frames, height, width, 3) images, strongest sample per pixel."""
+    frames, height, width = images.shape[:3]
+    keep = (x >= 0) & (x < width) & (y >= 0) & (y < height) & (coverage > 0)
+    frame, x, y, coverage, colors = frame[keep], x[keep], y[keep], coverage[keep], colors[keep]
+    pixel = (frame * height + y) * width + x
+
+    touched, sample_pixel = np.unique(pixel, return_inverse=True)
+    alpha = np.zeros(len(touched))
+    np.maximum.at(alpha, sample_pixel, coverage)
+    winner = coverage >= alpha[sample_pixel]
+    color = np.zeros((len(touched), 3))
+    color[sample_pixel[winner]] = colors[winner]
+
+    flat = images.reshape(-1, 3)
+    a = alpha[:, None]
+    flat[touched] = np.rint(flat[touched] * (1.0 - a) + color * a).astype(images.dtype)
+    if not np.shares_memory(flat, images):
+        images[...] = flat.reshape(images.shape)
+
+
+def render_skeletons(points2d: np.ndarray, definition: SkeletonDefinition, width: int, height: int,
+                     images: Optional[np.ndarray] = None,
+                     colors: Optional[np.ndarray] = None,
+                     line_width: float = 1.5, joint_radius: float = 0.0,
+                     background: Sequence[int] = (0, 0, 0)) -> np.ndarray:
+    """
+    Draws skeletons into image buffers.
+
+    Args:
+        points2d: Pixel coordinates of shape (frames, joints, 2) or
+            (frames, people, joints, 2); NaN joints are skipped.
+        definition: The layout of the points.
+        width: Image width in pixels.
+        height: Image height in pixels.
+        images: Optional (frames, height, width, 3) uint8 buffers to draw
+            into, e.g. video frames for overlays. Modified in place.
+        colors: RGB color per bone. Defaults to :func:`bone_colors`.
+        line_width: Bone width in pixels.
+        joint_radius: Radius of the joint dots, 0 to draw bones only.
+        background: Background color when ``images`` is not given.
+
+    Returns:
+        The (frames, height, width, 3) uint8 images.
+    """
+    points2d = np.asarray(points2d, dtype=np.float64)
+    num_joints = len(definition.original_names)
+    if points2d.shape[-2:] != (num_joints, 2) or points2d.ndim not in (3, 4):
+        raise ValueError(f"Expected points of shape (frames, [people,] {num_joints}, 2), got {points2d.shape}.")
+    num_frames = points2d.shape[0]
+    # Flatten people into the joint axis: each person is a separate set of bones.
+    people = 1 if points2d.ndim == 3 else points2d.shape[1]
+    points = points2d.reshape(num_frames, people, num_joints, 2)
+
+    if images is None:
+        images = np.empty((num_frames, height, width, 3), dtype=np.uint8)
+        images[:] = np.asarray(background, dtype=np.uint8)
+    elif images.shape != (num_frames, height, width, 3):
+        raise ValueError(f"Expected images of shape {(num_frames, height, width, 3)}, got {images.shape}.")
+    colors = bone_colors(definition) if colors is None else np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+    bones = definition.topology.bones
+    with profiling.stage("render_skeletons", frames=num_frames, nbytes=images.nbytes):
+        start = points[:, :, bones[:, 0]].reshape(-1, 2)
+        end = points[:, :, bones[:, 1]].reshape(-1, 2)
+        bone_frame = np.repeat(np.arange(num_frames), people * len(bones))
+        bone_color = np.tile(colors, (num_frames * people, 1))
+        valid = np.flatnonzero(np.all(np.isfinite(start) & np.isfinite(end), axis=1))
+        # Clip bones to the image, widened by the line's reach so that
+        # anti-aliased edges and end fades stay outside the visible area.
+        reach = 0.5 * line_width + 1.0
+        low, high = np.array([-reach, -reach]), np.array([width - 1 + reach, height - 1 + reach])
+        start, end, inside = _clip_segments(start[valid], end[valid], low, high)
+        valid = valid[inside]
+        segment, x, y, coverage = _segment_samples(start, end, 0.5 * line_width)
+        frame, color = bone_frame[valid][segment], bone_color[valid][segment]
+
+        if joint_radius > 0:
+            centers = points.reshape(-1, 2)
+            joint_frame = np.repeat(np.arange(num_frames), people * num_joints)
+            reach = joint_radius + 1.0
+            finite = np.all((centers >= -reach) & (centers <= np.array([width - 1, height - 1]) + reach), axis=1)
+            index, jx, jy, jcoverage = _disc_samples(centers[finite], joint_radius)
+            frame = np.concatenate([frame, joint_frame[finite][index]])
+            x, y = np.concatenate([x, jx]), np.concatenate([y, jy])
+            coverage = np.concatenate([coverage, jcoverage])
+            color = np.concatenate([color, np.broadcast_to(np.array(CENTER_COLOR, dtype=np.uint8), (len(index), 3))])
+
+        _composite(images, frame, x, y, coverage, color.astype(np.float64))
+    return images
+
+
+def image_grid(images: np.ndarray, columns: int, padding: int = 2,
+               background: Sequence[int] = (0, 0, 0)) -> np.ndarray:
+    """Tiles (N, height, width, 3) images into one contact sheet."""
+    images = np.asarray(images)
+    count, height, width = images.shape[:3]
+    rows = -(-count // columns)
+    sheet = np.empty((rows * (height + padding) + padding, columns * (width + padding) + padding, 3),
+                     dtype=images.dtype)
+    sheet[:] = np.asarray(background, dtype=images.dtype)
+    for i in range(count):
+        top = padding + (i // columns) * (height + padding)
+        left = padding + (i % columns) * (width + padding)
+        sheet[top:top + height, left:left + width] = images[i]
+    return sheet
+
+
+def write_png(path: str, image: np.ndarray, level: int = 6):
+    """Writes an (height, width, 3) or (height, width) uint8 image as PNG without extra dependencies."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    color_type = 2 if image.ndim == 3 else 0
+    raw = np.zeros((height, 1 + image[0].size), dtype=np.uint8)  # filter byte 0 per row
+    raw[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+                + chunk(b"IDAT", zlib.compress(raw.tobytes(), level)) + chunk(b"IEND", b""))
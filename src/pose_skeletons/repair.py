@@ -0,0 +1,311 @@
+"""
+Detection and repair of common keypoint tracker glitches in whole clips:
+left/right swaps, short teleports of single joints and exploding bone
+lengths.
+
+Detection is vectorized over frames and joints. Swapped limbs are swapped
+back using the layout's mirror map; joints flagged as teleports or bone
+outliers are removed and the gaps filled by linear interpolation.
+
+Thresholds are relative to the clip's median bone length, so the same
+settings work for metric 3D keypoints and for pixel coordinates.
+
+Example:
+    repaired, report = repair_glitches(keypoints, get_skeleton_def("stereolabs_body34"),
+                                       confidences=scores)
+"""
+import warnings
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import profiling
+from .definition import SkeletonDefinition
+from .ops import mirror_indices
+
+
+def body_scale(positions: np.ndarray, definition: SkeletonDefinition) -> float:
+    """Median bone length over a clip (..., joints, D), ignoring missing joints."""
+    bones = definition.topology.bones
+    positions = np.asarray(positions, dtype=np.float64)
+    lengths = np.linalg.norm(positions[..., bones[:, 1], :] - positions[..., bones[:, 0], :], axis=-1)
+    lengths = lengths[np.isfinite(lengths) & (lengths > 0)]
+    if not len(lengths):
+        raise ValueError("The clip has no measurable bone; cannot determine its scale.")
+    return float(np.median(lengths))
+
+
+def _forward_fill(positions: np.ndarray) -> np.ndarray:
+    """Replaces missing joints (F, J, D) by their last valid position."""
+    valid = np.all(np.isfinite(positions), axis=-1)
+    last = np.where(valid, np.arange(len(positions))[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    return positions[last, np.arange(positions.shape[1])]
+
+
+def swap_groups(definition: SkeletonDefinition) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Joint pairs that trackers swap together: one group per arm and leg
+    (everything below the shoulder or hip) and one per set of remaining
+    left/right joints under a common joint, e.g. eyes and ears.
+
+    Returns:
+        A list of (side_a, side_b) index arrays; ``side_b`` is the mirror of ``side_a``.
+    """
+    permutation = mirror_indices(definition)
+    parents = definition.parents
+    anchors = {getattr(definition, slot) for slot in ("l_shoulder", "r_shoulder", "l_hip", "r_hip")} - {None}
+
+    groups = {}
+    for joint in np.flatnonzero(permutation > np.arange(len(permutation))):
+        node = joint
+        while node >= 0 and node not in anchors and permutation[node] != node:
+            node = parents[node]
+        key = min(node, permutation[node]) if node >= 0 else -1
+        groups.setdefault(key, []).append(joint)
+    return [(np.array(side), permutation[side]) for side in groups.values()]
+
+
+def detect_swaps(positions: np.ndarray, definition: SkeletonDefinition, ratio: float = 0.5,
+                 min_jump: float = 0.5, max_run: Optional[int] = None) -> np.ndarray:
+    """
+    Frames in which a limb's left and right joints are swapped.
+
+    A swap starts where the mirrored joints fit the previous frame much
+    better than the joints themselves. Each swap is then followed on its
+    own: it ends at the first frame whose unswapped joints fit the previous,
+    repaired frame better than the mirrored ones, so a missed end cannot
+    leave the rest of the clip swapped. The first frame is assumed correct.
+
+    Args:
+        positions: Keypoints of shape (frames, joints, D).
+        definition: The layout of ``positions``.
+        ratio: A swap needs the mirrored distance below ``ratio`` times
+            the direct distance to start.
+        min_jump: Smallest direct distance of a swap start, relative to the
+            body scale, so limbs crossing over each other are not taken for swaps.
+        max_run: Longest swap in frames. Longer swaps are only repaired for
+            their first ``max_run`` frames; the rest of such a swap, up to
+            its end, is left unchanged. None does not limit them.
+
+    Returns:
+        Boolean array of shape (frames, groups), see :func:`swap_groups`.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    groups = swap_groups(definition)
+    swapped = np.zeros((len(positions), len(groups)), dtype=bool)
+    if len(positions) < 2 or not groups:
+        return swapped
+    filled = _forward_fill(positions)
+    threshold = min_jump * body_scale(positions, definition)
+    limit = len(positions) if max_run is None else max_run
+    with np.errstate(invalid="ignore"), profiling.stage("repair.detect_swaps", frames=len(positions)):
+        for g, (side_a, side_b) in enumerate(groups):
+            joints = np.concatenate([side_a, side_b])
+            mirrored = np.concatenate([side_b, side_a])
+            previous = filled[:-1, joints]
+            direct = np.nanmean(np.linalg.norm(filled[1:, joints] - previous, axis=-1), axis=-1)
+            crossed = np.nanmean(np.linalg.norm(filled[1:, mirrored] - previous, axis=-1), axis=-1)
+            # Comparing frame f with frame f - 1: while swapped, the repaired
+            # frame f - 1 is the mirrored one, so the unswapped joints of frame
+            # f fit it with the crossed distance and the mirrored ones with the
+            # direct distance.
+            starts = (crossed < ratio * direct) & (direct > threshold)
+            ends = crossed < direct
+            # Walk the (sparse) candidate frames only. After a swap is cut at
+            # max_run the data is still swapped but left as is, so its end
+            # must not be taken for the start of another swap.
+            run_start, cut = None, False
+            for f in np.flatnonzero(starts | ends) + 1:
+                if run_start is not None and f - run_start > limit:
+                    swapped[run_start:run_start + limit, g] = True
+                    run_start, cut = None, True
+                if cut:
+                    cut = not ends[f - 1]
+                elif run_start is None:
+                    if starts[f - 1]:
+                        run_start = f
+                elif ends[f - 1]:
+                    swapped[run_start:f, g] = True
+                    run_start = None
+            if run_start is not None:
+                swapped[run_start:run_start + limit, g] = True
+    return swapped
+
+
+def fix_swaps(values: np.ndarray, definition: SkeletonDefinition, swapped: np.ndarray) -> np.ndarray:
+    """
+    Swaps the joints of the groups flagged by :func:`detect_swaps` back.
+
+    Args:
+        values: Per-joint values of shape (frames, joints, ...), e.g.
+            keypoints or confidences.
+        swapped: Boolean array of shape (frames, groups).
+    """
+    values = np.array(values)
+    for g, (side_a, side_b) in enumerate(swap_groups(definition)):
+        frames = np.flatnonzero(swapped[:, g])
+        if len(frames):
+            a, b = values[frames[:, None], side_a], values[frames[:, None], side_b]
+            values[frames[:, None], side_a] = b
+            values[frames[:, None], side_b] = a
+    return values
+
+
+def detect_teleports(positions: np.ndarray, definition: SkeletonDefinition, radius: int = 2,
+                     threshold: float = 1.0) -> np.ndarray:
+    """
+    Joints that jump away for up to ``radius`` frames and come back.
+
+    A joint is flagged where it deviates from the median of its positions
+    over the surrounding ``2 * radius + 1`` frames by more than ``threshold``
+    times the body scale.
+
+    Returns:
+        Boolean array of shape (frames, joints).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    padding = np.full((radius,) + positions.shape[1:], np.nan)
+    padded = np.concatenate([padding, positions, padding])
+    windows = sliding_window_view(padded, 2 * radius + 1, axis=0)  # (frames, joints, D, window)
+    with np.errstate(invalid="ignore"), profiling.stage("repair.detect_teleports", frames=len(positions)):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+            median = np.nanmedian(windows, axis=-1)
+        deviation = np.linalg.norm(positions - median, axis=-1)
+        return deviation > threshold * body_scale(positions, definition)
+
+
+def detect_bone_outliers(positions: np.ndarray, definition: SkeletonDefinition,
+                         tolerance: float = 0.5) -> np.ndarray:
+    """
+    Joints whose bones stretch by more than ``tolerance`` times their median
+    length over the clip. Shrinking is not flagged, as bones of 2D keypoints
+    legitimately shorten when they point towards the camera.
+
+    Each bad bone is blamed on the endpoint with more bad bones, i.e. the
+    joint that moved; on a tie, on the endpoint with fewer bones (a leaf
+    such as a wrist) or on both.
+
+    Returns:
+        Boolean array of shape (frames, joints).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    bones = definition.topology.bones
+    num_joints = positions.shape[1]
+    with np.errstate(invalid="ignore"), profiling.stage("repair.detect_bone_outliers", frames=len(positions)):
+        lengths = np.linalg.norm(positions[:, bones[:, 1]] - positions[:, bones[:, 0]], axis=-1)
+        reference = np.nanmedian(np.where(lengths > 0, lengths, np.nan), axis=0)
+        # Short bones (e.g. clavicles) are judged against half a typical bone,
+        # so tracker jitter alone does not flag them.
+        allowed = tolerance * np.maximum(reference, 0.5 * np.nanmedian(reference))
+        bad = lengths - reference > allowed
+
+        degree = np.bincount(bones.ravel(), minlength=num_joints)
+        # Bad bones per joint and frame: count at both endpoints.
+        counts = np.zeros((len(positions), num_joints), dtype=np.intp)
+        np.add.at(counts.T, bones[:, 0], bad.T)
+        np.add.at(counts.T, bones[:, 1], bad.T)
+        parent_key = counts[:, bones[:, 0]] * (num_joints + 1) - degree[bones[:, 0]]
+        child_key = counts[:, bones[:, 1]] * (num_joints + 1) - degree[bones[:, 1]]
+
+        outliers = np.zeros((len(positions), num_joints), dtype=bool)
+        frames, bone = np.nonzero(bad)
+        blame_parent = parent_key[frames, bone] >= child_key[frames, bone]
+        blame_child = child_key[frames, bone] >= parent_key[frames, bone]
+        outliers[frames[blame_parent], bones[bone[blame_parent], 0]] = True
+        outliers[frames[blame_child], bones[bone[blame_child], 1]] = True
+    return outliers
+
+
+def interpolate_gaps(positions: np.ndarray, max_gap: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fills missing (NaN) joints by linear interpolation between the nearest
+    valid frames, for gaps of at most ``max_gap`` frames. Gaps at the start
+    or end of the clip and longer gaps stay missing.
+
+    Args:
+        positions: Keypoints of shape (frames, joints, D).
+
+    Returns:
+        A tuple (filled, mask) with the filled keypoints and a (frames, joints)
+        mask of the joints that were filled.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    num_frames = len(positions)
+    frames = np.arange(num_frames)[:, None]
+    valid = np.all(np.isfinite(positions), axis=-1)
+
+    before = np.where(valid, frames, -1)
+    np.maximum.accumulate(before, axis=0, out=before)
+    after = np.where(valid, frames, num_frames)
+    after = np.minimum.accumulate(after[::-1], axis=0)[::-1]
+
+    fill = ~valid & (before >= 0) & (after < num_frames) & (after - before - 1 <= max_gap)
+    frame, joint = np.nonzero(fill)
+    start, end = before[frame, joint], after[frame, joint]
+    t = ((frame - start) / (end - start))[:, None]
+    filled = positions.copy()
+    filled[frame, joint] = (1 - t) * positions[start, joint] + t * positions[end, joint]
+    return filled, fill
+
+
+@dataclass
+class GlitchReport:
+    """What :func:`repair_glitches` found and changed, per frame."""
+    swapped: np.ndarray          # (frames, groups) limbs swapped back, see swap_groups
+    teleports: np.ndarray        # (frames, joints)
+    bone_outliers: np.ndarray    # (frames, joints)
+    low_confidence: np.ndarray   # (frames, joints)
+    filled: np.ndarray           # (frames, joints) joints replaced by interpolation
+
+    @property
+    def glitched_frames(self) -> np.ndarray:
+        """(frames,) True where anything was detected."""
+        return (self.swapped.any(axis=-1) | self.teleports.any(axis=-1)
+                | self.bone_outliers.any(axis=-1) | self.low_confidence.any(axis=-1))
+
+
+def repair_glitches(positions: np.ndarray, definition: SkeletonDefinition,
+                    confidences: Optional[np.ndarray] = None, min_confidence: float = 0.0,
+                    swap_ratio: float = 0.5, max_swap: Optional[int] = None,
+                    teleport_radius: int = 2, teleport_threshold: float = 1.0,
+                    bone_tolerance: float = 0.5, max_gap: int = 10) -> Tuple[np.ndarray, GlitchReport]:
+    """
+    Detects and repairs swaps, teleports and bone explosions in a keypoint clip.
+
+    Swaps are fixed first, then teleporting joints, joints of exploding
+    bones and joints below ``min_confidence`` are removed and refilled by
+    :func:`interpolate_gaps`.
+
+    Args:
+        positions: Keypoints of shape (frames, joints, D), NaN where missing.
+        definition: The layout of ``positions``.
+        confidences: Optional (frames, joints) scores; swapped together with the joints.
+        min_confidence: Joints scored below this are treated as missing.
+        swap_ratio: See :func:`detect_swaps`.
+        max_swap: Longest swap in frames, ``max_run`` of :func:`detect_swaps`.
+        teleport_radius: See :func:`detect_teleports`.
+        teleport_threshold: See :func:`detect_teleports`.
+        bone_tolerance: See :func:`detect_bone_outliers`.
+        max_gap: See :func:`interpolate_gaps`.
+
+    Returns:
+        A tuple (repaired, report). Removed joints that could not be filled are NaN.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    with profiling.stage("repair_glitches", frames=len(positions), nbytes=positions.nbytes,
+                         skeleton=definition.name):
+        swapped = detect_swaps(positions, definition, swap_ratio, max_run=max_swap)
+        repaired = fix_swaps(positions, definition, swapped)
+        low_confidence = np.zeros(positions.shape[:2], dtype=bool)
+        if confidences is not None:
+            low_confidence = fix_swaps(confidences, definition, swapped) < min_confidence
+
+        teleports = detect_teleports(repaired, definition, teleport_radius, teleport_threshold)
+        bone_outliers = detect_bone_outliers(repaired, definition, bone_tolerance)
+        repaired[teleports | bone_outliers | low_confidence] = np.nan
+        repaired, filled = interpolate_gaps(repaired, max_gap)
+    return repaired, GlitchReport(swapped, teleports, bone_outliers, low_confidence, filled)
@@ -0,0 +1,327 @@
+"""
+Batched conversion between rotation representations.
+
+All functions operate on arrays with arbitrary leading dimensions, typically
+(frames, joints, ...):
+
+    euler        (..., 3) angles in the order the BVH channels list them
+    matrix       (..., 3, 3)
+    quaternion   (..., 4) scalar first (w, x, y, z)
+    axis_angle   (..., 3) rotation vector, the SMPL pose format
+    rot6d        (..., 6) first two matrix columns, concatenated
+
+Euler orders are strings such as "ZXY" and are intrinsic, matching BVH
+semantics: channels "Zrotation Xrotation Yrotation" mean R = Rz @ Rx @ Ry.
+"""
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+
+
+Order = Union[str, Sequence[str]]
+
+_AXES = {"X": 0, "Y": 1, "Z": 2}
+_EPS = 1e-8
+
+
+def _axis_matrices(axis: int, angle: np.ndarray) -> np.ndarray:
+    c, s = np.cos(angle), np.sin(angle)
+    m = np.zeros(angle.shape + (3, 3))
+    i, j = (axis + 1) % 3, (axis + 2) % 3
+    m[..., axis, axis] = 1.0
+    m[..., i, i] = c
+    m[..., j, j] = c
+    m[..., i, j] = -s
+    m[..., j, i] = s
+    return m
+
+
+def _check_order(order: str) -> str:
+    order = order.upper()
+    if sorted(order) != ["X", "Y", "Z"]:
+        raise ValueError(f"Unsupported Euler order '{order}'. Expected a permutation of 'XYZ'.")
+    return order
+
+
+def _per_joint(order: Order, num_joints: int) -> List[str]:
+    if isinstance(order, str):
+        return [order] * num_joints
+    if len(order) != num_joints:
+        raise ValueError(f"Expected {num_joints} Euler orders, got {len(order)}.")
+    return list(order)
+
+
+def _euler_to_matrix_single(angles: np.ndarray, order: str) -> np.ndarray:
+    order = _check_order(order)
+    m = _axis_matrices(_AXES[order[0]], angles[..., 0])
+    m = m @ _axis_matrices(_AXES[order[1]], angles[..., 1])
+    return m @ _axis_matrices(_AXES[order[2]], angles[..., 2])
+
+
+def _matrix_to_euler_single(m: np.ndarray, order: str) -> np.ndarray:
+    order = _check_order(order)
+    i, j, k = (_AXES[a] for a in order)
+    # +1 for cyclic orders (XYZ, YZX, ZXY), -1 otherwise
+    e = 1.0 if (j - i) % 3 == 1 else -1.0
+
+    sin_b = np.clip(e * m[..., i, k], -1.0, 1.0)
+    b = np.arcsin(sin_b)
+    a = np.arctan2(-e * m[..., j, k], m[..., k, k])
+    c = np.arctan2(-e * m[..., i, j], m[..., i, i])
+
+    # Gimbal lock: only a + c (or a - c) is defined, put it all in the first angle.
+    locked = np.abs(sin_b) > 1.0 - 1e-7
+    if np.any(locked):
+        a_locked = np.arctan2(e * m[..., k, j], m[..., j, j])
+        a = np.where(locked, a_locked, a)
+        c = np.where(locked, 0.0, c)
+    return np.stack([a, b, c], axis=-1)
+
+
+def euler_to_matrix(angles: np.ndarray, order: Order, degrees: bool = True) -> np.ndarray:
+    """
+    Converts Euler angles to rotation matrices.
+
+    Args:
+        angles: Array of shape (..., joints, 3), in the listed channel order.
+        order: One order for all joints, or one per joint. Joints with an
+            empty order (e.g. End Sites) get the identity.
+        degrees: Whether the angles are in degrees, as in BVH files.
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    if degrees:
+        angles = np.deg2rad(angles)
+    if isinstance(order, str):
+        return _euler_to_matrix_single(angles, order)
+
+    orders = _per_joint(order, angles.shape[-2])
+    out = np.broadcast_to(np.eye(3), angles.shape[:-1] + (3, 3)).copy()
+    for unique in set(orders):
+        if not unique:
+            continue
+        idx = [i for i, o in enumerate(orders) if o == unique]
+        out[..., idx, :, :] = _euler_to_matrix_single(angles[..., idx, :], unique)
+    return out
+
+
+def matrix_to_euler(matrices: np.ndarray, order: Order, degrees: bool = True) -> np.ndarray:
+    """Inverse of :func:`euler_to_matrix`. Angles of joints with an empty order are zero."""
+    matrices = np.asarray(matrices, dtype=np.float64)
+    if isinstance(order, str):
+        out = _matrix_to_euler_single(matrices, order)
+    else:
+        orders = _per_joint(order, matrices.shape[-3])
+        out = np.zeros(matrices.shape[:-2] + (3,))
+        for unique in set(orders):
+            if not unique:
+                continue
+            idx = [i for i, o in enumerate(orders) if o == unique]
+            out[..., idx, :] = _matrix_to_euler_single(matrices[..., idx, :, :], unique)
+    return np.rad2deg(out) if degrees else out
+
+
+def quaternion_to_matrix(q: np.ndarray) -> np.ndarray:
+    """Converts (w, x, y, z) quaternions to rotation matrices. Input need not be normalized."""
+    q = np.asarray(q, dtype=np.float64)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    return np.stack([
+        1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w),
+        2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w),
+        2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y),
+    ], axis=-1).reshape(q.shape[:-1] + (3, 3))
+
+
+def matrix_to_quaternion(m: np.ndarray) -> np.ndarray:
+    """Converts rotation matrices to (w, x, y, z) quaternions with w >= 0."""
+    m = np.asarray(m, dtype=np.float64)
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+
+    # Four candidate solutions, each well conditioned when its component is largest.
+    candidates = np.stack([
+        np.stack([1 + m00 + m11 + m22, m[..., 2, 1] - m[..., 1, 2],
+                  m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1]], axis=-1),
+        np.stack([m[..., 2, 1] - m[..., 1, 2], 1 + m00 - m11 - m22,
+                  m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0]], axis=-1),
+        np.stack([m[..., 0, 2] - m[..., 2, 0], m[..., 0, 1] + m[..., 1, 0],
+                  1 - m00 + m11 - m22, m[..., 1, 2] + m[..., 2, 1]], axis=-1),
+        np.stack([m[..., 1, 0] - m[..., 0, 1], m[..., 0, 2] + m[..., 2, 0],
+                  m[..., 1, 2] + m[..., 2, 1], 1 - m00 - m11 + m22], axis=-1),
+    ], axis=-2)
+    best = np.argmax(np.stack([m00 + m11 + m22, m00, m11, m22], axis=-1), axis=-1)
+    q = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    return q * np.where(q[..., :1] < 0, -1.0, 1.0)
+
+
+def axis_angle_to_quaternion(v: np.ndarray) -> np.ndarray:
+    """Converts rotation vectors to (w, x, y, z) quaternions."""
+    v = np.asarray(v, dtype=np.float64)
+    angle = np.linalg.norm(v, axis=-1, keepdims=True)
+    half = 0.5 * angle
+    # sin(half) / angle, with its limit 0.5 for small angles
+    scale = np.where(angle > _EPS, np.sin(half) / np.maximum(angle, _EPS), 0.5 - angle ** 2 / 48)
+    return np.concatenate([np.cos(half), v * scale], axis=-1)
+
+
+def quaternion_to_axis_angle(q: np.ndarray) -> np.ndarray:
+    """Converts (w, x, y, z) quaternions to rotation vectors with angle in [0, pi]."""
+    q = np.asarray(q, dtype=np.float64)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    q = q * np.where(q[..., :1] < 0, -1.0, 1.0)
+    sin_half = np.linalg.norm(q[..., 1:], axis=-1, keepdims=True)
+    angle = 2 * np.arctan2(sin_half, q[..., :1])
+    scale = np.where(sin_half > _EPS, angle / np.maximum(sin_half, _EPS), 2.0)
+    return q[..., 1:] * scale
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Hamilton product a * b of (w, x, y, z) quaternions, broadcasting over leading dimensions."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=-1)
+
+
+def quaternion_conjugate(q: np.ndarray) -> np.ndarray:
+    """Conjugate of (w, x, y, z) quaternions; the inverse for unit quaternions."""
+    q = np.asarray(q, dtype=np.float64)
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def quaternion_slerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """
+    Spherical linear interpolation between unit quaternions along the shorter arc.
+
+    Args:
+        a: Start quaternions (..., 4).
+        b: End quaternions (..., 4), broadcasting against ``a``.
+        t: Interpolation weights (...), 0 for ``a`` and 1 for ``b``.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)[..., None]
+    dot = np.sum(a * b, axis=-1, keepdims=True)
+    b = np.where(dot < 0, -b, b)
+    dot = np.minimum(np.abs(dot), 1.0)
+    angle = np.arccos(dot)
+    sin = np.sin(angle)
+    # Nearly identical rotations fall back to normalized linear interpolation.
+    close = sin < 1e-6
+    safe = np.where(close, 1.0, sin)
+    wa = np.where(close, 1.0 - t, np.sin((1.0 - t) * angle) / safe)
+    wb = np.where(close, t, np.sin(t * angle) / safe)
+    q = wa * a + wb * b
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def axis_angle_to_matrix(v: np.ndarray) -> np.ndarray:
+    return quaternion_to_matrix(axis_angle_to_quaternion(v))
+
+
+def matrix_to_axis_angle(m: np.ndarray) -> np.ndarray:
+    return quaternion_to_axis_angle(matrix_to_quaternion(m))
+
+
+def matrix_to_rot6d(m: np.ndarray) -> np.ndarray:
+    """Keeps the first two columns of rotation matrices, shape (..., 6)."""
+    m = np.asarray(m, dtype=np.float64)
+    return np.concatenate([m[..., :, 0], m[..., :, 1]], axis=-1)
+
+
+def rot6d_to_matrix(r: np.ndarray) -> np.ndarray:
+    """Gram-Schmidt orthogonalization of the 6D representation back to matrices."""
+    r = np.asarray(r, dtype=np.float64)
+    a, b = r[..., :3], r[..., 3:]
+    x = a / np.linalg.norm(a, axis=-1, keepdims=True)
+    b = b - np.sum(x * b, axis=-1, keepdims=True) * x
+    y = b / np.linalg.norm(b, axis=-1, keepdims=True)
+    z = np.cross(x, y)
+    return np.stack([x, y, z], axis=-1)
+
+
+_TO_MATRIX = {
+    "matrix": lambda x, order, degrees: np.asarray(x, dtype=np.float64),
+    "euler": lambda x, order, degrees: euler_to_matrix(x, order, degrees),
+    "quaternion": lambda x, order, degrees: quaternion_to_matrix(x),
+    "axis_angle": lambda x, order, degrees: axis_angle_to_matrix(x),
+    "rot6d": lambda x, order, degrees: rot6d_to_matrix(x),
+}
+
+_FROM_MATRIX = {
+    "matrix": lambda m, order, degrees: m,
+    "euler": lambda m, order, degrees: matrix_to_euler(m, order, degrees),
+    "quaternion": lambda m, order, degrees: matrix_to_quaternion(m),
+    "axis_angle": lambda m, order, degrees: matrix_to_axis_angle(m),
+    "rot6d": lambda m, order, degrees: matrix_to_rot6d(m),
+}
+
+REPRESENTATIONS = tuple(_TO_MATRIX)
+
+
+def euler_orders(definition: SkeletonDefinition, order: Optional[Order] = None) -> List[str]:
+    """
+    Per-joint Euler orders for a skeleton.
+
+    Args:
+        definition: The skeleton; its ``rotation_orders`` are used if set.
+        order: Explicit order(s), overriding the definition.
+    """
+    num_joints = len(definition.original_names)
+    if order is not None:
+        return _per_joint(order, num_joints)
+    if definition.rotation_orders is None:
+        raise ValueError(f"'{definition.name}' has no rotation orders; pass `order` explicitly.")
+    return _per_joint(definition.rotation_orders, num_joints)
+
+
+def convert_rotations(rotations: np.ndarray, source: str, target: str,
+                      definition: Optional[SkeletonDefinition] = None,
+                      order: Optional[Order] = None, degrees: bool = True) -> np.ndarray:
+    """
+    Converts a (frames, joints, ...) rotation array between representations.
+
+    Args:
+        rotations: Input rotations in the ``source`` representation.
+        source: One of REPRESENTATIONS.
+        target: One of REPRESENTATIONS.
+        definition: Skeleton providing the per-joint Euler orders.
+        order: Explicit Euler order(s), overriding the definition.
+        degrees: Whether Euler angles are in degrees.
+
+    Example:
+        Convert BVH Euler channels to SMPL axis-angle::
+
+            pose = convert_rotations(euler, "euler", "axis_angle", definition)
+    """
+    for name in (source, target):
+        if name not in _TO_MATRIX:
+            raise ValueError(f"Unknown rotation representation '{name}'. Available: {list(REPRESENTATIONS)}")
+
+    if "euler" in (source, target):
+        if definition is not None:
+            order = euler_orders(definition, order)
+        elif order is None:
+            raise ValueError("Euler conversion needs a definition or an explicit order.")
+
+    rotations = np.asarray(rotations)
+    with profiling.stage(f"convert_rotations.{source}_to_{target}",
+                         frames=rotations.shape[0] if rotations.ndim > 2 else 1, nbytes=rotations.nbytes):
+        if source == target:
+            return np.asarray(rotations, dtype=np.float64)
+        if (source, target) == ("quaternion", "axis_angle"):
+            return quaternion_to_axis_angle(rotations)
+        if (source, target) == ("axis_angle", "quaternion"):
+            return axis_angle_to_quaternion(rotations)
+
+        matrices = _TO_MATRIX[source](rotations, order, degrees)
+        return _FROM_MATRIX[target](matrices, order, degrees)
@@ -0,0 +1,373 @@
+"""
+Shared-memory ring buffer carrying pose frames from one producer process to
+any number of consumer processes without pickling.
+
+The buffer starts with a header holding the registry name of the skeleton,
+the frame shape and dtype and the number of frames written, followed by
+fixed-stride slots. Each slot holds a sequence word, the frame index, a
+timestamp and one (joints, channels) frame. Each slot is guarded by a
+seqlock: the producer marks the slot odd while writing and even when done.
+Consumers copy the frame and check that the word did not change. The
+producer never waits for consumers. A consumer that falls more than
+``capacity`` frames behind skips ahead and counts the frames it lost.
+
+Example:
+    # capture process
+    with RingBufferWriter(get_skeleton_def("stereolabs_body34"), capacity=512) as ring:
+        print(ring.name)                      # pass to the consumers
+        for index, keypoints in enumerate(camera):
+            ring.write(keypoints, frame_index=index)
+
+    # analysis process
+    with RingBufferReader(name) as ring:
+        definition = ring.definition          # resolved once from the header
+        for frame in ring:
+            process(frame.data)
+"""
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .definition import SkeletonDefinition
+
+
+MAGIC = b"PSKR"
+VERSION = 1
+_HEADER = struct.Struct("<4sHH64sIII8sQ")  # magic, version, header size, skeleton, joints, channels, capacity, dtype, stride
+_COUNT_OFFSET = 104   # u64 number of frames written
+_FLAGS_OFFSET = 112   # u64 bit 0: the producer closed the stream
+_HEADER_SIZE = 128
+_SLOT_HEADER = 24     # u64 sequence, i64 frame index, f64 timestamp
+_ALIGNMENT = 64
+_CLOSED = 1
+
+
+def _registry_name(definition: SkeletonDefinition) -> str:
+    from . import SKELETON_REGISTRY
+    for name, registered in SKELETON_REGISTRY.items():
+        if registered == definition:
+            return name
+    raise ValueError(f"'{definition.name}' is not registered; consumers resolve the skeleton by its "
+                     f"registry name, so register it with register_skeleton in every process.")
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    Attaches to an existing block without registering it with the resource
+    tracker, which before Python 3.13 would unlink it when a reader exits.
+    """
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+@dataclass
+class RingFrame:
+    """One frame read from a ring buffer."""
+    sequence: int       # position in the stream, counting from 0
+    frame_index: int
+    timestamp: float
+    data: np.ndarray    # (joints, channels), a copy owned by the reader
+
+
+@dataclass
+class RingBatch:
+    """Consecutive frames read at once; frames lost to overruns are left out."""
+    sequences: np.ndarray     # (frames,)
+    frame_indices: np.ndarray
+    timestamps: np.ndarray
+    data: np.ndarray          # (frames, joints, channels)
+
+    def __len__(self) -> int:
+        return len(self.sequences)
+
+
+class _Ring:
+    """Numpy views of the header and slots of a ring buffer."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, joints: int, channels: int, capacity: int,
+                 dtype: np.dtype, stride: int):
+        self.shm = shm
+        self.capacity = capacity
+        self.dtype = dtype
+        buffer = shm.buf
+        self.count = np.ndarray((1,), np.uint64, buffer, _COUNT_OFFSET)
+        self.flags = np.ndarray((1,), np.uint64, buffer, _FLAGS_OFFSET)
+        self.sequences = np.ndarray((capacity,), np.uint64, buffer, _HEADER_SIZE, (stride,))
+        self.frame_indices = np.ndarray((capacity,), np.int64, buffer, _HEADER_SIZE + 8, (stride,))
+        self.timestamps = np.ndarray((capacity,), np.float64, buffer, _HEADER_SIZE + 16, (stride,))
+        self.data = np.ndarray((capacity, joints, channels), dtype, buffer, _HEADER_SIZE + _SLOT_HEADER,
+                               (stride, channels * dtype.itemsize, dtype.itemsize))
+
+    def release(self):
+        # Views must be gone before the shared memory can be closed.
+        del self.count, self.flags, self.sequences, self.frame_indices, self.timestamps, self.data
+
+
+class RingBufferWriter:
+    """
+    Producer side of a shared-memory ring buffer of frames of one skeleton.
+    There must be only one writer per buffer.
+    """
+
+    def __init__(self, definition: SkeletonDefinition, channels: int = 3, capacity: int = 256,
+                 dtype: str = "float32", name: Optional[str] = None):
+        """
+        Args:
+            definition: A registered skeleton; its registry name is stored in the header.
+            channels: Values per joint, e.g. 3 for positions, 4 for 2D keypoints
+                with confidence and visibility.
+            capacity: Number of frames kept, i.e. how far consumers may fall behind.
+            dtype: Value type of the frames.
+            name: Name of the shared memory block. Defaults to a generated one.
+        """
+        skeleton = _registry_name(definition).encode("utf-8")
+        if len(skeleton) > 64:
+            raise ValueError(f"Skeleton name '{skeleton.decode()}' is longer than 64 bytes.")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1.")
+        dtype = np.dtype(dtype).newbyteorder("<")
+        joints = len(definition.original_names)
+        stride = -(-(_SLOT_HEADER + joints * channels * dtype.itemsize) // _ALIGNMENT) * _ALIGNMENT
+
+        self.definition = definition
+        self.channels = channels
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_SIZE + capacity * stride)
+        self._shm.buf[:_HEADER.size] = _HEADER.pack(MAGIC, VERSION, _HEADER_SIZE, skeleton, joints, channels,
+                                                    capacity, dtype.str.encode("ascii"), stride)
+        self._ring = _Ring(self._shm, joints, channels, capacity, dtype, stride)
+        self._ring.count[0] = 0
+        self._ring.flags[0] = 0
+        self._ring.sequences[:] = 0
+        self._written = 0
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block, for RingBufferReader."""
+        return self._shm.name
+
+    @property
+    def frames_written(self) -> int:
+        return self._written
+
+    def write(self, frame: np.ndarray, frame_index: Optional[int] = None,
+              timestamp: Optional[float] = None) -> int:
+        """
+        Publishes one frame of shape (joints, channels).
+
+        Args:
+            frame: The frame; cast to the buffer's dtype.
+            frame_index: Capture frame number. Defaults to the stream position.
+            timestamp: Capture time in seconds. Defaults to time.time().
+
+        Returns:
+            The frame's position in the stream.
+        """
+        ring = self._ring
+        sequence = self._written
+        slot = sequence % ring.capacity
+        ring.sequences[slot] = 2 * sequence + 1  # odd: being written
+        ring.data[slot] = frame
+        ring.frame_indices[slot] = sequence if frame_index is None else frame_index
+        ring.timestamps[slot] = time.time() if timestamp is None else timestamp
+        ring.sequences[slot] = 2 * sequence + 2  # even: complete
+        self._written = sequence + 1
+        ring.count[0] = self._written
+        return sequence
+
+    def write_many(self, frames: np.ndarray, frame_indices: Optional[np.ndarray] = None,
+                   timestamps: Optional[np.ndarray] = None):
+        """Publishes frames of shape (frames, joints, channels) in order."""
+        now = time.time()
+        for i, frame in enumerate(frames):
+            self.write(frame, None if frame_indices is None else int(frame_indices[i]),
+                       now if timestamps is None else float(timestamps[i]))
+
+    def close(self, unlink: bool = True):
+        """
+        Marks the stream as finished, so readers stop once they have caught up,
+        and releases the shared memory.
+        """
+        if self._ring is None:
+            return
+        self._ring.flags[0] = _CLOSED
+        self._ring.release()
+        self._ring = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+    def __enter__(self) -> "RingBufferWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RingBufferReader:
+    """
+    Consumer side of a shared-memory ring buffer. Each reader has its own
+    position in the stream; any number of readers can attach.
+    """
+
+    def __init__(self, name: str, start: str = "latest", poll_interval: float = 1e-4):
+        """
+        Args:
+            name: Name of the shared memory block, see RingBufferWriter.name.
+            start: "latest" to start with the next frame written, "oldest" to
+                start with the oldest frame still in the buffer.
+            poll_interval: Sleep between polls while waiting for frames, in seconds.
+        """
+        if start not in ("latest", "oldest"):
+            raise ValueError(f"Unknown start '{start}'. Use 'latest' or 'oldest'.")
+        if sys.version_info >= (3, 13):
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self._shm = _attach_untracked(name)
+
+        magic, version, _, skeleton, joints, channels, capacity, dtype, stride = \
+            _HEADER.unpack(bytes(self._shm.buf[:_HEADER.size]))
+        if magic != MAGIC or version != VERSION:
+            self._shm.close()
+            raise ValueError(f"'{name}' is not a pose ring buffer of version {VERSION}.")
+
+        from . import get_skeleton_def
+        self.skeleton_name = skeleton.rstrip(b"\0").decode("utf-8")
+        self.definition = get_skeleton_def(self.skeleton_name)
+        self.channels = channels
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self._ring = _Ring(self._shm, joints, channels, capacity,
+                           np.dtype(dtype.rstrip(b"\0").decode("ascii")), stride)
+        written = int(self._ring.count[0])
+        self.position = written if start == "latest" else max(0, written - capacity)
+        self.dropped = 0  # frames overwritten before this reader got to them
+
+    @property
+    def closed(self) -> bool:
+        """Whether the producer has finished the stream."""
+        return bool(self._ring.flags[0] & _CLOSED)
+
+    def available(self) -> int:
+        """Frames written but not yet read."""
+        return int(self._ring.count[0]) - self.position
+
+    def read_batch(self, max_frames: Optional[int] = None, timeout: Optional[float] = 0.0) -> RingBatch:
+        """
+        Reads all pending frames, up to ``max_frames``, in one vectorized copy.
+
+        Args:
+            max_frames: Largest number of frames returned. Defaults to the capacity.
+            timeout: Seconds to wait for at least one frame; None waits until
+                a frame arrives or the stream is closed.
+
+        Returns:
+            A RingBatch, empty if nothing arrived in time.
+        """
+        ring = self._ring
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            written = int(ring.count[0])
+            if written > self.position or self.closed:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        if written - self.position > ring.capacity:
+            # Overrun: skip to the oldest frame that can still be intact.
+            skipped = written - ring.capacity - self.position
+            self.dropped += skipped
+            self.position += skipped
+        count = min(written - self.position, ring.capacity if max_frames is None else max_frames)
+        sequences = np.arange(self.position, self.position + max(count, 0), dtype=np.uint64)
+        slots = (sequences % np.uint64(ring.capacity)).astype(np.intp)
+
+        expected = 2 * sequences + 2
+        before = ring.sequences[slots]
+        data = ring.data[slots]
+        frame_indices = ring.frame_indices[slots]
+        timestamps = ring.timestamps[slots]
+        # Frames the producer overwrote while they were copied are discarded.
+        intact = (before == expected) & (ring.sequences[slots] == expected)
+        if not intact.all():
+            self.dropped += int(np.count_nonzero(~intact))
+        self.position += len(sequences)
+        return RingBatch(sequences[intact].astype(np.int64), frame_indices[intact],
+                         timestamps[intact], data[intact])
+
+    def read(self, timeout: Optional[float] = None) -> Optional[RingFrame]:
+        """
+        Reads the next frame.
+
+        Args:
+            timeout: Seconds to wait; None waits until a frame arrives or the stream is closed.
+
+        Returns:
+            The frame, or None on timeout or at the end of a closed stream.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            batch = self.read_batch(1, remaining)
+            if len(batch):
+                return RingFrame(int(batch.sequences[0]), int(batch.frame_indices[0]),
+                                 float(batch.timestamps[0]), batch.data[0])
+            # An empty batch after an overrun is retried; otherwise nothing arrived.
+            if self.available() <= 0 and (self.closed or remaining == 0.0):
+                return None
+
+    def latest(self) -> Optional[RingFrame]:
+        """
+        The most recent complete frame, also if this reader has read it
+        before. Unread frames before it are skipped without counting them as
+        dropped.
+
+        Returns:
+            The frame, or None if nothing has been written yet.
+        """
+        ring = self._ring
+        while True:
+            written = int(ring.count[0])
+            if written == 0:
+                return None
+            sequence = written - 1
+            slot = sequence % ring.capacity
+            expected = 2 * sequence + 2
+            before = ring.sequences[slot]
+            data = ring.data[slot].copy()
+            frame_index, timestamp = int(ring.frame_indices[slot]), float(ring.timestamps[slot])
+            if before == expected and ring.sequences[slot] == expected:
+                self.position = max(self.position, written)
+                return RingFrame(sequence, frame_index, timestamp, data)
+            # The producer lapped the buffer while the frame was copied; take the new latest.
+
+    def __iter__(self) -> Iterator[RingFrame]:
+        """Frames until the producer closes the stream."""
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def close(self):
+        if self._ring is None:
+            return
+        self._ring.release()
+        self._ring = None
+        self._shm.close()
+
+    def __enter__(self) -> "RingBufferReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
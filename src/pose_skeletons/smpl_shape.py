@@ -0,0 +1,235 @@
+"""
+Rest-pose joints and skeleton offsets of SMPL-family bodies from shape
+parameters, without evaluating the mesh.
+
+The joints of an SMPL model in its rest pose are a linear function of the
+shape coefficients: ``J(betas) = R @ (v_template + shapedirs @ betas)`` with
+R the joint regressor. Folding R into the template and shape basis once
+leaves a (joints, 3, betas) basis, so any number of bodies is solved with a
+single small matrix product.
+
+The model files themselves are not distributed with this package; point
+SmplShapeModel.load at a local SMPL, SMPL+H or SMPL-X ``.npz`` or ``.pkl``.
+The folded basis is cached next to the compiled topologies, so repeated loads
+skip reading the full mesh model.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+from .loader import atomic_file, default_cache_dir
+
+
+_CACHE_FORMAT = 2
+
+
+def _read_model(path: str) -> dict:
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=True) as data:
+            return {key: data[key] for key in data.files}
+    with open(path, "rb") as f:
+        try:
+            return pickle.load(f, encoding="latin1")
+        except ModuleNotFoundError as e:
+            raise ImportError(f"Loading '{path}' requires '{e.name}' (original SMPL pickles reference "
+                              f"chumpy). Install it or convert the model to .npz.") from e
+
+
+def _dense(array) -> np.ndarray:
+    # J_regressor is a scipy sparse matrix in the original pickles.
+    return np.asarray(array.toarray() if hasattr(array, "toarray") else array, dtype=np.float64)
+
+
+def fold_regressor(model: dict, num_betas: Optional[int] = None):
+    """
+    Folds a model's joint regressor into its template and shape basis.
+
+    Args:
+        model: Model arrays with ``v_template``, ``shapedirs`` and ``J_regressor``.
+        num_betas: Shape coefficients to keep. Defaults to all in the model.
+
+    Returns:
+        A tuple (template, basis, parents) of shapes (joints, 3),
+        (joints, 3, betas) and (joints,), parents from ``kintree_table`` or None.
+    """
+    regressor = _dense(model["J_regressor"])
+    template = regressor @ _dense(model["v_template"])
+    shapedirs = _dense(model["shapedirs"])
+    if num_betas is not None:
+        if num_betas > shapedirs.shape[-1]:
+            raise ValueError(f"The model has {shapedirs.shape[-1]} shape coefficients, {num_betas} requested.")
+        shapedirs = shapedirs[..., :num_betas]
+    basis = np.einsum("jv,vcb->jcb", regressor, shapedirs)
+
+    parents = None
+    if "kintree_table" in model:
+        parents = np.asarray(model["kintree_table"], dtype=np.int64)[0].copy()
+        parents[0] = -1  # stored as the largest unsigned value
+    return template, basis, parents
+
+
+def _check_parents(parents: Optional[np.ndarray], definition: SkeletonDefinition, path: str):
+    if parents is not None and tuple(parents) != tuple(definition.parents[:len(parents)]):
+        raise ValueError(f"The kinematic tree of '{path}' does not match '{definition.name}'.")
+
+
+class SmplShapeModel:
+    """
+    Subject-specific rest-pose joints for Smpl, Smplh and Smplx.
+
+    Results are cached per betas vector in an LRU cache, so looking up the
+    same bodies repeatedly (e.g. once per clip) costs a dictionary access.
+
+    Example:
+        model = SmplShapeModel.load("SMPLX_NEUTRAL.npz", get_skeleton_def("smplx"))
+        offsets = model.offsets(betas)      # (subjects, 55, 3)
+    """
+
+    def __init__(self, definition: SkeletonDefinition, template: np.ndarray, basis: np.ndarray,
+                 cache_size: int = 4096):
+        """
+        Args:
+            definition: The Smpl, Smplh or Smplx definition. Its first
+                ``len(template)`` joints are the model's kinematic joints.
+            template: Rest joints of the template body, shape (joints, 3).
+            basis: Joint shape basis, shape (joints, 3, betas).
+            cache_size: Number of betas vectors kept in the LRU cache.
+        """
+        num_joints = len(template)
+        if num_joints > len(definition.original_names) or max(definition.parents[:num_joints]) >= num_joints:
+            raise ValueError(f"'{definition.name}' does not start with the model's {num_joints} kinematic joints.")
+        self.definition = definition
+        self.template = np.asarray(template, dtype=np.float64)
+        self.basis = np.asarray(basis, dtype=np.float64)
+        self.parents = np.asarray(definition.parents[:num_joints], dtype=np.intp)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def num_joints(self) -> int:
+        return len(self.template)
+
+    @property
+    def num_betas(self) -> int:
+        return self.basis.shape[-1]
+
+    @classmethod
+    def load(cls, path: str, definition: SkeletonDefinition, num_betas: Optional[int] = None,
+             cache_dir: Optional[str] = None, use_cache: bool = True, cache_size: int = 4096) -> "SmplShapeModel":
+        """
+        Loads a model file and folds its joint regressor.
+
+        Args:
+            path: SMPL-family model file, ``.npz`` or ``.pkl``.
+            definition: The matching Smpl, Smplh or Smplx definition.
+            num_betas: Shape coefficients to use. Defaults to all in the model.
+            cache_dir: Directory for the folded basis. Defaults to default_cache_dir().
+            use_cache: Whether to read and write the folded basis cache.
+            cache_size: Size of the in-memory LRU cache of betas.
+        """
+        stat = os.stat(path)
+        # Entries of format 1 lacked the kinematic tree, so a new format changes the key.
+        key = hashlib.sha256(repr((_CACHE_FORMAT, os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                                   num_betas)).encode("utf-8")).hexdigest()
+        cache_path = os.path.join(cache_dir or default_cache_dir(), f"smpl_{key}.npz")
+
+        if use_cache:
+            try:
+                with np.load(cache_path) as arrays:
+                    template, basis = arrays["template"], arrays["basis"]
+                    parents = arrays["parents"] if "parents" in arrays.files else None
+            except (OSError, KeyError, ValueError):
+                template = None  # missing or unreadable entry, fold below
+            if template is not None:
+                _check_parents(parents, definition, path)
+                return cls(definition, template, basis, cache_size)
+
+        with profiling.stage("smpl_shape.fold_regressor", path=path):
+            template, basis, parents = fold_regressor(_read_model(path), num_betas)
+        _check_parents(parents, definition, path)
+        model = cls(definition, template, basis, cache_size)
+
+        if use_cache:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            arrays = {"template": template, "basis": basis}
+            if parents is not None:
+                arrays["parents"] = np.asarray(parents)
+            with atomic_file(cache_path) as f:
+                np.savez(f, **arrays)
+        return model
+
+    def _betas(self, betas: np.ndarray) -> np.ndarray:
+        betas = np.asarray(betas, dtype=np.float64)
+        if betas.shape[-1] > self.num_betas:
+            raise ValueError(f"Got {betas.shape[-1]} shape coefficients, the model has {self.num_betas}.")
+        return betas
+
+    def joints(self, betas: np.ndarray) -> np.ndarray:
+        """
+        Rest-pose joint positions.
+
+        Args:
+            betas: Shape coefficients of shape (..., betas).
+
+        Returns:
+            Array of shape (..., joints, 3).
+        """
+        betas = self._betas(betas)
+        # Missing trailing coefficients are zero, as in the mesh model, so only
+        # the leading part of the basis is needed.
+        num_betas = betas.shape[-1]
+        flat = betas.reshape(-1, num_betas)
+        out = np.empty((len(flat), self.num_joints, 3))
+
+        keys = [row.tobytes() for row in flat]
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    out[i] = cached
+
+        if missing:
+            with profiling.stage("smpl_shape.joints", frames=len(missing)):
+                solved = self.template + np.einsum("jcb,nb->njc", self.basis[..., :num_betas], flat[missing])
+            out[missing] = solved
+            with self._lock:
+                for i, joints in zip(missing, solved):
+                    self._cache[keys[i]] = joints
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out.reshape(betas.shape[:-1] + (self.num_joints, 3))
+
+    def offsets(self, betas: np.ndarray) -> np.ndarray:
+        """
+        Joint offsets from the parent joint, as in a BVH hierarchy. The root
+        offset is the root joint position.
+
+        Returns:
+            Array of shape (..., joints, 3).
+        """
+        joints = self.joints(betas)
+        parents = np.where(self.parents < 0, 0, self.parents)
+        offsets = joints - joints[..., parents, :]
+        offsets[..., self.parents < 0, :] = joints[..., self.parents < 0, :]
+        return offsets
+
+    def bone_lengths(self, betas: np.ndarray) -> np.ndarray:
+        """Length of every non-root joint's offset, shape (..., joints - 1)."""
+        return np.linalg.norm(self.offsets(betas)[..., self.parents >= 0, :], axis=-1)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
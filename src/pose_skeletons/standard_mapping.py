@@ -0,0 +1,176 @@
+"""
+Heuristic mapping of arbitrary joint names onto the standard joint slots.
+
+Joint names are matched against common vendor vocabularies (Optitrack, Xsens,
+Mixamo, SMPL, ...) and the parent topology is used to resolve the remaining
+ambiguity, e.g. Optitrack's "LeftShoulder" is a clavicle because it sits
+above the upper arm in the arm chain.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .definition import STANDARD_JOINTS
+
+
+_LEFT = {"left", "l", "lt", "lft"}
+_RIGHT = {"right", "r", "rt", "rgt"}
+
+_HIPS = ("hips", "pelvis", "hip", "root")
+_WRIST = ("wrist", "hand")
+_LEG_TOP = ("upleg", "thigh", "upperleg", "hip")
+_KNEE = ("knee", "leg", "lowerleg", "shin", "calf")
+_FOOT = ("toebase", "toe", "footindex", "ball", "foot")
+_NECK = ("neck",)
+_HEAD = ("head", "nose")  # keypoint layouts use the nose as head
+_TWIST = ("twist", "roll")
+
+
+def _split(name: str) -> List[str]:
+    """Splits a joint name into lowercase tokens on separators and camel case."""
+    name = name.split(":")[-1]  # namespaces such as "mixamorig:LeftArm"
+    parts = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", name)
+    return [p.lower() for p in parts]
+
+
+def split_side(name: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Splits a joint name into its body side and the remaining tokens.
+
+    Returns:
+        (side, tokens) where side is 'l', 'r' or None and tokens are the
+        lowercase name tokens without the side, e.g. ('l', ['up', 'leg'])
+        for "LeftUpLeg".
+    """
+    tokens = _split(name)
+    side = None
+    if any(t in _LEFT for t in tokens):
+        side = "l"
+    elif any(t in _RIGHT for t in tokens):
+        side = "r"
+    return side, [t for t in tokens if t not in _LEFT and t not in _RIGHT]
+
+
+def _describe(name: str):
+    """Returns (side, core) where side is 'l', 'r' or None and core the name without side or digit tokens."""
+    side, tokens = split_side(name)
+    return side, "".join(t for t in tokens if not t.isdigit())
+
+
+def _match(candidates: Sequence[int], cores: List[str], keywords: Sequence[str]) -> Optional[int]:
+    """First candidate whose core equals a keyword, trying keywords in priority order."""
+    for keyword in keywords:
+        for idx in candidates:
+            if cores[idx] == keyword:
+                return idx
+    return None
+
+
+def _ancestors(idx: int, parents: Sequence[int]) -> List[int]:
+    """Chain from the root down to ``idx`` (inclusive)."""
+    chain = []
+    while idx != -1:
+        chain.append(idx)
+        idx = parents[idx]
+    return chain[::-1]
+
+
+def guess_standard_mapping(names: Sequence[str], parents: Sequence[int]) -> Dict[str, Optional[int]]:
+    """
+    Guesses the standard joint mapping of a skeleton from its names and topology.
+
+    Args:
+        names: Joint names.
+        parents: Parent index for each joint, -1 for root.
+
+    Returns:
+        A dict with an entry for every name in STANDARD_JOINTS, mapping to the
+        matched joint index or None if no confident match was found.
+    """
+    mapping: Dict[str, Optional[int]] = {slot: None for slot in STANDARD_JOINTS}
+    described = [_describe(n) for n in names]
+    sides = [d[0] for d in described]
+    cores = [d[1] for d in described]
+    is_end = [n.endswith("_End") or "end" in _split(n) for n in names]
+    joints = [i for i in range(len(names)) if not is_end[i]]
+
+    children: List[List[int]] = [[] for _ in names]
+    for i, p in enumerate(parents):
+        if p != -1 and not is_end[i]:
+            children[p].append(i)
+
+    def height(idx: int) -> int:
+        return 1 + max((height(c) for c in children[idx]), default=0)
+
+    # --- Legs: find the top of each leg, then follow the longest chain down ---
+    for s in ("l", "r"):
+        side_joints = [i for i in joints if sides[i] == s]
+        top = _match(side_joints, cores, _LEG_TOP)
+        if top is None:
+            continue
+        chain = [top]
+        while children[chain[-1]]:
+            chain.append(max(children[chain[-1]], key=height))
+
+        mapping[f"{s}_hip"] = top
+        if len(chain) > 1:
+            knee = _match(chain[1:], cores, _KNEE)
+            mapping[f"{s}_knee"] = chain[1] if knee is None else knee
+        below_knee = chain[chain.index(mapping[f"{s}_knee"]) + 1:] if len(chain) > 1 else []
+        ankle = _match(below_knee, cores, ("ankle",))
+        if ankle is None and below_knee:
+            ankle = below_knee[0]
+        if ankle is not None:
+            mapping[f"{s}_ankle"] = ankle
+            below_ankle = chain[chain.index(ankle) + 1:]
+            foot = _match(below_ankle, cores, _FOOT)
+            mapping[f"{s}_foot"] = foot if foot is not None else (below_ankle[-1] if below_ankle else None)
+
+    # --- Hips: a named pelvis, or the common parent of both legs ---
+    hips = _match([i for i in joints if sides[i] is None], cores, _HIPS)
+    if hips is None and mapping["l_hip"] is not None and mapping["r_hip"] is not None:
+        if parents[mapping["l_hip"]] == parents[mapping["r_hip"]] != -1:
+            hips = parents[mapping["l_hip"]]
+    mapping["hips"] = hips
+
+    # --- Arms: walk up from the wrist to where both arms meet ---
+    wrists = {s: _match([i for i in joints if sides[i] == s], cores, _WRIST) for s in ("l", "r")}
+    branch = None
+    if wrists["l"] is not None and wrists["r"] is not None:
+        left_chain = _ancestors(wrists["l"], parents)
+        right_chain = set(_ancestors(wrists["r"], parents))
+        common = [i for i in left_chain if i in right_chain]
+        branch = common[-1] if common else None
+
+    for s, wrist in wrists.items():
+        if wrist is None:
+            continue
+        chain = _ancestors(wrist, parents)
+        if branch is not None and branch in chain:
+            chain = chain[chain.index(branch) + 1:]
+        chain = [i for i in chain if not any(t in cores[i] for t in _TWIST)]
+        mapping[f"{s}_wrist"] = wrist
+        for offset, slot in ((2, "elbow"), (3, "shoulder"), (4, "clavicle")):
+            if len(chain) >= offset:
+                mapping[f"{s}_{slot}"] = chain[-offset]
+
+    # --- Spine, neck and head: the path from the hips to the arm branch ---
+    head = _match([i for i in joints if sides[i] is None], cores, _HEAD)
+    neck = _match([i for i in joints if sides[i] is None], cores, _NECK)
+    mapping["head"] = head
+    mapping["neck"] = neck
+
+    if hips is not None and branch is not None:
+        path = _ancestors(branch, parents)
+        spine = path[path.index(hips) + 1:] if hips in path else []
+        spine = [i for i in spine if i != neck]
+        if len(spine) >= 3:
+            mapping["spine_low"] = spine[0]
+            mapping["spine_mid"] = spine[len(spine) // 2]
+            mapping["spine_high"] = spine[-1]
+        elif len(spine) == 2:
+            mapping["spine_low"], mapping["spine_mid"] = spine
+            mapping["spine_high"] = neck
+        elif len(spine) == 1:
+            mapping["spine_mid"] = spine[0]
+
+    return mapping
@@ -0,0 +1,124 @@
+"""
+Compiled, array-based form of a skeleton's parent hierarchy.
+
+Batch operations index with these arrays instead of walking the ``parents``
+list, so a topology is compiled once per definition and reused.
+"""
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class CompiledTopology:
+    parents: np.ndarray      # (joints,) parent index, -1 for root
+    order: np.ndarray        # (joints,) joints in depth-first pre-order, parents before children
+    position: np.ndarray     # (joints,) position of each joint in ``order``
+    subtree_end: np.ndarray  # (joints,) one past the last position of the joint's subtree in ``order``
+    depth: np.ndarray        # (joints,) number of ancestors
+    bones: np.ndarray        # (bones, 2) (parent, child) pairs sorted by child
+
+    def __post_init__(self):
+        # Topologies are shared by every user of a definition, so the arrays
+        # are read-only views; callers that need to modify them must copy.
+        for name in self.__dataclass_fields__:
+            array = np.asarray(getattr(self, name)).view()
+            array.flags.writeable = False
+            object.__setattr__(self, name, array)
+
+    @property
+    def num_joints(self) -> int:
+        return len(self.parents)
+
+    def subtree(self, joint: int) -> np.ndarray:
+        """Indices of ``joint`` and all its descendants, in pre-order."""
+        return self.order[self.position[joint]:self.subtree_end[joint]]
+
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "CompiledTopology":
+        return cls(**{name: np.asarray(arrays[name]) for name in cls.__dataclass_fields__})
+
+
+def validate_parents(parents: Sequence[int]):
+    """
+    Checks that a parent list describes a single tree.
+
+    Raises:
+        ValueError: If an index is out of range, there is not exactly one
+            root, or the hierarchy contains a cycle.
+    """
+    num_joints = len(parents)
+    roots = [i for i, p in enumerate(parents) if p == -1]
+    if len(roots) != 1:
+        raise ValueError(f"Expected exactly one root joint, found {len(roots)}: {roots}")
+
+    out_of_range = [i for i, p in enumerate(parents) if not -1 <= p < num_joints or p == i]
+    if out_of_range:
+        raise ValueError(f"Invalid parent index for joints {out_of_range}.")
+
+    # Every joint must reach the root without revisiting a joint.
+    state = [0] * num_joints  # 0 unvisited, 1 on current path, 2 reaches root
+    state[roots[0]] = 2
+    for start in range(num_joints):
+        path = []
+        joint = start
+        while state[joint] == 0:
+            state[joint] = 1
+            path.append(joint)
+            joint = parents[joint]
+        if state[joint] == 1:
+            raise ValueError(f"Cycle in parent hierarchy involving joint {joint}.")
+        for j in path:
+            state[j] = 2
+
+
+def compile_topology(parents: Sequence[int]) -> CompiledTopology:
+    """
+    Compiles a parent list into index arrays. The list is validated first.
+
+    Args:
+        parents: Parent index for each joint, -1 for root.
+
+    Returns:
+        The CompiledTopology.
+    """
+    validate_parents(parents)
+    num_joints = len(parents)
+
+    children: List[List[int]] = [[] for _ in range(num_joints)]
+    for child, parent in enumerate(parents):
+        if parent != -1:
+            children[parent].append(child)
+
+    order = []
+    depth = np.zeros(num_joints, dtype=np.int32)
+    stack = [next(i for i, p in enumerate(parents) if p == -1)]
+    while stack:
+        joint = stack.pop()
+        order.append(joint)
+        for child in reversed(children[joint]):
+            depth[child] = depth[joint] + 1
+            stack.append(child)
+
+    order = np.asarray(order, dtype=np.int32)
+    position = np.empty(num_joints, dtype=np.int32)
+    position[order] = np.arange(num_joints, dtype=np.int32)
+
+    # In pre-order a subtree ends where the next joint of the same or lower depth starts.
+    subtree_end = np.empty(num_joints, dtype=np.int32)
+    pending: List[int] = []
+    for pos, joint in enumerate(order):
+        while pending and depth[pending[-1]] >= depth[joint]:
+            subtree_end[pending.pop()] = pos
+        pending.append(joint)
+    subtree_end[pending] = num_joints
+
+    parents_array = np.asarray(parents, dtype=np.int32)
+    child_idx = np.flatnonzero(parents_array != -1).astype(np.int32)
+    bones = np.stack([parents_array[child_idx], child_idx], axis=1)
+
+    return CompiledTopology(parents_array, order, position, subtree_end, depth, bones)
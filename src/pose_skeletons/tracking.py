@@ -0,0 +1,242 @@
+"""
+Multi-person tracking: associating per-frame pose detections into
+persistent tracks.
+
+Tracks are kept in the standard joint space (STANDARD_JOINTS order, NaN for
+slots a layout does not map), so detections from cameras with different
+layouts, e.g. Coco17 and StereolabsBody34, can feed the same tracker.
+
+Example:
+    tracker = PoseTracker(get_skeleton_def("coco17"), max_distance=50.0)
+    for detections in frames:              # (people, joints, 2) per frame
+        ids = tracker.update(detections)   # one track id per detection
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .definition import STANDARD_JOINTS, SkeletonDefinition
+
+
+def to_standard(poses: np.ndarray, definition: SkeletonDefinition) -> np.ndarray:
+    """
+    Scatters (..., joints, D) poses into (..., len(STANDARD_JOINTS), D),
+    with NaN for standard joints the layout does not map.
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    slots = [i for i, slot in enumerate(STANDARD_JOINTS) if getattr(definition, slot) is not None]
+    joints = [getattr(definition, STANDARD_JOINTS[i]) for i in slots]
+    out = np.full(poses.shape[:-2] + (len(STANDARD_JOINTS), poses.shape[-1]), np.nan)
+    out[..., slots, :] = poses[..., joints, :]
+    return out
+
+
+def pose_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Mean joint distance between every pose of ``a`` and every pose of ``b``.
+
+    Joints that are NaN in either pose are ignored; pairs without any shared
+    joint get an infinite distance.
+
+    Args:
+        a: Poses of shape (N, joints, D).
+        b: Poses of shape (M, joints, D) in the same layout.
+
+    Returns:
+        Array of shape (N, M).
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    distances = np.linalg.norm(a[:, None] - b[None, :], axis=-1)
+    valid = np.isfinite(distances)
+    count = valid.sum(axis=-1)
+    total = np.where(valid, distances, 0.0).sum(axis=-1)
+    return np.where(count > 0, total / np.maximum(count, 1), np.inf)
+
+
+def _hungarian(cost: np.ndarray) -> np.ndarray:
+    """
+    Minimum-cost assignment of the rows of an (n, m) matrix with n <= m to
+    distinct columns, by shortest augmenting paths. Returns the column per row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.intp)  # row (1-based) matched to each column, 0 if free
+    way = np.zeros(m + 1, dtype=np.intp)
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            i = match[column]
+            free = ~used[1:]
+            slack = cost[i - 1] - u[i] - v[1:]
+            improved = free & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+    assignment = np.empty(n, dtype=np.intp)
+    assignment[match[1:][match[1:] > 0] - 1] = np.nonzero(match[1:] > 0)[0]
+    return assignment
+
+
+def linear_assignment(cost: np.ndarray, max_cost: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solves the rectangular assignment problem, dropping pairs above ``max_cost``.
+
+    Uses scipy's linear_sum_assignment when scipy is installed and a NumPy
+    implementation of the Hungarian algorithm otherwise.
+
+    Returns:
+        A tuple (rows, columns) of matched index pairs.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    # Forbidden pairs get a cost above any allowed assignment so they are only
+    # chosen when nothing else is left, then filtered out below.
+    allowed = np.isfinite(cost) & (cost <= max_cost)
+    penalty = (np.abs(cost[allowed]).sum() + 1.0) if allowed.any() else 1.0
+    bounded = np.where(allowed, cost, penalty)
+
+    try:
+        from scipy.optimize import linear_sum_assignment
+        rows, columns = linear_sum_assignment(bounded)
+    except ImportError:
+        transposed = bounded.shape[0] > bounded.shape[1]
+        solved = _hungarian(bounded.T if transposed else bounded)
+        rows, columns = np.arange(len(solved)), solved
+        if transposed:
+            rows, columns = columns, rows
+            order = np.argsort(rows)
+            rows, columns = rows[order], columns[order]
+    keep = allowed[rows, columns]
+    return rows[keep], columns[keep]
+
+
+class PoseTracker:
+    """
+    Associates pose detections across frames with constant-velocity prediction.
+
+    All track state is held in arrays, so prediction, distance computation and
+    updates are batched over tracks and detections.
+    """
+
+    def __init__(self, definition: SkeletonDefinition, max_distance: float,
+                 max_age: int = 10, velocity_smoothing: float = 0.5):
+        """
+        Args:
+            definition: The default layout of the detections.
+            max_distance: Largest mean joint distance, in the units of the
+                poses, between a prediction and a detection it may be matched to.
+            max_age: Frames a track survives without a matched detection.
+            velocity_smoothing: Weight of the newest velocity estimate, in (0, 1].
+        """
+        if not 0.0 < velocity_smoothing <= 1.0:
+            raise ValueError("velocity_smoothing must be in (0, 1].")
+        self.definition = definition
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.velocity_smoothing = velocity_smoothing
+        self._next_id = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._positions: Optional[np.ndarray] = None  # (tracks, standard joints, D)
+        self._velocities: Optional[np.ndarray] = None
+        self._missed = np.empty(0, dtype=np.int64)   # frames since the last match
+
+    @property
+    def track_ids(self) -> np.ndarray:
+        """Ids of the tracks currently alive."""
+        return self._ids.copy()
+
+    def predict(self) -> np.ndarray:
+        """Predicted standard-joint poses of the live tracks for the next frame."""
+        if self._positions is None:
+            return np.empty((0, len(STANDARD_JOINTS), 0))
+        return self._positions + self._velocities * (self._missed + 1)[:, None, None]
+
+    def tracks(self) -> Dict[int, np.ndarray]:
+        """The last estimated standard-joint pose of each live track."""
+        if self._positions is None:
+            return {}
+        return {int(i): p for i, p in zip(self._ids, self._positions)}
+
+    def update(self, detections: np.ndarray, definition: Optional[SkeletonDefinition] = None) -> np.ndarray:
+        """
+        Matches one frame of detections to the tracks.
+
+        Args:
+            detections: Poses of shape (people, joints, D). Undetected joints
+                may be NaN.
+            definition: The layout of the detections, if it differs from the
+                tracker's default layout.
+
+        Returns:
+            Track id per detection, shape (people,). Unmatched detections start
+            new tracks.
+        """
+        definition = self.definition if definition is None else definition
+        detections = np.asarray(detections, dtype=np.float64)
+        observed = to_standard(detections.reshape((-1,) + detections.shape[-2:]), definition)
+
+        with profiling.stage("tracking.update", frames=1, people=len(observed), tracks=len(self._ids)):
+            if self._positions is None:
+                dims = observed.shape[-1]
+                self._positions = np.empty((0, len(STANDARD_JOINTS), dims))
+                self._velocities = np.empty((0, len(STANDARD_JOINTS), dims))
+
+            predicted = self.predict()
+            rows, columns = linear_assignment(pose_distances(predicted, observed), self.max_distance)
+
+            # Matched tracks: blend in the observed joints, keep predictions for missing ones.
+            gap = (self._missed[rows] + 1)[:, None, None]
+            observation = observed[columns]
+            present = np.isfinite(observation)
+            previous = self._positions[rows]
+            position = np.where(present, observation, predicted[rows])
+            measured = (position - previous) / gap
+            # Joints seen for the first time have no previous position to difference.
+            measured = np.where(np.isfinite(measured), measured, 0.0)
+            alpha = self.velocity_smoothing
+            velocity = np.where(np.isfinite(previous), alpha * measured + (1 - alpha) * self._velocities[rows],
+                                0.0)
+            self._positions[rows] = position
+            self._velocities[rows] = velocity
+            self._missed += 1
+            self._missed[rows] = 0
+
+            ids = np.empty(len(observed), dtype=np.int64)
+            ids[columns] = self._ids[rows]
+
+            # New tracks for unmatched detections.
+            new = np.setdiff1d(np.arange(len(observed)), columns)
+            new_ids = np.arange(self._next_id, self._next_id + len(new))
+            self._next_id += len(new)
+            ids[new] = new_ids
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._positions = np.concatenate([self._positions, observed[new]])
+            self._velocities = np.concatenate([self._velocities, np.zeros_like(observed[new])])
+            self._missed = np.concatenate([self._missed, np.zeros(len(new), dtype=np.int64)])
+
+            alive = self._missed <= self.max_age
+            self._ids = self._ids[alive]
+            self._positions = self._positions[alive]
+            self._velocities = self._velocities[alive]
+            self._missed = self._missed[alive]
+        return ids
@@ -0,0 +1,216 @@
+"""
+Multi-view triangulation of 2D keypoints into 3D joints.
+
+Keypoints from V calibrated cameras are given as (views, ..., 2) arrays with
+3x4 projection matrices ``K @ [R | t]`` per view. All joints and frames are
+solved at once: each point's confidence-weighted DLT system is reduced to a
+4x4 normal matrix and solved with a batched eigendecomposition.
+"""
+from itertools import combinations
+from typing import Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .definition import SkeletonDefinition
+
+
+def _weights(points2d: np.ndarray, confidences: Optional[np.ndarray], min_confidence: float) -> np.ndarray:
+    weights = np.ones(points2d.shape[:-1]) if confidences is None else np.asarray(confidences, dtype=np.float64)
+    weights = np.where(weights >= min_confidence, weights, 0.0)
+    return np.where(np.all(np.isfinite(points2d), axis=-1), weights, 0.0)
+
+
+def triangulate(points2d: np.ndarray, projections: np.ndarray,
+                confidences: Optional[np.ndarray] = None,
+                min_confidence: float = 0.0) -> np.ndarray:
+    """
+    Confidence-weighted linear (DLT) triangulation.
+
+    Args:
+        points2d: Keypoints of shape (views, ..., 2), NaN where undetected.
+        projections: Projection matrices of shape (views, 3, 4).
+        confidences: Optional weights of shape (views, ...).
+        min_confidence: Observations below this confidence are ignored.
+
+    Returns:
+        Points of shape (..., 3). NaN where fewer than two views contribute.
+    """
+    points2d = np.asarray(points2d, dtype=np.float64)
+    projections = np.asarray(projections, dtype=np.float64)
+    weights = _weights(points2d, confidences, min_confidence)
+    points2d = np.nan_to_num(points2d)
+
+    # Rows x * P[2] - P[0] and y * P[2] - P[1] per view: (views, ..., 2, 4).
+    p = projections.reshape((len(projections),) + (1,) * (points2d.ndim - 2) + (3, 4))
+    rows = points2d[..., :, None] * p[..., 2:3, :] - p[..., :2, :]
+    rows = rows / np.maximum(np.linalg.norm(rows, axis=-1, keepdims=True), 1e-12)
+    rows = rows * weights[..., None, None]
+    normal = np.einsum("v...ri,v...rj->...ij", rows, rows)
+
+    _, vectors = np.linalg.eigh(normal)
+    homogeneous = vectors[..., :, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        points = homogeneous[..., :3] / homogeneous[..., 3:]
+    return np.where((np.count_nonzero(weights, axis=0) >= 2)[..., None], points, np.nan)
+
+
+def project(points3d: np.ndarray, projections: np.ndarray) -> np.ndarray:
+    """Projects (..., 3) points into every view, shape (views, ..., 2)."""
+    points3d = np.asarray(points3d, dtype=np.float64)
+    homogeneous = np.concatenate([points3d, np.ones(points3d.shape[:-1] + (1,))], axis=-1)
+    image = np.einsum("vij,...j->v...i", np.asarray(projections, dtype=np.float64), homogeneous)
+    return image[..., :2] / image[..., 2:]
+
+
+def reprojection_errors(points3d: np.ndarray, points2d: np.ndarray, projections: np.ndarray) -> np.ndarray:
+    """Pixel distance between projected points and keypoints, shape (views, ...)."""
+    return np.linalg.norm(project(points3d, projections) - points2d, axis=-1)
+
+
+def triangulate_ransac(points2d: np.ndarray, projections: np.ndarray,
+                       confidences: Optional[np.ndarray] = None,
+                       threshold: float = 10.0, min_confidence: float = 0.0,
+                       max_hypotheses: int = 64, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Triangulation robust to wrong detections in some views.
+
+    Every point is triangulated from pairs of views; the pair whose solution
+    has the most (confidence-weighted) inlier views wins, and the point is
+    re-triangulated from those inliers. All points share the same pairs, so
+    each hypothesis is one batched triangulation.
+
+    Args:
+        points2d: Keypoints of shape (views, ..., 2).
+        projections: Projection matrices of shape (views, 3, 4).
+        confidences: Optional weights of shape (views, ...).
+        threshold: Inlier reprojection error in pixels.
+        min_confidence: Observations below this confidence are ignored.
+        max_hypotheses: View pairs to try; all pairs if there are fewer.
+        seed: Seed for sampling view pairs.
+
+    Returns:
+        A tuple (points, inliers) with points of shape (..., 3) and a boolean
+        inlier mask of shape (views, ...).
+    """
+    points2d = np.asarray(points2d, dtype=np.float64)
+    projections = np.asarray(projections, dtype=np.float64)
+    weights = _weights(points2d, confidences, min_confidence)
+    num_views = len(projections)
+    if num_views < 2:
+        raise ValueError("Triangulation needs at least two views.")
+
+    pairs = list(combinations(range(num_views), 2))
+    if len(pairs) > max_hypotheses:
+        rng = np.random.default_rng(seed)
+        pairs = [pairs[i] for i in rng.choice(len(pairs), max_hypotheses, replace=False)]
+
+    best_score = np.full(points2d.shape[1:-1], -1.0)
+    best_inliers = np.zeros(points2d.shape[:-1], dtype=bool)
+    for pair in pairs:
+        pair = list(pair)
+        candidate = triangulate(points2d[pair], projections[pair], weights[pair], min_confidence)
+        with np.errstate(invalid="ignore"):
+            inliers = (reprojection_errors(candidate, points2d, projections) < threshold) & (weights > 0)
+        score = np.sum(inliers * weights, axis=0)
+        better = score > best_score
+        best_score = np.where(better, score, best_score)
+        best_inliers = np.where(better, inliers, best_inliers)
+
+    points = triangulate(points2d, projections, weights * best_inliers, min_confidence)
+    return points, best_inliers
+
+
+def bone_length_priors(positions: np.ndarray, definition: SkeletonDefinition) -> np.ndarray:
+    """
+    Robust length of every bone of the hierarchy over a clip: the median over
+    all finite frames, in the order of ``definition.topology.bones``.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+    """
+    bones = definition.topology.bones
+    vectors = np.take(positions, bones[:, 1], axis=-2) - np.take(positions, bones[:, 0], axis=-2)
+    lengths = np.linalg.norm(vectors, axis=-1).reshape(-1, len(bones))
+    return np.nanmedian(lengths, axis=0)
+
+
+def apply_bone_lengths(positions: np.ndarray, definition: SkeletonDefinition,
+                       lengths: np.ndarray, weight: float = 1.0) -> np.ndarray:
+    """
+    Pulls bone lengths towards priors while keeping bone directions.
+
+    Bones are processed from the root down; each child subtree is translated
+    along its bone so the bone gets the blended length, leaving the shape of
+    the subtree intact.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+        definition: The skeleton; bones follow ``definition.topology.bones``.
+        lengths: Prior length per bone.
+        weight: 1 enforces the priors, 0 leaves the positions unchanged.
+
+    Returns:
+        Adjusted positions of the input shape.
+    """
+    topology = definition.topology
+    out = np.array(positions, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.float64)
+    # Visit bones in the pre-order of their child joint, so parents are fixed first.
+    order = np.argsort(topology.position[topology.bones[:, 1]])
+    for bone in order:
+        parent, child = topology.bones[bone]
+        if not np.isfinite(lengths[bone]):
+            continue
+        vector = out[..., child, :] - out[..., parent, :]
+        current = np.linalg.norm(vector, axis=-1, keepdims=True)
+        target = weight * lengths[bone] + (1.0 - weight) * current
+        delta = vector * (target / np.maximum(current, 1e-12) - 1.0)
+        delta = np.where(np.isfinite(delta), delta, 0.0)
+        subtree = topology.subtree(child)
+        out[..., subtree, :] += delta[..., None, :]
+    return out
+
+
+def triangulate_skeleton(keypoints: np.ndarray, projections: np.ndarray, definition: SkeletonDefinition,
+                         confidences: Optional[np.ndarray] = None, ransac: bool = True,
+                         threshold: float = 10.0, min_confidence: float = 0.0,
+                         bone_prior_weight: float = 0.0,
+                         bone_lengths: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Triangulates 2D skeletons seen by several calibrated cameras.
+
+    Args:
+        keypoints: 2D joints of shape (views, frames, joints, 2) in the
+            layout of ``definition``.
+        projections: Projection matrices of shape (views, 3, 4).
+        definition: The layout of the keypoints, e.g. Coco17 or MediaPipe33.
+        confidences: Optional detection confidences of shape (views, frames, joints).
+        ransac: Reject outlier views per joint with :func:`triangulate_ransac`.
+        threshold: RANSAC inlier reprojection error in pixels.
+        min_confidence: Observations below this confidence are ignored.
+        bone_prior_weight: Strength of the bone-length prior, 0 to disable.
+        bone_lengths: Prior length per bone of ``definition.topology.bones``.
+            Defaults to the median lengths of the triangulated clip.
+
+    Returns:
+        Joint positions of shape (frames, joints, 3), NaN where a joint could
+        not be triangulated.
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    num_joints = len(definition.original_names)
+    if keypoints.ndim != 4 or keypoints.shape[2:] != (num_joints, 2):
+        raise ValueError(f"Expected keypoints of shape (views, frames, {num_joints}, 2), got {keypoints.shape}.")
+    if len(projections) != len(keypoints):
+        raise ValueError(f"Got {len(projections)} projection matrices for {len(keypoints)} views.")
+
+    with profiling.stage("triangulate_skeleton", frames=keypoints.shape[1], nbytes=keypoints.nbytes,
+                         views=len(keypoints)):
+        if ransac:
+            positions, _ = triangulate_ransac(keypoints, projections, confidences, threshold, min_confidence)
+        else:
+            positions = triangulate(keypoints, projections, confidences, min_confidence)
+        if bone_prior_weight > 0:
+            lengths = bone_length_priors(positions, definition) if bone_lengths is None else bone_lengths
+            positions = apply_bone_lengths(positions, definition, lengths, bone_prior_weight)
+    return positions
@@ -0,0 +1,348 @@
+"""
+Plausibility checks for whole clips of joint positions: joint-limit
+violations and self-intersections between bones.
+
+Joint limits are bend angles at a joint between its proximal and distal
+segments, resolved per layout from standard slots or joint names, so one
+table covers every layout that maps the joints involved. Hinge limits with
+an axis (e.g. knees about the hip-to-hip axis) are signed, so
+hyperextension is caught as well. For rotation data, run
+:func:`pose_skeletons.kinematics.forward_kinematics` first.
+
+Self-intersections approximate every bone of the hierarchy by a capsule and
+test all pairs of capsules that are not close in the tree, for all frames at
+once.
+
+Example:
+    report = validate_poses(positions, get_skeleton_def("smpl"))
+    clean = positions[report.valid]
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from . import profiling
+from .definition import STANDARD_JOINTS, SkeletonDefinition
+
+
+_EPS = 1e-9
+
+
+@dataclass(frozen=True)
+class JointLimit:
+    """
+    Allowed bend angle at a joint, in degrees.
+
+    The angle is 0 when the distal segment continues the proximal one in a
+    straight line. Without ``axis`` it is unsigned, in [0, 180]; with an axis
+    it is signed by the right-hand rule about the axis, in [-180, 180].
+    """
+    name: str
+    joints: Tuple[str, str, str]  # proximal, joint, distal: standard slots or joint names
+    min_angle: float
+    max_angle: float
+    axis: Optional[Tuple[str, str]] = None  # from, to: the hinge axis of signed limits
+
+
+def _limits(side: str) -> Tuple[JointLimit, ...]:
+    return (
+        JointLimit(f"{side}_elbow", (f"{side}_shoulder", f"{side}_elbow", f"{side}_wrist"), 0.0, 160.0),
+        JointLimit(f"{side}_knee", (f"{side}_hip", f"{side}_knee", f"{side}_ankle"), -15.0, 165.0,
+                   axis=("r_hip", "l_hip")),
+        JointLimit(f"{side}_ankle", (f"{side}_knee", f"{side}_ankle", f"{side}_foot"), 20.0, 160.0),
+    )
+
+
+DEFAULT_JOINT_LIMITS = _limits("l") + _limits("r") + (
+    JointLimit("neck", ("spine_high", "neck", "head"), 0.0, 90.0),
+    JointLimit("spine", ("hips", "spine_mid", "neck"), 0.0, 110.0),
+)
+
+
+def _wrist_limits(left_hand: str, right_hand: str) -> Tuple[JointLimit, ...]:
+    return (
+        JointLimit("l_wrist", ("l_elbow", "l_wrist", left_hand), 0.0, 100.0),
+        JointLimit("r_wrist", ("r_elbow", "r_wrist", right_hand), 0.0, 100.0),
+    )
+
+
+# Joint limits by definition name; other layouts use DEFAULT_JOINT_LIMITS.
+# Limits whose joints a layout does not have are skipped.
+JOINT_LIMITS: Dict[str, Tuple[JointLimit, ...]] = {
+    "SMPL": DEFAULT_JOINT_LIMITS + _wrist_limits("left_hand", "right_hand"),
+    "SMPLH": DEFAULT_JOINT_LIMITS + _wrist_limits("left_middle1", "right_middle1"),
+    "SMPLX": DEFAULT_JOINT_LIMITS + _wrist_limits("left_middle1", "right_middle1"),
+    "Optitrack": DEFAULT_JOINT_LIMITS + _wrist_limits("LeftHandMiddle1", "RightHandMiddle1"),
+    "Xsens": DEFAULT_JOINT_LIMITS,
+}
+
+
+def _resolve(definition: SkeletonDefinition, joint: str) -> Optional[int]:
+    if joint in STANDARD_JOINTS:
+        return getattr(definition, joint)
+    try:
+        return definition.original_names.index(joint)
+    except ValueError:
+        return None
+
+
+def joint_limits(definition: SkeletonDefinition,
+                 limits: Optional[Sequence[JointLimit]] = None) -> Tuple[List[JointLimit], np.ndarray, np.ndarray]:
+    """
+    Resolves joint limits to joint indices of a layout.
+
+    Args:
+        definition: The layout.
+        limits: Limits to resolve. Defaults to the layout's entry in
+            JOINT_LIMITS, or DEFAULT_JOINT_LIMITS.
+
+    Returns:
+        A tuple (limits, joints, axes): the limits the layout has all joints
+        for, their (proximal, joint, distal) indices of shape (L, 3) and axis
+        (from, to) indices of shape (L, 2), -1 for unsigned limits.
+    """
+    if limits is None:
+        limits = JOINT_LIMITS.get(definition.name, DEFAULT_JOINT_LIMITS)
+    resolved, joints, axes = [], [], []
+    for limit in limits:
+        indices = [_resolve(definition, j) for j in limit.joints]
+        axis = [_resolve(definition, j) for j in limit.axis] if limit.axis else [-1, -1]
+        # Skip missing joints and slots mapped to one joint (e.g. Optitrack's spine_high and neck).
+        if None in indices or None in axis or len(set(indices)) < 3:
+            continue
+        resolved.append(limit)
+        joints.append(indices)
+        axes.append(axis)
+    return (resolved, np.array(joints, dtype=np.intp).reshape(-1, 3),
+            np.array(axes, dtype=np.intp).reshape(-1, 2))
+
+
+def bend_angles(positions: np.ndarray, joints: np.ndarray, axes: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Bend angles in degrees at joint triples, see :class:`JointLimit`.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+        joints: (proximal, joint, distal) indices of shape (L, 3).
+        axes: Hinge axis (from, to) indices of shape (L, 2), -1 for unsigned angles.
+
+    Returns:
+        Array of shape (..., L), NaN where a segment has zero length.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    proximal = positions[..., joints[:, 1], :] - positions[..., joints[:, 0], :]
+    distal = positions[..., joints[:, 2], :] - positions[..., joints[:, 1], :]
+    cross = np.cross(proximal, distal)
+    dot = np.einsum("...i,...i->...", proximal, distal)
+    angles = np.arctan2(np.linalg.norm(cross, axis=-1), dot)
+
+    if axes is not None and np.any(axes[:, 0] >= 0):
+        signed = np.flatnonzero(axes[:, 0] >= 0)
+        axis = positions[..., axes[signed, 1], :] - positions[..., axes[signed, 0], :]
+        axis = axis / np.maximum(np.linalg.norm(axis, axis=-1, keepdims=True), _EPS)
+        angles[..., signed] = np.arctan2(np.einsum("...i,...i->...", cross[..., signed, :], axis),
+                                         dot[..., signed])
+
+    degenerate = (np.linalg.norm(proximal, axis=-1) < _EPS) | (np.linalg.norm(distal, axis=-1) < _EPS)
+    angles = np.degrees(angles)
+    angles[degenerate] = np.nan
+    return angles
+
+
+def check_joint_limits(positions: np.ndarray, definition: SkeletonDefinition,
+                       limits: Optional[Sequence[JointLimit]] = None) -> Tuple[np.ndarray, List[JointLimit]]:
+    """
+    Per-pose joint-limit violations.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+        definition: The layout of ``positions``.
+        limits: Limits to check, see :func:`joint_limits`.
+
+    Returns:
+        A tuple (violations, limits): a boolean array of shape (..., L), True
+        where a pose exceeds a limit (never for missing joints), and the
+        limits checked.
+    """
+    limits, joints, axes = joint_limits(definition, limits)
+    lower = np.array([limit.min_angle for limit in limits])
+    upper = np.array([limit.max_angle for limit in limits])
+    angles = bend_angles(positions, joints, axes)
+    with np.errstate(invalid="ignore"):
+        return (angles < lower) | (angles > upper), limits
+
+
+@dataclass(frozen=True)
+class Capsules:
+    """
+    Bones approximated by capsules: a segment between two joints with a radius.
+
+    ``pairs`` are the (parent, child) joints of each capsule, ``radii`` their
+    radius and ``tests`` the index pairs of capsules checked for intersection.
+    """
+    pairs: np.ndarray  # (C, 2)
+    radii: np.ndarray  # (C,)
+    tests: np.ndarray  # (P, 2)
+
+
+def tree_distances(definition: SkeletonDefinition) -> np.ndarray:
+    """Number of bones on the path between every two joints, shape (joints, joints)."""
+    topology = definition.topology
+    num_joints = topology.num_joints
+    ancestors = np.eye(num_joints, dtype=bool)
+    for joint in topology.order[1:]:
+        ancestors[joint] |= ancestors[topology.parents[joint]]
+    # The deepest common ancestor has the largest depth among the shared ones.
+    common = ancestors.astype(np.int64) * (topology.depth + 1)
+    lca_depth = np.max(np.minimum(common[:, None, :], common[None, :, :]), axis=-1) - 1
+    return topology.depth[:, None] + topology.depth[None, :] - 2 * lca_depth
+
+
+def bone_capsules(definition: SkeletonDefinition, positions: Optional[np.ndarray] = None,
+                  radius: Union[None, float, np.ndarray] = None, radius_fraction: float = 0.2,
+                  joints: Optional[Sequence[int]] = None, min_separation: int = 2) -> Capsules:
+    """
+    Capsules around the bones of a layout.
+
+    Args:
+        definition: The layout.
+        positions: Sample poses of shape (..., joints, 3), used to size the
+            capsules when ``radius`` is not given.
+        radius: Radius of every capsule, or one per bone of ``joints``.
+        radius_fraction: Radius relative to each bone's median length in
+            ``positions``, or to the median of all bones for shorter bones
+            (spine and head segments are short but thick).
+        joints: Only use bones between these joints, e.g. to leave out face
+            landmarks. Defaults to all joints.
+        min_separation: Capsules are only tested against each other when their
+            closest joints are more than this many bones apart, so
+            neighbouring bones, which always touch, are not reported.
+    """
+    pairs = definition.topology.bones
+    if joints is not None:
+        keep = np.isin(pairs, np.asarray(joints)).all(axis=1)
+        pairs = pairs[keep]
+
+    if radius is None:
+        if positions is None:
+            raise ValueError("Either positions or radius is required to size the capsules.")
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, len(definition.original_names), 3)
+        lengths = np.linalg.norm(positions[:, pairs[:, 1]] - positions[:, pairs[:, 0]], axis=-1)
+        lengths = np.nanmedian(lengths, axis=0)
+        radii = radius_fraction * np.maximum(lengths, np.nanmedian(lengths))
+    else:
+        radii = np.broadcast_to(np.asarray(radius, dtype=np.float64), (len(pairs),)).copy()
+
+    distances = tree_distances(definition)
+    first, second = np.triu_indices(len(pairs), k=1)
+    separation = np.min(distances[pairs[first][:, :, None], pairs[second][:, None, :]], axis=(1, 2))
+    tests = np.stack([first, second], axis=1)[separation > min_separation]
+    return Capsules(pairs, radii, tests)
+
+
+def segment_distances(p0: np.ndarray, p1: np.ndarray, q0: np.ndarray, q1: np.ndarray) -> np.ndarray:
+    """
+    Smallest distances between segments [p0, p1] and [q0, q1], shape (...).
+
+    All inputs have shape (..., 3) and broadcast against each other.
+    """
+    d1 = p1 - p0
+    d2 = q1 - q0
+    r = p0 - q0
+    a = np.einsum("...i,...i->...", d1, d1)
+    e = np.einsum("...i,...i->...", d2, d2)
+    b = np.einsum("...i,...i->...", d1, d2)
+    c = np.einsum("...i,...i->...", d1, r)
+    f = np.einsum("...i,...i->...", d2, r)
+
+    # Closest points of the infinite lines, clamped to the segments; see
+    # Ericson, Real-Time Collision Detection, 5.1.9. Degenerate segments are points.
+    point_p, point_q = a <= _EPS, e <= _EPS
+    safe_a = np.where(point_p, 1.0, a)
+    safe_e = np.where(point_q, 1.0, e)
+    denom = a * e - b * b
+    parallel = denom <= _EPS * a * e
+    s = np.clip((b * f - c * e) / np.where(parallel, 1.0, denom), 0.0, 1.0)
+    s = np.where(parallel, 0.0, s)
+    s = np.where(point_q, np.clip(-c / safe_a, 0.0, 1.0), s)
+    s = np.where(point_p, 0.0, s)
+    t = np.where(point_q, 0.0, (b * s + f) / safe_e)
+    # Where t leaves its segment, clamp it and recompute s for the clamped t.
+    t_clamped = np.clip(t, 0.0, 1.0)
+    s = np.where((t != t_clamped) & ~point_p, np.clip((b * t_clamped - c) / safe_a, 0.0, 1.0), s)
+    closest = (p0 + d1 * s[..., None]) - (q0 + d2 * t_clamped[..., None])
+    return np.linalg.norm(closest, axis=-1)
+
+
+def self_intersections(positions: np.ndarray, capsules: Capsules, margin: float = 0.0,
+                       chunk_size: int = 4096) -> np.ndarray:
+    """
+    Intersecting capsule pairs per pose.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+        capsules: The capsules, see :func:`bone_capsules`.
+        margin: Penetration depth tolerated before a pair counts as intersecting.
+        chunk_size: Poses processed at once, to bound memory.
+
+    Returns:
+        Boolean array of shape (..., P), one entry per pair in ``capsules.tests``.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    batch = positions.shape[:-2]
+    flat = positions.reshape((-1,) + positions.shape[-2:])
+    first, second = capsules.pairs[capsules.tests[:, 0]], capsules.pairs[capsules.tests[:, 1]]
+    reach = capsules.radii[capsules.tests[:, 0]] + capsules.radii[capsules.tests[:, 1]] - margin
+
+    out = np.empty((len(flat), len(capsules.tests)), dtype=bool)
+    with profiling.stage("validation.self_intersections", frames=len(flat), pairs=len(capsules.tests)):
+        for start in range(0, len(flat), chunk_size):
+            chunk = flat[start:start + chunk_size]
+            distances = segment_distances(chunk[:, first[:, 0]], chunk[:, first[:, 1]],
+                                          chunk[:, second[:, 0]], chunk[:, second[:, 1]])
+            out[start:start + chunk_size] = distances < reach  # NaN joints never intersect
+    return out.reshape(batch + (len(capsules.tests),))
+
+
+@dataclass
+class PoseValidation:
+    """Result of :func:`validate_poses`."""
+    valid: np.ndarray              # (...,) True for poses without violations or intersections
+    limit_violations: np.ndarray   # (..., L)
+    intersections: np.ndarray      # (..., P)
+    limits: List[JointLimit]
+    capsules: Capsules
+
+    def violated_limits(self, index) -> List[str]:
+        """Names of the limits a pose exceeds, e.g. ``report.violated_limits(120)``."""
+        return [limit.name for limit, bad in zip(self.limits, self.limit_violations[index]) if bad]
+
+
+def validate_poses(positions: np.ndarray, definition: SkeletonDefinition,
+                   limits: Optional[Sequence[JointLimit]] = None, capsules: Optional[Capsules] = None,
+                   margin: float = 0.0, check_intersections: bool = True) -> PoseValidation:
+    """
+    Checks joint limits and self-intersections of poses.
+
+    Args:
+        positions: Joint positions of shape (..., joints, 3).
+        definition: The layout of ``positions``.
+        limits: Joint limits, see :func:`joint_limits`.
+        capsules: Bone capsules. Defaults to :func:`bone_capsules` sized from ``positions``.
+        margin: Penetration depth tolerated between capsules.
+        check_intersections: Whether to test capsules at all.
+
+    Returns:
+        A PoseValidation with per-pose masks.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    with profiling.stage("validate_poses", frames=int(np.prod(positions.shape[:-2])), skeleton=definition.name):
+        violations, limits = check_joint_limits(positions, definition, limits)
+        if capsules is None:
+            capsules = bone_capsules(definition, positions) if check_intersections \
+                else Capsules(np.empty((0, 2), np.intp), np.empty(0), np.empty((0, 2), np.intp))
+        intersections = self_intersections(positions, capsules, margin) if check_intersections \
+            else np.zeros(positions.shape[:-2] + (0,), dtype=bool)
+        valid = ~(violations.any(axis=-1) | intersections.any(axis=-1))
+    return PoseValidation(valid, violations, intersections, list(limits), capsules)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from pose_skeletons.dtw import dtw, frame_distances
+
+
+def _brute_force_dtw(a, b):
+    costs = frame_distances(a, b)
+    acc = np.full((len(a) + 1, len(b) + 1), np.inf)
+    acc[0, 0] = 0.0
+    for i in range(len(a)):
+        for j in range(len(b)):
+            acc[i + 1, j + 1] = costs[i, j] + min(acc[i, j], acc[i, j + 1], acc[i + 1, j])
+    return acc[-1, -1]
+
+
+def test_dtw_matches_brute_force():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=(40, 4, 3)), rng.normal(size=(55, 4, 3))
+    result = dtw(a, b)
+    assert result.distance == pytest.approx(_brute_force_dtw(a, b))
+    assert tuple(result.path[0]) == (0, 0) and tuple(result.path[-1]) == (39, 54)
+
+
+def test_dtw_skips_pairs_without_common_joints():
+    # Frame 2 of a and frame 1 of b share no valid joint, so that cell is
+    # infinite; cells after it in the same row must still be reachable.
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(size=(5, 2, 3)), rng.normal(size=(6, 2, 3))
+    a[2, 0] = np.nan
+    b[1, 1] = np.nan
+    result = dtw(a, b)
+    assert result.distance == pytest.approx(_brute_force_dtw(a, b))
+    costs = frame_distances(a, b)
+    assert costs[tuple(result.path.T)].sum() == pytest.approx(result.distance)
@@ -0,0 +1,27 @@
+from pose_skeletons.generate_skeleton_def import generate_definition_files
+
+
+def _write_chain_bvh(path, names):
+    lines = ["HIERARCHY", f"ROOT {names[0]}", "{", "OFFSET 0 0 0",
+             "CHANNELS 6 Xposition Yposition Zposition Zrotation Xrotation Yrotation"]
+    for name in names[1:]:
+        lines += [f"JOINT {name}", "{", "OFFSET 0 1 0", "CHANNELS 3 Zrotation Xrotation Yrotation"]
+    lines += ["End Site", "{", "OFFSET 0 1 0", "}"] + ["}"] * len(names)
+    lines += ["MOTION", "Frames: 1", "Frame Time: 0.033", " ".join(["0"] * (3 + 3 * len(names)))]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_hierarchies_from_files_with_the_same_name_are_kept_apart(tmp_path):
+    _write_chain_bvh(tmp_path / "a" / "rig.bvh", ["Hips", "Spine", "Head"])
+    _write_chain_bvh(tmp_path / "b" / "rig.bvh", ["Hips", "Chest"])
+    _write_chain_bvh(tmp_path / "c" / "Rig.bvh", ["Hips", "Chest", "Neck"])
+    _write_chain_bvh(tmp_path / "d" / "rig.bvh", ["Hips", "Spine", "Head"])
+
+    output_dir = tmp_path / "generated"
+    output_dir.mkdir()
+    paths = generate_definition_files([str(tmp_path / d) for d in "abcd"], output_dir=str(output_dir))
+
+    assert [p.rsplit("/", 1)[1] for p in paths] == ["rig.py", "rig2.py", "rig3.py"]
+    assert "Chest" not in (output_dir / "rig.py").read_text()
+    assert "Neck" in (output_dir / "rig3.py").read_text()
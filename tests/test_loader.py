@@ -0,0 +1,31 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pose_skeletons.loader import load_skeleton_def, topology_hash
+from pose_skeletons.topology import compile_topology
+
+
+def _write_chain(path, num_joints):
+    names = [f"joint{i}" for i in range(num_joints)]
+    path.write_text(json.dumps({"name": path.stem, "names": names, "parents": [-1] + list(range(num_joints - 1))}))
+    return str(path)
+
+
+def test_concurrent_loads_with_a_cold_cache(tmp_path):
+    paths = [_write_chain(tmp_path / f"rig{k}.json", 4 + k) for k in range(8)]
+    cache_dir = str(tmp_path / "cache")
+    with ThreadPoolExecutor(16) as pool:
+        definitions = list(pool.map(lambda p: load_skeleton_def(p, cache_dir=cache_dir), paths * 20))
+    for definition in definitions:
+        np.testing.assert_array_equal(definition.topology.parents, definition.parents)
+
+
+def test_cache_entry_for_other_parents_is_recompiled(tmp_path):
+    path = _write_chain(tmp_path / "rig.json", 5)
+    cache_dir = tmp_path / "cache"
+    definition = load_skeleton_def(path, cache_dir=str(cache_dir))
+    np.savez(cache_dir / f"{topology_hash(definition)}.npz", **compile_topology([-1, 0, 0, 0, 0]).to_arrays())
+    reloaded = load_skeleton_def(path, cache_dir=str(cache_dir))
+    np.testing.assert_array_equal(reloaded.topology.parents, [-1, 0, 1, 2, 3])
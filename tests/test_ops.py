@@ -0,0 +1,44 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from pose_skeletons import get_skeleton_def
+from pose_skeletons.ops import bone_lengths, bone_pairs, bone_vectors, gather_standard, mirror
+
+
+class _DLPackArray:
+    """An array type that only implements DLPack, from the module 'dlpack_only'."""
+    __module__ = "dlpack_only"
+
+    def __init__(self, array):
+        self.array = np.ascontiguousarray(array)
+
+    def __dlpack__(self, **kwargs):
+        return self.array.__dlpack__(**kwargs)
+
+    def __dlpack_device__(self):
+        return self.array.__dlpack_device__()
+
+
+@pytest.fixture
+def dlpack_module(monkeypatch):
+    module = types.ModuleType("dlpack_only")
+    module.from_dlpack = lambda x: _DLPackArray(np.from_dlpack(x))
+    monkeypatch.setitem(sys.modules, "dlpack_only", module)
+
+
+@pytest.mark.parametrize("op", [
+    lambda x, d: gather_standard(x, d),
+    lambda x, d: bone_vectors(x, bone_pairs(d)),
+    lambda x, d: bone_lengths(x, bone_pairs(d)),
+    lambda x, d: mirror(x, d),
+    lambda x, d: mirror(x, d, axis=None),
+])
+def test_dlpack_inputs_return_their_own_type(dlpack_module, op):
+    definition = get_skeleton_def("smpl")
+    positions = np.random.default_rng(0).normal(size=(4, len(definition.original_names), 3))
+    result = op(_DLPackArray(positions), definition)
+    assert isinstance(result, _DLPackArray)
+    np.testing.assert_allclose(result.array, op(positions, definition))
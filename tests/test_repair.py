@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from pose_skeletons import get_skeleton_def
+from pose_skeletons.repair import detect_swaps, repair_glitches, swap_groups
+
+
+def _clip_with_swap(definition, start, stop, frames=80):
+    rng = np.random.default_rng(0)
+    num_joints = len(definition.original_names)
+    rest = np.zeros((num_joints, 3))
+    for joint, parent in enumerate(definition.parents):
+        if parent >= 0:
+            rest[joint] = rest[parent] + rng.normal(scale=0.15, size=3)
+    walk = np.zeros((frames, 1, 3))
+    walk[:, 0, 0] = np.arange(frames) / 60
+    truth = rest + walk + rng.normal(scale=0.003, size=(frames, num_joints, 3))
+    side_a, side_b = swap_groups(definition)[0]
+    swapped = truth.copy()
+    swapped[start:stop][:, np.r_[side_a, side_b]] = truth[start:stop][:, np.r_[side_b, side_a]]
+    return truth, swapped
+
+
+@pytest.mark.parametrize("max_run", [None, 5, 9, 10])
+def test_swap_runs_end_at_the_swap_back(max_run):
+    definition = get_skeleton_def("stereolabs_body18")
+    truth, swapped = _clip_with_swap(definition, 20, 30)
+    flagged = np.flatnonzero(detect_swaps(swapped, definition, max_run=max_run)[:, 0])
+    expected = np.arange(20, 30 if max_run is None else min(30, 20 + max_run))
+    np.testing.assert_array_equal(flagged, expected)
+    repaired, _ = repair_glitches(swapped, definition, max_swap=max_run)
+    np.testing.assert_allclose(repaired[30:], truth[30:])